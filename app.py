@@ -1,5 +1,7 @@
-from flask import Flask, render_template, request, redirect, url_for
-import subprocess
+from flask import Flask, render_template, request, redirect, url_for, jsonify, Response
+import os
+import jobs
+import metrics
 
 app = Flask(__name__)
 
@@ -9,11 +11,11 @@ def index():
         # Get the form inputs
         urls = request.form['urls'].strip().split('\n')  # Multiple URLs split by new lines
         output_file = request.form['output_file'].strip()
-        
-        # Run the scraper for each URL
-        for url in urls:
-            if url:  # Ensure it's not empty
-                run_scraper(url.strip(), output_file)
+
+        # Queue every URL as one batch crawl
+        urls = [url.strip() for url in urls if url.strip()]
+        if urls:
+            jobs.enqueue(urls, output_file)
 
         return redirect(url_for('success'))
 
@@ -21,15 +23,44 @@ def index():
 
 @app.route('/success')
 def success():
-    return "Scraping started! Check your output files for results."
+    return redirect(url_for('index'))
+
+@app.route('/jobs', methods=['GET', 'POST'])
+def job_list():
+    """List recent jobs, or queue a new one from JSON: {"urls": [...], "output_file": "..."}."""
+    if request.method == 'POST':
+        payload = request.get_json(force=True)
+        urls = [url.strip() for url in payload.get('urls', []) if url.strip()]
+        output_file = payload.get('output_file', '').strip()
+        if not urls or not output_file:
+            return jsonify({'error': 'urls and output_file are required'}), 400
+        job_id = jobs.enqueue(urls, output_file)
+        return jsonify(jobs.get_job(job_id)), 201
+
+    return jsonify(jobs.list_jobs())
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'job not found'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    if not jobs.cancel_job(job_id):
+        return jsonify({'error': 'job is not queued or running'}), 409
+    return jsonify(jobs.get_job(job_id))
 
-def run_scraper(url, output_file):
-    """Runs the scraper script for the given URL and output file."""
-    try:
-        # Run the scraper using subprocess
-        subprocess.Popen(['python3', 'scraper.py', url, output_file])
-    except Exception as e:
-        print(f"Failed to run scraper for {url}: {e}")
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stats of every crawl that has reported a snapshot, plus queue depth, in Prometheus text format."""
+    queue = [('crawl_jobs', {'status': status}, count) for status, count in jobs.count_jobs().items()]
+    return Response(metrics.render_prometheus(metrics.load_snapshots(), queue), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    # With the debug reloader the script runs twice; only the serving child starts workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        workers = int(os.getenv('JOB_WORKERS', '0')) or None
+        jobs.start_workers(workers)
     app.run(debug=True)
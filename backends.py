@@ -0,0 +1,178 @@
+# backends.py
+import asyncio
+import glob
+import os
+from collections import namedtuple
+
+# What a backend returns for one prompt; headers are the HTTP response headers, for rate limit tracking
+Completion = namedtuple('Completion', ['content', 'prompt_tokens', 'completion_tokens', 'headers'], defaults=(None,))
+
+# Used when neither LLM_MODEL nor a setting names one
+DEFAULT_OPENAI_MODEL = "gpt-4o-mini"
+
+class ExtractorBackend:
+    """Something that turns an extraction prompt into the model's JSON answer.
+
+    Subclasses implement `async complete(prompt)` returning a Completion;
+    retries, validation and concurrency limits stay in extractor.py. model_id
+    names the model for cache keys, so answers from different models never mix.
+    """
+    name = ''
+    model_id = ''
+
+    async def complete(self, prompt):
+        raise NotImplementedError
+
+class OpenAIBackend(ExtractorBackend):
+    """Any OpenAI-compatible chat completions server: the OpenAI API, or a local llama.cpp or vLLM server via base_url."""
+    name = 'openai'
+
+    def __init__(self, model=None, base_url=None, api_key=None):
+        import openai
+
+        self.model_id = model or DEFAULT_OPENAI_MODEL
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            if not base_url:
+                raise ValueError("API Key not found. Please set OPENAI_API_KEY in environment variables, or LLM_BASE_URL for a local server.")
+            api_key = 'not-needed'  # Local servers usually don't check it, but the client requires one
+        # Retries are left to extractor.complete_async, which knows the shared rate limit budget
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+
+    async def complete(self, prompt):
+        raw = await self.client.chat.completions.with_raw_response.create(
+            model=self.model_id,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=4095,
+            top_p=0.2,
+            frequency_penalty=0,
+            presence_penalty=0,
+            response_format={
+                "type": "json_object"
+            }
+        )
+        response = raw.parse()
+        usage = response.usage
+        return Completion(response.choices[0].message.content,
+                          usage.prompt_tokens if usage else 0, usage.completion_tokens if usage else 0, raw.headers)
+
+def json_from_text(text):
+    """Cut the JSON object out of a model answer that may have prose or code fences around it."""
+    start, end = text.find('{'), text.rfind('}')
+    return text[start:end + 1] if start != -1 and end > start else text
+
+class LocalBackend(ExtractorBackend):
+    """A small instruction-tuned model run in this process on CPU, with concurrent prompts batched into one generate call.
+
+    model_path is a Hugging Face model directory or id. A directory holding
+    *.onnx files is run with ONNX Runtime (optimum); anything else with
+    transformers on torch. Prompts are collected for up to max_wait seconds or
+    until batch_size are waiting, then generated together with greedy decoding.
+    Needs `pip install transformers torch` (plus `optimum[onnxruntime]` for ONNX).
+    """
+    name = 'local'
+
+    def __init__(self, model_path, batch_size=4, max_wait=0.05, max_new_tokens=512, threads=None):
+        try:
+            import torch
+            from transformers import AutoTokenizer, AutoModelForCausalLM
+        except ImportError as e:
+            raise RuntimeError("The local backend needs transformers and torch: pip install transformers torch") from e
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, padding_side='left')
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+
+        if os.path.isdir(model_path) and glob.glob(os.path.join(model_path, '*.onnx')):
+            from optimum.onnxruntime import ORTModelForCausalLM
+            self.model = ORTModelForCausalLM.from_pretrained(model_path)
+        else:
+            self.model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32)
+            self.model.eval()
+
+        self.model_id = os.path.basename(model_path.rstrip('/'))
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_new_tokens = max_new_tokens
+        self.waiting = []
+        self.timer = None
+        self.generating = None
+        self.tasks = set()  # The loop holds only weak references to tasks
+
+    async def complete(self, prompt):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.waiting.append((prompt, future))
+        if len(self.waiting) >= self.batch_size:
+            self.send()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self.send)
+        return await future
+
+    def send(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.waiting = self.waiting, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _run(self, batch):
+        # One generate at a time: a second one would only fight the first for the same cores
+        if self.generating is None:
+            self.generating = asyncio.Lock()
+        try:
+            async with self.generating:
+                completions = await asyncio.get_running_loop().run_in_executor(
+                    None, self.generate, [prompt for prompt, _ in batch])
+            for (_, future), completion in zip(batch, completions):
+                if not future.done():  # The caller was cancelled
+                    future.set_result(completion)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def generate(self, prompts):
+        """Generate answers for a batch of prompts; runs in a worker thread."""
+        texts = [
+            self.tokenizer.apply_chat_template([{"role": "user", "content": prompt}], tokenize=False, add_generation_prompt=True)
+            if self.tokenizer.chat_template else prompt
+            for prompt in prompts
+        ]
+        inputs = self.tokenizer(texts, return_tensors='pt', padding=True)
+        with self.torch.no_grad():
+            output = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens, do_sample=False,
+                                         pad_token_id=self.tokenizer.pad_token_id)
+
+        prompt_length = inputs['input_ids'].shape[1]
+        completions = []
+        for i, tokens in enumerate(output[:, prompt_length:]):
+            new_tokens = int((tokens != self.tokenizer.pad_token_id).sum())
+            text = self.tokenizer.decode(tokens, skip_special_tokens=True)
+            completions.append(Completion(json_from_text(text), int(inputs['attention_mask'][i].sum()), new_tokens))
+        return completions
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+    'local': LocalBackend,
+}
+
+def create_backend(name='openai', model=None, base_url=None, api_key=None, model_path=None, batch_size=4, max_new_tokens=512):
+    """Build the backend named by LLM_BACKEND from its settings."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == 'local':
+        if not model_path:
+            raise ValueError("The local backend needs LOCAL_MODEL_PATH")
+        return LocalBackend(model_path, batch_size=batch_size, max_new_tokens=max_new_tokens)
+    return OpenAIBackend(model=model, base_url=base_url, api_key=api_key)
@@ -0,0 +1,71 @@
+# batch.py
+import csv
+import time
+from urllib.parse import urlparse
+from twisted.internet import task
+from scrapy import signals
+
+def firm_domain(url):
+    """Domain used to group pages and bios by firm, without a leading www."""
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+def load_start_urls(path):
+    """Read start URLs from a text file (one per line) or a results CSV with a scraped_url column.
+
+    CSV inputs such as data/bulk_test.csv list bio pages, so each firm's homepage is
+    used instead and every firm is only crawled once.
+    """
+    with open(path, newline='', encoding='utf-8') as f:
+        first_line = f.readline()
+        f.seek(0)
+        if 'scraped_url' in first_line:
+            urls = []
+            for row in csv.DictReader(f):
+                parsed = urlparse(row['scraped_url'].strip())
+                if parsed.scheme and parsed.netloc:
+                    urls.append(f"{parsed.scheme}://{parsed.netloc}/")
+        else:
+            urls = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    # Keep the first URL seen for each firm
+    start_urls = {}
+    for url in urls:
+        start_urls.setdefault(firm_domain(url), url)
+    return list(start_urls.values())
+
+class FirmProgress:
+    """Log pages crawled and bios saved per firm while a batch runs, plus total elapsed time at the end."""
+
+    def __init__(self, stats, interval):
+        self.stats = stats
+        self.interval = interval
+        self.started = None
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        extension = cls(crawler.stats, crawler.settings.getfloat('PROGRESS_INTERVAL', 60))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.started = time.monotonic()
+        if self.interval:
+            self.task = task.LoopingCall(self.log_progress, spider)
+            self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.log_progress(spider)
+        elapsed = time.monotonic() - self.started
+        self.stats.set_value('batch/elapsed_seconds', round(elapsed, 1))
+        spider.logger.info(f"Batch finished ({reason}) in {elapsed:.1f}s")
+
+    def log_progress(self, spider):
+        for domain in sorted({firm_domain(url) for url in spider.start_urls}):
+            pages = self.stats.get_value(f'firm/{domain}/pages', 0)
+            bios = self.stats.get_value(f'firm/{domain}/bios', 0)
+            spider.logger.info(f"{domain}: {pages} pages crawled, {bios} bios saved")
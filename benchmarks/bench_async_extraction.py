@@ -0,0 +1,57 @@
+# benchmarks/bench_async_extraction.py
+"""Compare extraction throughput of the blocking extract_data against extract_data_async.
+
+Runs against a local fake OpenAI server, so no API key or network access is needed:
+
+    python benchmarks/bench_async_extraction.py --pages 40 --latency 0.5 --concurrency 5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai import start_fake_openai
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds the fake model takes per call')
+    parser.add_argument('--concurrency', type=int, default=5)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_openai(latency=args.latency)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+
+    import extractor
+    extractor.set_llm_concurrency(args.concurrency)
+
+    page = "<h1>Jane Doe</h1><p>Partner</p><a href=\"mailto:jdoe@example.com\">jdoe@example.com</a>"
+
+    # The extractor prints every response; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for _ in range(args.pages):
+            extractor.extract_data(page)
+        sync_elapsed = time.perf_counter() - start
+
+        async def run_async():
+            await asyncio.gather(*(extractor.extract_data_async(page) for _ in range(args.pages)))
+
+        start = time.perf_counter()
+        asyncio.run(run_async())
+        async_elapsed = time.perf_counter() - start
+
+    server.shutdown()
+
+    print(f"pages={args.pages} latency={args.latency}s concurrency={args.concurrency}")
+    print(f"blocking extract_data:    {sync_elapsed:7.2f}s  {args.pages / sync_elapsed * 60:8.1f} pages/min")
+    print(f"extract_data_async:       {async_elapsed:7.2f}s  {args.pages / async_elapsed * 60:8.1f} pages/min")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/bench_backends.py
+"""Compare extractor backends on a recorded corpus: per-call latency, throughput and accuracy against ground truth.
+
+Every profile and listing page that matches the ground truth (or every page,
+with --all-pages) is cleaned and reduced once, then sent to each backend in
+turn. The structured-data shortcut is skipped so every page reaches the model.
+Backends are given as:
+
+    replay          answers recorded in the corpus (the baseline the corpus was built with)
+    openai[:MODEL]  the OpenAI API, needs OPENAI_API_KEY
+    server:URL      an OpenAI-compatible server such as llama.cpp or vLLM, model name from --model
+    local:PATH      a small model on CPU via transformers, batched --batch-size prompts at a time
+    fake            the fake model from fake_openai.py, with --fake-latency seconds per call
+
+    python benchmarks/bench_backends.py --corpus corpus/ --backend replay --backend server:http://localhost:8080/v1 \\
+        --backend local:Qwen/Qwen2.5-0.5B-Instruct
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import OpenAIBackend, LocalBackend
+from bench_pipeline import load_truth, score
+from fake_openai import start_fake_openai
+from frontier import canonicalize_url
+from replay import Corpus, start_replay_server
+from sinks import FIELDNAMES, person_to_row
+
+class TimedBackend:
+    """Wrap a backend to record how long each call took, batching wait included."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.model_id = backend.model_id
+        self.latencies = []
+
+    async def complete(self, prompt):
+        start = time.perf_counter()
+        try:
+            return await self.backend.complete(prompt)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+def make_backend(spec, args, corpus):
+    kind, _, arg = spec.partition(':')
+    if kind == 'replay':
+        _, base_url = start_replay_server(corpus)
+        return OpenAIBackend(base_url=base_url, api_key='sk-replay')
+    if kind == 'openai':
+        return OpenAIBackend(model=arg or None)
+    if kind == 'server':
+        return OpenAIBackend(model=args.model, base_url=arg)
+    if kind == 'local':
+        return LocalBackend(arg, batch_size=args.batch_size, max_new_tokens=args.max_new_tokens)
+    if kind == 'fake':
+        _, base_url = start_fake_openai(latency=args.fake_latency)
+        return OpenAIBackend(base_url=base_url, api_key='sk-fake')
+    sys.exit(f"Unknown backend {spec!r}")
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))] if values else 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', required=True)
+    parser.add_argument('--backend', action='append', help="Backend to compare; repeat for several (default: replay)")
+    parser.add_argument('--truth', nargs='+', default=['human_output.csv', 'data/bulk_test.csv'])
+    parser.add_argument('--all-pages', action='store_true', help="Run every page in the corpus, not just ground-truth URLs")
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--token-budget', type=int, default=1500)
+    parser.add_argument('--model', default='default', help="Model name sent to server: backends")
+    parser.add_argument('--batch-size', type=int, default=4, help="Prompts per generate call for local: backends")
+    parser.add_argument('--max-new-tokens', type=int, default=512)
+    parser.add_argument('--fake-latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    corpus = Corpus(args.corpus)
+    truth = load_truth(args.truth)
+
+    import extractor
+    from parser import clean_html
+    from classifier import is_profile_page, is_listing_page
+    from reducer import reduce_to_profile
+    from scraper import EmployeeSpider
+
+    spider = EmployeeSpider(start_url='http://localhost/', csv_file=os.devnull)  # For its validation helpers
+
+    # The same model inputs for every backend: (url, mode, text)
+    pages = []
+    for key, entry in corpus.pages.items():
+        if not (args.all_pages or key in truth):
+            continue
+        url = entry['url']
+        cleaned = clean_html(corpus.page(url)[2].decode('utf-8', errors='replace'))
+        if is_profile_page(url, cleaned):
+            pages.append((url, 'profile', reduce_to_profile(cleaned, args.token_budget)))
+        elif is_listing_page(cleaned):
+            pages.append((url, 'listing', cleaned))
+    if not pages:
+        sys.exit(f"No profile or listing pages in {args.corpus} match the ground truth; record some or pass --all-pages")
+
+    def save(output, json_data, text, url):
+        json_data = spider.add_scraped_url(json_data, url)
+        if json_data and spider.validate_data_in_content(json_data, text):
+            output[canonicalize_url(url)].append(person_to_row(json_data))
+
+    async def process(output, url, mode, text):
+        if mode == 'listing':
+            for person in await extractor.extract_people_async(text):
+                save(output, {'person': person}, text, url)
+        else:
+            save(output, json.loads(await extractor.extract_data_async(text)), text, url)
+
+    expected = {key: rows for key, rows in truth.items() if key in corpus.pages}
+    results = []
+    for spec in args.backend or ['replay']:
+        backend = TimedBackend(make_backend(spec, args, corpus))
+        extractor.set_backend(backend)
+        extractor.set_llm_concurrency(args.concurrency)  # Fresh semaphore for each event loop
+        extractor.usage.clear()
+        output = defaultdict(list)
+
+        async def run_all():
+            await asyncio.gather(*(process(output, *page) for page in pages))
+
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+
+        total, found, accuracy = score(expected, output)
+        results.append((spec, backend, elapsed, dict(extractor.usage), found, total, accuracy))
+
+    print(f"pages={len(pages)} concurrency={args.concurrency}")
+    print("backend                          calls  fail   p50_ms   p95_ms  pages/s  out_tok/s   rows  mean_acc")
+    for spec, backend, elapsed, usage, found, total, accuracy in results:
+        mean_accuracy = statistics.mean(accuracy.values()) if accuracy else 0
+        print(f"{spec[:32]:32s} {usage.get('calls', 0):5d} {usage.get('failures', 0):5d} "
+              f"{percentile(backend.latencies, 0.5) * 1000:8.0f} {percentile(backend.latencies, 0.95) * 1000:8.0f} "
+              f"{len(pages) / elapsed:8.2f} {usage.get('completion_tokens', 0) / elapsed:10.1f} "
+              f"{found:3d}/{total:<3d} {mean_accuracy:8.1%}")
+
+    print("field accuracy".ljust(26) + ''.join(f"{spec[:12]:>13s}" for spec, *_ in results))
+    for field in FIELDNAMES[1:]:
+        print(f"  {field:24s}" + ''.join(f"{result[6].get(field, 0):13.1%}" for result in results))
+
+if __name__ == '__main__':
+    main()
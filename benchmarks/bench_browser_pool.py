@@ -0,0 +1,131 @@
+# benchmarks/bench_browser_pool.py
+"""Compare pages/sec and peak memory of Playwright crawls with and without the browser pool.
+
+Serves a generated firm site on localhost, with stylesheets, fonts and images
+on every page, and crawls it with every page rendered in the browser. Each
+configuration runs in its own process, since the reactor can only start once:
+
+    python benchmarks/bench_browser_pool.py --bios 60 --concurrency 8
+"""
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ASSETS = ('<link rel="stylesheet" href="/assets/site.css">'
+          '<style>@font-face{font-family:f;src:url(/assets/font.woff2)}</style>'
+          '<script src="/assets/app.js"></script>')
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def write_site(root, bios):
+    """A firm site: home page, a people directory and one bio per person, each pulling in the usual assets."""
+    os.makedirs(os.path.join(root, 'assets'), exist_ok=True)
+    for name, body in [('site.css', 'body{font-family:f}'), ('font.woff2', 'x' * 20000), ('app.js', 'document.title += "";'),
+                       ('hero.jpg', 'x' * 200000)]:
+        with open(os.path.join(root, 'assets', name), 'w') as f:
+            f.write(body)
+
+    def page(path, body):
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+        with open(os.path.join(root, path, 'index.html'), 'w') as f:
+            f.write(f'<html><head><title>Firm</title>{ASSETS}</head><body><img src="/assets/hero.jpg">{body}</body></html>')
+
+    page('', '<h1>Smith &amp; Partners</h1><a href="/people/">Our People</a>')
+    page('people', '<h1>Our People</h1>' + ''.join(f'<a href="/people/person-{i}/">Person {i}</a>' for i in range(bios)))
+    for i in range(bios):
+        page(f'people/person-{i}', f'<h1>Person {i}</h1><p>Partner</p><p>{"Advises clients on disputes. " * 20}</p>'
+                                   f'<a href="mailto:person.{i}@example.com">person.{i}@example.com</a>'
+                                   f'<a href="tel:212-555-{1000 + i}">212-555-{1000 + i}</a>')
+
+def child(args):
+    """Crawl the site in this process and print the interesting stats as JSON."""
+    from twisted.internet import asyncioreactor
+    asyncioreactor.install()
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from twisted.internet import task
+    from browser_pool import process_tree_rss
+    from scraper import EmployeeSpider
+
+    EmployeeSpider.custom_settings.update({
+        'BROWSER_POOL_ENABLED': args.pool,
+        'FETCH_TIERING_ENABLED': False,  # Every page through the browser
+        'CONCURRENT_REQUESTS': args.concurrency, 'CONCURRENT_REQUESTS_PER_DOMAIN': args.concurrency,
+        'PLAYWRIGHT_MAX_PAGES_PER_CONTEXT': args.concurrency,
+        'AUTOTHROTTLE_ENABLED': False, 'DOWNLOAD_DELAY': 0, 'FRONTIER_EARLY_STOP': False,
+        'EXTRACTION_CACHE_ENABLED': False, 'DEDUP_ENABLED': False, 'PROVENANCE_ENABLED': False, 'LISTING_EXTRACTION_ENABLED': False,
+        'BUNDLE_SIZE': 1, 'METRICS_INTERVAL': 0, 'LOG_LEVEL': 'WARNING',
+    })
+    peak = [0]
+    result = {}
+
+    def sample():
+        peak[0] = max(peak[0], process_tree_rss())
+
+    def spider_closed(spider):
+        result.update({key: value for key, value in spider.crawler.stats.get_stats().items()
+                       if key.startswith(('playwright/', 'browser_pool/')) and isinstance(value, (int, float))})
+
+    sampler = task.LoopingCall(sample)
+    process = CrawlerProcess()
+    crawler = process.create_crawler(EmployeeSpider)
+    crawler.signals.connect(spider_closed, signal=signals.spider_closed)
+    process.crawl(crawler, start_url=args.url, csv_file=os.devnull)
+    sampler.start(0.2)
+    start = time.perf_counter()
+    process.start()
+    result['wall'] = time.perf_counter() - start
+    result['peak_rss_mb'] = round(peak[0] / (1024 * 1024), 1)
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bios', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--pool', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    from fake_openai import start_fake_openai
+
+    root = tempfile.mkdtemp(prefix='bench_browser_pool_')
+    write_site(root, args.bios)
+    site = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=root))
+    threading.Thread(target=site.serve_forever, daemon=True).start()
+    _, base_url = start_fake_openai(latency=0)
+    env = dict(os.environ, LLM_BASE_URL=base_url, OPENAI_API_KEY='sk-fake', METRICS_DIR=os.path.join(root, 'metrics'))
+
+    results = []
+    for name, pool in [('new page per request', False), ('browser pool', True)]:
+        command = [sys.executable, os.path.abspath(__file__), '--child', '--url', f'http://127.0.0.1:{site.server_address[1]}/',
+                   '--concurrency', str(args.concurrency)] + (['--pool'] if pool else [])
+        output = subprocess.run(command, env=env, cwd=root, capture_output=True, text=True)
+        lines = output.stdout.strip().splitlines()
+        if output.returncode or not lines:
+            sys.exit(f"{name} failed:\n{output.stderr[-3000:]}")
+        results.append((name, json.loads(lines[-1])))
+
+    print(f"bios={args.bios} concurrency={args.concurrency}")
+    print("config                  pages  pages/s  peak_rss_mb  subrequests  aborted  pages_opened")
+    for name, stats in results:
+        pages = stats.get('playwright/response_count/resource_type/document', 0)
+        print(f"{name:22s} {pages:6d} {pages / stats['wall']:8.2f} {stats['peak_rss_mb']:12.1f} "
+              f"{stats.get('playwright/request_count', 0):12d} {stats.get('playwright/request_count/aborted', 0):8d} "
+              f"{stats.get('playwright/page_count', 0):13d}")
+
+if __name__ == '__main__':
+    main()
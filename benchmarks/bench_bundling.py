@@ -0,0 +1,69 @@
+# benchmarks/bench_bundling.py
+"""Compare model round trips and wall time for one call per bio, bundled bios, and one call per listing page.
+
+Runs against a local fake OpenAI server, so no API key or network access is needed:
+
+    python benchmarks/bench_bundling.py --people 40 --latency 0.5 --bundle-size 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai import start_fake_openai
+
+def synthetic_bio(i):
+    return (f"<h1>Person {i}</h1><p>Partner</p><p>Handles commercial litigation for clients across the state.</p>"
+            f"<a href=\"mailto:person.{i}@example.com\">person.{i}@example.com</a>")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--people', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds the fake model takes per call')
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--bundle-size', type=int, default=4)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_openai(latency=args.latency)
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+
+    import extractor
+
+    bios = [synthetic_bio(i) for i in range(args.people)]
+    listing = ''.join(bios)
+
+    async def one_per_bio():
+        return await asyncio.gather(*(extractor.extract_data_async(bio) for bio in bios))
+
+    async def bundled():
+        bundler = extractor.BioBundler(args.bundle_size, max_wait=0.2)
+        return await asyncio.gather(*(bundler.extract(bio) for bio in bios))
+
+    async def listing_page():
+        return await extractor.extract_people_async(listing)
+
+    results = []
+    # The extractor prints every response; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, run in [('one call per bio', one_per_bio), (f'bundles of {args.bundle_size}', bundled),
+                          ('one listing page', listing_page)]:
+            extractor.set_llm_concurrency(args.concurrency)  # Fresh semaphore for each event loop
+            calls_before = len(server.prompts)
+            start = time.perf_counter()
+            people = asyncio.run(run())
+            results.append((name, len(server.prompts) - calls_before, time.perf_counter() - start, len(people)))
+
+    server.shutdown()
+
+    print(f"people={args.people} latency={args.latency}s concurrency={args.concurrency}")
+    for name, calls, elapsed, people in results:
+        print(f"{name:18s} {calls:4d} model calls  {elapsed:6.2f}s  {people} people")
+
+if __name__ == '__main__':
+    main()
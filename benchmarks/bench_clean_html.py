@@ -0,0 +1,93 @@
+# benchmarks/bench_clean_html.py
+"""Check the lxml cleaner against the BeautifulSoup one and time both.
+
+    python benchmarks/bench_clean_html.py [corpus_dir]
+
+corpus_dir holds saved firm pages (*.html). Without it a synthetic Elementor-style
+page set is generated so the benchmark still runs.
+"""
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import clean_html_bs4, clean_html_lxml
+
+EMPTY_TAG = re.compile(r'<(a|p|h[1-6])(\s[^>]*)?>\s*</\1>')
+
+def normalize(text):
+    """Reduce cleaner output to what matters for extraction: kept tags, attributes and text."""
+    previous = None
+    while previous != text:
+        previous = text
+        text = EMPTY_TAG.sub(' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    return re.sub(r'\s*(<[^>]+>)\s*', r'\1', text).strip()
+
+def synthetic_page(index, attorneys=40):
+    """A page shaped like a WordPress/Elementor firm site: deep wrappers, inline styles, nav and scripts.
+
+    Every other page has no doctype, which neither cleaner may add.
+    """
+    cards = []
+    for n in range(attorneys):
+        cards.append(
+            f'<div class="elementor-column elementor-col-33" data-id="c{n}"><div class="elementor-widget-wrap">'
+            f'<div class="elementor-element" data-settings=\'{{"_animation":"fadeIn"}}\' style="margin:0">'
+            f'<div class="elementor-widget-container"><h3 class="elementor-heading-title">Attorney {index}-{n}</h3>'
+            f'<p class="title">Partner</p><a href="tel:2125550{n:03d}" class="phone">(212) 555-0{n:03d}</a>'
+            f'<a href="mailto:a{n}@firm{index}.com" onclick="track()">a{n}@firm{index}.com</a>'
+            f'<span class="empty"> </span><!-- card {n} --></div></div></div></div>'
+        )
+    return (
+        ('<!DOCTYPE html>' if index % 2 == 0 else '') +
+        '<html lang="en"><head><meta charset="utf-8"><title>Our Attorneys</title>'
+        '<style>.a{color:red}</style><script>window.dataLayer=[];</script>'
+        '<script type="application/ld+json">{"@type":"LegalService","name":"Firm"}</script></head>'
+        '<body class="page"><nav><ul><li><a href="/">Home</a></li><li><a href="/attorneys/">Attorneys</a></li></ul></nav>'
+        '<div class="elementor-section"><div class="elementor-container">'
+        + ''.join(cards) +
+        '</div></div><footer><p>&copy; Firm &amp; Partners</p></footer>'
+        '<script src="/wp-includes/js/jquery.js"></script></body></html>'
+    )
+
+def load_corpus(corpus_dir):
+    if corpus_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append((os.path.basename(path), f.read()))
+        return pages
+    return [(f'synthetic-{i}.html', synthetic_page(i)) for i in range(50)]
+
+def main():
+    pages = load_corpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    if not pages:
+        print("No pages found")
+        return
+
+    mismatches = 0
+    timings = {'bs4': 0.0, 'lxml': 0.0}
+    for name, html_content in pages:
+        start = time.perf_counter()
+        expected = clean_html_bs4(html_content)
+        timings['bs4'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = clean_html_lxml(html_content)
+        timings['lxml'] += time.perf_counter() - start
+
+        if normalize(expected) != normalize(actual):
+            mismatches += 1
+            print(f"Output differs: {name}")
+
+    size = sum(len(html_content) for _, html_content in pages) / 1024
+    print(f"{len(pages)} pages, {size:.0f} KiB, {mismatches} mismatches")
+    for backend, elapsed in timings.items():
+        print(f"{backend:5s} {elapsed * 1000 / len(pages):8.2f} ms/page")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# benchmarks/bench_discovery.py
+"""Compare pages fetched per firm with and without sitemap discovery.
+
+Serves three generated firm sites on localhost, each with a people directory,
+N bios and a few dozen pages of practice areas and insights that link to one
+another:
+
+    sitemap    robots.txt -> sitemap index -> page sitemap, gzipped attorney sitemap and a skipped post sitemap
+    wordpress  no sitemap, but a WordPress REST API with an 'attorney' post type
+    plain      neither, so discovery falls back to crawling links
+
+and crawls all three together once with SITEMAP_DISCOVERY_ENABLED and once
+without, each in its own process since the reactor can only start once:
+
+    python benchmarks/bench_discovery.py --bios 40 --pages 60
+"""
+import argparse
+import functools
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRMS = ['sitemap', 'wordpress', 'plain']
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def guess_type(self, path):
+        if '/wp-json/' in path.replace(os.sep, '/'):
+            return 'application/json'
+        return super().guess_type(path)
+
+    def end_headers(self):
+        if '/wp-json/' in self.path:
+            self.send_header('X-WP-TotalPages', '1')
+        super().end_headers()
+
+def write_firm(root, kind, base_url, bios, pages):
+    """A firm site with a home page, `pages` navigation pages, a people directory and `bios` bios."""
+    def write(path, body, mode='w'):
+        os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+        with open(os.path.join(root, path), mode) as f:
+            f.write(body)
+
+    nav_paths = [f'/practice-areas/area-{i}/' if i % 2 else f'/insights/topic-{i}/' for i in range(pages)]
+    bio_paths = [f'/attorneys/person-{i}/' for i in range(bios)]
+    nav = ''.join(f'<a href="{path}">{path}</a>' for path in ['/', '/attorneys/'] + nav_paths)
+
+    def page(path, body):
+        write(path.lstrip('/') + 'index.html', f'<html><head><title>Firm</title></head><body><nav>{nav}</nav>{body}'
+                                              f'<p>{"We advise clients across many industries. " * 10}</p></body></html>')
+
+    page('/', '<h1>Smith &amp; Partners</h1>')
+    for path in nav_paths:
+        page(path, f'<h1>{path}</h1>')
+    page('/attorneys/', '<h1>Our Attorneys</h1>' + ''.join(f'<a href="{path}">Person {i}</a>' for i, path in enumerate(bio_paths)))
+    for i, path in enumerate(bio_paths):
+        page(path, f'<h1>Person {i}</h1><p>Partner</p><p>{"Advises clients on disputes. " * 20}</p>'
+                   f'<a href="mailto:person.{i}@example.com">person.{i}@example.com</a>'
+                   f'<a href="tel:212-555-{1000 + i}">212-555-{1000 + i}</a>')
+
+    def urlset(paths):
+        return ('<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                + ''.join(f'<url><loc>{base_url}{path}</loc></url>' for path in paths) + '</urlset>')
+
+    if kind == 'sitemap':
+        write('robots.txt', f'User-agent: *\nDisallow: /wp-admin/\nSitemap: {base_url}/sitemap_index.xml\n')
+        write('sitemap_index.xml', '<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+              + ''.join(f'<sitemap><loc>{base_url}/{name}</loc></sitemap>'
+                        for name in ['page-sitemap.xml', 'attorney-sitemap.xml.gz', 'post-sitemap.xml'])
+              + '</sitemapindex>')
+        write('page-sitemap.xml', urlset(['/', '/attorneys/'] + nav_paths))
+        write('attorney-sitemap.xml.gz', gzip.compress(urlset(bio_paths).encode('utf-8')), mode='wb')
+        write('post-sitemap.xml', urlset([f'/blog/post-{i}/' for i in range(500)]))
+    elif kind == 'wordpress':
+        write('wp-json/wp/v2/types', json.dumps({'page': {'rest_base': 'pages'}, 'attorney': {'rest_base': 'attorney'}}))
+        write('wp-json/wp/v2/attorney', json.dumps([{'link': f'{base_url}{path}'} for path in bio_paths]))
+
+def child(args):
+    """Crawl the firms in this process and print the interesting stats as JSON."""
+    from twisted.internet import asyncioreactor
+    asyncioreactor.install()
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scraper import EmployeeSpider
+
+    EmployeeSpider.custom_settings.update({
+        'SITEMAP_DISCOVERY_ENABLED': args.discovery,
+        'CONCURRENT_REQUESTS': 16, 'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'DOWNLOAD_DELAY': 0, 'RATE_CONTROL_ENABLED': False,
+        'EXTRACTION_CACHE_ENABLED': False, 'DEDUP_ENABLED': False, 'PROVENANCE_ENABLED': False, 'LISTING_EXTRACTION_ENABLED': False,
+        'BUNDLE_SIZE': 1, 'METRICS_INTERVAL': 0, 'PROGRESS_INTERVAL': 0, 'LOG_LEVEL': 'WARNING',
+    })
+    result = {}
+
+    def spider_closed(spider):
+        result.update({key: value for key, value in spider.crawler.stats.get_stats().items()
+                       if key.startswith(('firm/', 'discovery/', 'downloader/request_count')) and isinstance(value, (int, float))})
+
+    process = CrawlerProcess()
+    crawler = process.create_crawler(EmployeeSpider)
+    crawler.signals.connect(spider_closed, signal=signals.spider_closed)
+    process.crawl(crawler, start_url=args.url, csv_file=os.devnull)
+    start = time.perf_counter()
+    process.start()
+    result['wall'] = time.perf_counter() - start
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bios', type=int, default=40)
+    parser.add_argument('--pages', type=int, default=60, help="Navigation pages per firm besides the directory and bios")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--discovery', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--url', action='append', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    from fake_openai import start_fake_openai
+
+    root = tempfile.mkdtemp(prefix='bench_discovery_')
+    domains = {}
+    for kind in FIRMS:
+        directory = os.path.join(root, kind)
+        os.makedirs(directory)
+        site = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(QuietHandler, directory=directory))
+        threading.Thread(target=site.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{site.server_address[1]}'
+        write_firm(directory, kind, base_url, args.bios, args.pages)
+        domains[kind] = f'127.0.0.1:{site.server_address[1]}'
+    _, llm_url = start_fake_openai(latency=0)
+    env = dict(os.environ, LLM_BASE_URL=llm_url, OPENAI_API_KEY='sk-fake', METRICS_DIR=os.path.join(root, 'metrics'))
+
+    results = []
+    for name, discovery in [('link crawl', False), ('sitemap discovery', True)]:
+        command = [sys.executable, os.path.abspath(__file__), '--child'] + (['--discovery'] if discovery else [])
+        for domain in domains.values():
+            command += ['--url', f'http://{domain}/']
+        output = subprocess.run(command, env=env, cwd=root, capture_output=True, text=True)
+        lines = output.stdout.strip().splitlines()
+        if output.returncode or not lines:
+            sys.exit(f"{name} failed:\n{output.stderr[-3000:]}")
+        results.append((name, json.loads(lines[-1])))
+
+    print(f"bios={args.bios} navigation pages={args.pages} per firm")
+    print("config              firm        pages  bios  discovered")
+    for name, stats in results:
+        for kind, domain in domains.items():
+            print(f"{name:19s} {kind:10s} {stats.get(f'firm/{domain}/pages', 0):6d} {stats.get(f'firm/{domain}/bios', 0):5d} "
+                  f"{stats.get(f'firm/{domain}/discovered', 0):11d}")
+        print(f"{name:19s} {'total':10s} requests={stats.get('downloader/request_count', 0)} "
+              f"discovery_requests={stats.get('discovery/requests', 0)} fallbacks={stats.get('discovery/fallback', 0)} "
+              f"wall={stats['wall']:.1f}s")
+
+if __name__ == '__main__':
+    main()
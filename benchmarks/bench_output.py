@@ -0,0 +1,72 @@
+# benchmarks/bench_output.py
+"""Time writing records one open/append at a time against the batched output sinks.
+
+    python benchmarks/bench_output.py [--records 100000]
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sinks
+from sinks import FIELDNAMES, person_to_row
+
+def make_record(n):
+    return {
+        'scraped_url': f'https://firm.example/attorneys/person-{n}/',
+        'person': {
+            'first_name': 'Jane', 'middle_name': 'Q.', 'last_name': f'Doe{n}', 'job_title': 'Partner',
+            'direct_phone': '212-555-0100', 'direct_phone_extension': '', 'mobile_phone': '',
+            'email': f'jdoe{n}@firm.example', 'location_city': 'New York', 'location_state': 'NY',
+            'profile_image_url': '', 'practice_areas': 'Commercial Litigation, Appeals'
+        }
+    }
+
+def per_record_append(path, records):
+    """The previous save_to_csv: open, check for the file, write one row, close."""
+    for data in records:
+        file_exists = os.path.isfile(path)
+        with open(path, 'a', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+            if not file_exists:
+                writer.writeheader()
+            writer.writerow(person_to_row(data))
+
+def sink_write(path, records):
+    sink = sinks.get_sink(path, batch_size=1000)
+    for data in records:
+        sink.write(data)
+    sinks.close_all()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    records = [make_record(n) for n in range(args.records)]
+    workdir = tempfile.mkdtemp()
+    try:
+        cases = [('per-record csv', per_record_append, 'old.csv')]
+        for extension in ('.csv', '.jsonl', '.sqlite', '.parquet'):
+            cases.append((f'sink {extension[1:]}', sink_write, 'out' + extension))
+
+        for name, writer, filename in cases:
+            path = os.path.join(workdir, filename)
+            start = time.perf_counter()
+            try:
+                writer(path, records)
+            except ImportError as e:
+                print(f"{name:16s} skipped ({e})")
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"{name:16s} {elapsed:7.2f}s  {args.records / elapsed:10.0f} records/s")
+    finally:
+        shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# benchmarks/bench_pipeline.py
+"""Run parse -> clean -> extract -> validate -> save over a recorded corpus and score it against ground truth.
+
+Pages come from a corpus recorded with `python main.py --record DIR ...` or
+`python replay.py fetch DIR human_output.csv`. Model answers are replayed from
+the corpus, so the run is offline and free; --live calls the real API instead
+and records its answers for later replays:
+
+    python benchmarks/bench_pipeline.py --corpus corpus/ --truth human_output.csv data/bulk_test.csv
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import Corpus, use_replay_model
+from frontier import canonicalize_url
+from sinks import FIELDNAMES, person_to_row, get_sink, close_all
+
+STAGES = ['clean', 'classify', 'structured', 'reduce', 'extract', 'validate', 'save']
+
+def load_truth(csv_files):
+    """Ground-truth rows grouped by canonical scraped_url."""
+    truth = defaultdict(list)
+    for csv_file in csv_files:
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('scraped_url'):
+                    truth[canonicalize_url(row['scraped_url'])].append(row)
+    return truth
+
+def normalize(field, value):
+    value = ' '.join((value or '').split()).strip(' .').lower()
+    if field.endswith('phone') or field.endswith('extension'):
+        return re.sub(r'\D', '', value)
+    return value
+
+def score(truth, output):
+    """Per-field share of ground-truth rows whose value we reproduced, matching rows by URL and last name."""
+    correct = defaultdict(int)
+    total = found = 0
+    for key, expected_rows in truth.items():
+        produced = output.get(key, [])
+        for expected in expected_rows:
+            total += 1
+            match = next((row for row in produced
+                          if normalize('last_name', row['last_name']) == normalize('last_name', expected['last_name'])),
+                         produced[0] if len(produced) == 1 else None)
+            if match is None:
+                continue
+            found += 1
+            for field in FIELDNAMES[1:]:
+                correct[field] += normalize(field, match[field]) == normalize(field, expected[field])
+    return total, found, {field: correct[field] / total for field in FIELDNAMES[1:]} if total else {}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--corpus', required=True)
+    parser.add_argument('--truth', nargs='+', default=['human_output.csv', 'data/bulk_test.csv'])
+    parser.add_argument('--all-pages', action='store_true', help="Run every page in the corpus, not just ground-truth URLs")
+    parser.add_argument('--live', action='store_true', help="Call the real model and record its answers")
+    parser.add_argument('--concurrency', type=int, default=5)
+    parser.add_argument('--token-budget', type=int, default=1500)
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'bench_pipeline.csv'))
+    args = parser.parse_args()
+
+    corpus = Corpus(args.corpus)
+    truth = load_truth(args.truth)
+    server = None if args.live else use_replay_model(corpus)
+
+    import extractor
+    from parser import clean_html
+    from classifier import is_profile_page, is_listing_page
+    from structured import extract_structured, is_complete, merge_with_llm
+    from reducer import reduce_to_profile, count_tokens
+    from scraper import EmployeeSpider
+
+    if args.live:
+        extractor.set_response_recorder(corpus.save_response)
+    extractor.set_llm_concurrency(args.concurrency)
+
+    urls = [entry['url'] for key, entry in corpus.pages.items() if args.all_pages or key in truth]
+    if not urls:
+        sys.exit(f"No pages in {args.corpus} match the ground truth; record some or pass --all-pages")
+
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    sink = get_sink(args.output)
+    spider = EmployeeSpider(start_url='http://localhost/', csv_file=args.output)  # For its validation helpers
+
+    timings = defaultdict(float)
+    counts = defaultdict(int)
+    output = defaultdict(list)
+
+    @contextlib.contextmanager
+    def timed(stage):
+        start = time.perf_counter()
+        yield
+        timings[stage] += time.perf_counter() - start
+
+    def save(json_data, text, url):
+        with timed('validate'):
+            json_data = spider.add_scraped_url(json_data, url)
+            valid = bool(json_data) and spider.validate_data_in_content(json_data, text)
+        if valid:
+            with timed('save'):
+                sink.write(json_data)
+            output[canonicalize_url(url)].append(person_to_row(json_data))
+            counts['saved'] += 1
+
+    async def process(url):
+        _, _, body = corpus.page(url)
+        html = body.decode('utf-8', errors='replace')
+        with timed('clean'):
+            cleaned = clean_html(html)
+        with timed('classify'):
+            profile = is_profile_page(url, cleaned)
+            listing = not profile and is_listing_page(cleaned)
+
+        if listing:
+            counts['listing'] += 1
+            with timed('extract'):
+                people = await extractor.extract_people_async(cleaned)
+            for person in people:
+                save({'person': person}, cleaned, url)
+            return
+        if not profile:
+            counts['skipped'] += 1
+            return
+
+        counts['profile'] += 1
+        with timed('structured'):
+            structured = extract_structured(html, cleaned)
+        with timed('reduce'):
+            reduced = reduce_to_profile(cleaned, args.token_budget)
+        counts['page_tokens'] += count_tokens(cleaned)
+        counts['input_tokens'] += count_tokens(reduced)
+
+        json_data = structured
+        if not is_complete(structured):
+            with timed('extract'):
+                response = await extractor.extract_data_async(reduced)
+            try:
+                json_data = merge_with_llm(structured, json.loads(response))
+            except json.JSONDecodeError:
+                pass
+        save(json_data, reduced, url)
+
+    async def run_all():
+        await asyncio.gather(*(process(url) for url in urls))
+
+    # The extractor prints every response; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        elapsed = time.perf_counter() - start
+        close_all()
+
+    print(f"pages={len(urls)} profile={counts['profile']} listing={counts['listing']} skipped={counts['skipped']} "
+          f"saved={counts['saved']}")
+    print(f"wall {elapsed:.2f}s  {len(urls) / elapsed:.1f} pages/s")
+    print("stage        total_s  ms/page")
+    for stage in STAGES:
+        print(f"{stage:12s} {timings[stage]:7.2f} {timings[stage] * 1000 / len(urls):8.1f}")
+    print(f"tokens: {counts['page_tokens']} on profile pages, {counts['input_tokens']} sent to the model")
+    if server:
+        print(f"model answers replayed: {server.hits}, not in corpus: {server.misses}")
+
+    total, found, accuracy = score({key: rows for key, rows in truth.items() if key in corpus.pages}, output)
+    print(f"ground truth: {found}/{total} rows produced")
+    for field, share in accuracy.items():
+        print(f"  {field:24s} {share:6.1%}")
+
+if __name__ == '__main__':
+    main()
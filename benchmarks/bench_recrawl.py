@@ -0,0 +1,215 @@
+# benchmarks/bench_recrawl.py
+"""Compare a full sweep with an incremental re-crawl of the same firms after a few bios change.
+
+Serves two generated firm sites on localhost: one answering conditional GETs
+(ETag and Last-Modified, like most CMSs behind a CDN) and one sending no
+validators at all, where only the content fingerprint can tell a page is
+unchanged. Each firm has a people directory, N bios and navigation pages.
+
+The first incremental run fetches everything and records the baseline. Then
+on each site a few bios get a new phone number, a few are removed and a few
+are added, and the firms are crawled again, once incrementally and once as a
+full sweep for comparison. Each run is its own process, since the reactor
+can only start once:
+
+    python benchmarks/bench_recrawl.py --bios 60 --pages 40 --changes 3
+"""
+import argparse
+import csv
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ValidatingHandler(SimpleHTTPRequestHandler):
+    """Static files with a strong ETag next to the stock Last-Modified, or with neither."""
+    validators = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        self.etag = None
+        if not self.validators:
+            del self.headers['If-Modified-Since']
+            return super().send_head()
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            if self.headers.get('If-None-Match') == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'last-modified' and not self.validators:
+            return
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        if self.etag:
+            self.send_header('ETag', self.etag)
+        super().end_headers()
+
+class NoValidatorsHandler(ValidatingHandler):
+    validators = False
+
+def write_page(root, path, nav, body):
+    os.makedirs(os.path.join(root, path.lstrip('/')), exist_ok=True)
+    with open(os.path.join(root, path.lstrip('/'), 'index.html'), 'w') as f:
+        f.write(f'<html><head><title>Firm</title></head><body><nav>{nav}</nav>{body}'
+                f'<p>{"We advise clients across many industries. " * 10}</p></body></html>')
+
+def write_bio(root, nav, i, phone_suffix=1000):
+    write_page(root, f'/attorneys/person-{i}/', nav,
+               f'<h1>Person {i}</h1><p>Partner</p><p>{"Advises clients on disputes. " * 20}</p>'
+               f'<a href="mailto:person.{i}@example.com">person.{i}@example.com</a>'
+               f'<a href="tel:212-555-{phone_suffix + i}">212-555-{phone_suffix + i}</a>')
+
+def write_firm(root, bios, pages):
+    """A firm site: home page, navigation pages, a people directory and the given bios."""
+    nav_paths = [f'/practice-areas/area-{i}/' for i in range(pages)]
+    nav = ''.join(f'<a href="{path}">{path}</a>' for path in ['/', '/attorneys/'] + nav_paths)
+    write_page(root, '/', nav, '<h1>Smith &amp; Partners</h1>')
+    for path in nav_paths:
+        write_page(root, path, nav, f'<h1>{path}</h1>')
+    write_directory(root, nav, bios)
+    for i in bios:
+        write_bio(root, nav, i)
+    return nav
+
+def write_directory(root, nav, bios):
+    write_page(root, '/attorneys/', nav, '<h1>Our Attorneys</h1>' + ''.join(f'<a href="/attorneys/person-{i}/">Person {i}</a>' for i in bios))
+
+def change_firm(root, nav, bios, changes):
+    """Give `changes` bios a new phone number, remove as many and add as many. Returns the new bio list."""
+    changed, removed = bios[:changes], bios[changes:2 * changes]
+    added = list(range(max(bios) + 1, max(bios) + 1 + changes))
+    for i in changed:
+        write_bio(root, nav, i, phone_suffix=2000)
+    for i in removed:
+        shutil.rmtree(os.path.join(root, 'attorneys', f'person-{i}'))
+    for i in added:
+        write_bio(root, nav, i)
+    bios = [i for i in bios if i not in removed] + added
+    write_directory(root, nav, bios)
+    return bios
+
+def child(args):
+    """Crawl the firms in this process and print the interesting stats as JSON."""
+    from twisted.internet import asyncioreactor
+    asyncioreactor.install()
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scraper import EmployeeSpider
+
+    EmployeeSpider.custom_settings.update({
+        'INCREMENTAL_ENABLED': args.incremental, 'INCREMENTAL_STATE_PATH': args.state,
+        'CONCURRENT_REQUESTS': 16, 'CONCURRENT_REQUESTS_PER_DOMAIN': 4,
+        'DOWNLOAD_DELAY': 0, 'RATE_CONTROL_ENABLED': False,
+        'EXTRACTION_CACHE_ENABLED': False, 'DEDUP_ENABLED': False, 'LISTING_EXTRACTION_ENABLED': False,
+        'BUNDLE_SIZE': 1, 'METRICS_INTERVAL': 0, 'PROGRESS_INTERVAL': 0, 'LOG_LEVEL': 'WARNING',
+    })
+    result = {}
+
+    def spider_closed(spider):
+        result.update({key: value for key, value in spider.crawler.stats.get_stats().items()
+                       if key.startswith(('firm/', 'incremental/', 'extraction/llm_calls', 'downloader/request_count'))
+                       and isinstance(value, (int, float))})
+
+    process = CrawlerProcess()
+    crawler = process.create_crawler(EmployeeSpider)
+    crawler.signals.connect(spider_closed, signal=signals.spider_closed)
+    process.crawl(crawler, start_url=args.url, csv_file=args.output)
+    start = time.perf_counter()
+    process.start()
+    result['wall'] = time.perf_counter() - start
+    print(json.dumps(result))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bios', type=int, default=60)
+    parser.add_argument('--pages', type=int, default=40, help="Navigation pages per firm besides the directory and bios")
+    parser.add_argument('--changes', type=int, default=3, help="Bios changed, removed and added on each site")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--incremental', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--state', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    parser.add_argument('--url', action='append', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    from fake_openai import start_fake_openai
+
+    root = tempfile.mkdtemp(prefix='bench_recrawl_')
+    firms = {}
+    for kind, handler in [('validators', ValidatingHandler), ('fingerprint', NoValidatorsHandler)]:
+        directory = os.path.join(root, kind)
+        site = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, directory=directory))
+        threading.Thread(target=site.serve_forever, daemon=True).start()
+        bios = list(range(args.bios))
+        firms[kind] = {'root': directory, 'domain': f'127.0.0.1:{site.server_address[1]}', 'bios': bios,
+                       'nav': write_firm(directory, bios, args.pages)}
+    _, llm_url = start_fake_openai(latency=0.2)
+    env = dict(os.environ, LLM_BASE_URL=llm_url, OPENAI_API_KEY='sk-fake', METRICS_DIR=os.path.join(root, 'metrics'))
+    state = os.path.join(root, 'incremental.sqlite')
+
+    def crawl(name, incremental):
+        output = os.path.join(root, f"{name.replace(' ', '_')}.csv")
+        command = [sys.executable, os.path.abspath(__file__), '--child', '--state', state, '--output', output]
+        command += ['--incremental'] if incremental else []
+        for firm in firms.values():
+            command += ['--url', f"http://{firm['domain']}/"]
+        result = subprocess.run(command, env=env, cwd=root, capture_output=True, text=True)
+        lines = result.stdout.strip().splitlines()
+        if result.returncode or not lines:
+            sys.exit(f"{name} failed:\n{result.stderr[-3000:]}")
+        changes_file = os.path.splitext(output)[0] + '.changes.csv'
+        changes = []
+        if os.path.exists(changes_file):
+            with open(changes_file, newline='', encoding='utf-8') as f:
+                changes = list(csv.DictReader(f))
+        return name, json.loads(lines[-1]), changes
+
+    results = [crawl('baseline sweep', True)]
+    time.sleep(1.1)  # Last-Modified has one-second resolution
+    for firm in firms.values():
+        firm['bios'] = change_firm(firm['root'], firm['nav'], firm['bios'], args.changes)
+    results.append(crawl('incremental', True))
+    results.append(crawl('full sweep', False))
+
+    print(f"bios={args.bios} navigation pages={args.pages} changed/removed/added per firm={args.changes}")
+    print("run              firm         pages  not_modified  bios_saved")
+    for name, stats, _ in results:
+        for kind, firm in firms.items():
+            domain = firm['domain']
+            print(f"{name:16s} {kind:11s} {stats.get(f'firm/{domain}/pages', 0):6d} "
+                  f"{stats.get(f'firm/{domain}/not_modified', 0):13d} {stats.get(f'firm/{domain}/bios', 0):11d}")
+        print(f"{name:16s} {'total':11s} requests={stats.get('downloader/request_count', 0)} "
+              f"llm_calls={stats.get('extraction/llm_calls', 0)} unchanged_content={stats.get('incremental/unchanged', 0)} "
+              f"wall={stats['wall']:.1f}s")
+
+    _, _, changes = results[1]
+    counts = {change: sum(1 for row in changes if row['change'] == change) for change in ('new', 'changed', 'removed')}
+    expected = args.changes * len(firms)
+    print(f"diff after the changes: {counts} (expected {expected} of each)")
+    for row in changes:
+        print(f"  {row['change']:8s} {row['email']:24s} {row['direct_phone']:13s} "
+              f"{row['changed_fields']:14s} {row['scraped_url']}")
+
+if __name__ == '__main__':
+    main()
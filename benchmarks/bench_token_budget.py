@@ -0,0 +1,70 @@
+# benchmarks/bench_token_budget.py
+"""Report prompt token counts before and after profile-region trimming.
+
+    python benchmarks/bench_token_budget.py [corpus_dir] [--budget 1500]
+
+corpus_dir holds saved bio pages (*.html). Without it a synthetic set of bio
+pages with sidebars, colleague grids and footers is used.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import clean_html
+from reducer import reduce_to_profile, count_tokens
+
+def synthetic_bio(index, colleagues=60):
+    grid = ''.join(
+        f'<div class="card"><h3><a href="/attorneys/colleague-{n}/">Colleague {n}</a></h3>'
+        f'<a href="/attorneys/colleague-{n}/">View Profile</a></div>'
+        for n in range(colleagues)
+    )
+    menu = ''.join(f'<li><a href="/practice-areas/area-{n}/">Practice Area {n}</a></li>' for n in range(40))
+    return (
+        '<html><body><header><ul>' + menu + '</ul></header>'
+        f'<main><h1>Jane Doe {index}</h1><p>Partner</p>'
+        f'<p><a href="tel:2125550{index:03d}">(212) 555-0{index:03d}</a> '
+        f'<a href="mailto:jdoe{index}@firm.com">jdoe{index}@firm.com</a></p>'
+        '<h2>Biography</h2><p>Jane focuses her practice on commercial litigation and has tried cases in state and federal court.</p>'
+        '<h2>Education</h2><p>J.D., Fordham Law School</p><h2>Bar Admissions</h2><p>New York, New Jersey</p></main>'
+        '<aside><h2>Other Attorneys</h2>' + grid + '</aside>'
+        '<footer><p>Attorney Advertising. Prior results do not guarantee a similar outcome.</p>'
+        '<p>© 2024 Firm LLP. All rights reserved. <a href="/privacy-policy/">Privacy Policy</a> '
+        '<a href="/disclaimer/">Disclaimer</a></p></footer></body></html>'
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus_dir', nargs='?')
+    parser.add_argument('--budget', type=int, default=1500)
+    args = parser.parse_args()
+
+    if args.corpus_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.corpus_dir, '*.html'))):
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    else:
+        pages = [synthetic_bio(i) for i in range(50)]
+
+    before = after = 0
+    elapsed = 0.0
+    for html_content in pages:
+        cleaned_text = clean_html(html_content)
+        start = time.perf_counter()
+        reduced = reduce_to_profile(cleaned_text, args.budget)
+        elapsed += time.perf_counter() - start
+        before += count_tokens(cleaned_text)
+        after += count_tokens(reduced)
+
+    print(f"{len(pages)} pages, budget {args.budget} tokens")
+    print(f"Input tokens before: {before:9d}  ({before / len(pages):.0f}/page)")
+    print(f"Input tokens after:  {after:9d}  ({after / len(pages):.0f}/page)")
+    print(f"Reduction: {1 - after / before:.1%}, {elapsed * 1000 / len(pages):.2f} ms/page")
+
+if __name__ == '__main__':
+    main()
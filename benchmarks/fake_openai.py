@@ -0,0 +1,122 @@
+# benchmarks/fake_openai.py
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_PERSON = {
+    "person": {
+        "first_name": "Jane",
+        "middle_name": "",
+        "last_name": "Doe",
+        "job_title": "Partner",
+        "direct_phone": "212-555-0100",
+        "direct_phone_extension": "",
+        "mobile_phone": "",
+        "email": "jdoe@example.com",
+        "location_city": "New York",
+        "location_state": "NY",
+        "profile_image_url": "",
+        "practice_areas": "Litigation"
+    }
+}
+
+EMAIL = re.compile(r'mailto:([^"\'?\s>]+)')
+
+def fake_person_for(text, **extra):
+    """FAKE_PERSON, but with the first email address found in text so it passes validation."""
+    person = dict(FAKE_PERSON['person'], **extra)
+    emails = EMAIL.findall(text)
+    if emails:
+        person['email'] = emails[0]
+        person['first_name'], _, person['last_name'] = emails[0].split('@')[0].title().partition('.')
+    return person
+
+def default_content(prompt):
+    """Answer like the model would for each prompt shape: a bundle of pages, a listing page or a single bio."""
+    if '### PAGE ' in prompt:
+        pages = re.findall(r'### PAGE (\S+)\n(.*?)(?=\n### PAGE |\Z)', prompt, re.DOTALL)
+        return json.dumps({"people": [fake_person_for(text, id=page_id) for page_id, text in pages]})
+    if '"people"' in prompt:
+        emails = dict.fromkeys(EMAIL.findall(prompt))
+        return json.dumps({"people": [fake_person_for(f'mailto:{email}') for email in emails]})
+    return json.dumps(FAKE_PERSON)
+
+def make_handler(latency, content, requests_per_minute):
+    class FakeChatHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            prompt = ''.join(message.get('content', '') for message in request.get('messages', []))
+
+            rate_headers = {}
+            if requests_per_minute:
+                # Sliding one-minute window, reported the way the OpenAI API does
+                with self.server.lock:
+                    now = time.monotonic()
+                    self.server.calls = [t for t in self.server.calls if now - t < 60]
+                    if len(self.server.calls) >= requests_per_minute:
+                        self.server.rejected += 1
+                        retry_after = 60 - (now - self.server.calls[0])
+                        body = json.dumps({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}).encode()
+                        self.send_response(429)
+                        self.send_header('Content-Type', 'application/json')
+                        self.send_header('Content-Length', str(len(body)))
+                        self.send_header('Retry-After', f"{retry_after:.3f}")
+                        self.send_header('x-ratelimit-limit-requests', str(requests_per_minute))
+                        self.send_header('x-ratelimit-remaining-requests', '0')
+                        self.send_header('x-ratelimit-reset-requests', f"{retry_after:.3f}s")
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+                    self.server.calls.append(now)
+                    rate_headers = {'x-ratelimit-limit-requests': str(requests_per_minute),
+                                    'x-ratelimit-remaining-requests': str(requests_per_minute - len(self.server.calls)),
+                                    'x-ratelimit-reset-requests': f"{60 - (now - self.server.calls[0]):.3f}s"}
+            self.server.prompts.append(prompt)
+
+            # Simulate the model thinking
+            time.sleep(latency)
+
+            body = json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": "gpt-4o-mini",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content or default_content(prompt)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in rate_headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeChatHandler
+
+def start_fake_openai(latency=0.5, content=None, port=0, requests_per_minute=0):
+    """Start an OpenAI-compatible chat completions server on localhost in a background thread.
+
+    Without a fixed content, the answer depends on the prompt (see default_content).
+    Every prompt received is kept in server.prompts. With requests_per_minute,
+    calls over the budget get a 429 with Retry-After, counted in server.rejected.
+    Returns the server and the base URL to hand to the OpenAI client.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency, content, requests_per_minute))
+    server.prompts = []
+    server.calls = []
+    server.rejected = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
@@ -0,0 +1,245 @@
+# browser_pool.py
+import asyncio
+import os
+import re
+import time
+import weakref
+import zlib
+from urllib.parse import urlparse
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Only these resource types are needed to render a bio; everything else is aborted
+ALLOWED_RESOURCE_TYPES = frozenset(['document', 'xhr', 'fetch', 'script'])
+BLOCKED_EXTENSIONS = re.compile(r'\.(svg|woff2?|ttf|eot|otf|css|png|jpe?g|gif|bmp|webp|ico|mp4|webm)$', re.IGNORECASE)
+# The same list as URL patterns for the browser's own network stack
+BLOCKED_URL_PATTERNS = ['*.svg', '*.woff', '*.woff2', '*.ttf', '*.eot', '*.otf', '*.css', '*.png', '*.jpg', '*.jpeg',
+                        '*.gif', '*.bmp', '*.webp', '*.ico', '*.mp4', '*.webm']
+
+# Options every pooled context is created with
+CONTEXT_KWARGS = {
+    'ignore_https_errors': True,
+    'service_workers': 'block',  # A service worker could fetch around the blocking
+}
+
+def should_abort_request(request):
+    """PLAYWRIGHT_ABORT_REQUEST predicate: abort anything that isn't a document, script or XHR.
+
+    Runs inside scrapy-playwright's own route handler, so it adds no second
+    route layer; most blocked URLs never get this far, see install_blocking.
+    """
+    return request.resource_type not in ALLOWED_RESOURCE_TYPES or bool(BLOCKED_EXTENSIONS.search(request.url))
+
+_blocking_installed = weakref.WeakSet()
+
+async def install_blocking(page, request):
+    """Page init callback: have Chromium drop images, fonts and stylesheets itself, once per page.
+
+    Network.setBlockedURLs is checked in the browser's network stack, so those
+    requests are refused without a round trip to Python. Pooled pages keep it
+    for every later request; non-Chromium browsers fall back to should_abort_request.
+    """
+    if page in _blocking_installed:
+        return
+    _blocking_installed.add(page)
+    try:
+        session = await page.context.new_cdp_session(page)
+        await session.send('Network.enable')
+        await session.send('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    except Exception:
+        pass  # Not Chromium
+
+def process_tree_rss(pid=None):
+    """Resident memory in bytes of a process and all its descendants: this crawl, the Playwright driver and its browsers."""
+    pid = pid or os.getpid()
+    if psutil:
+        try:
+            process = psutil.Process(pid)
+            total = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    total += child.memory_info().rss
+                except psutil.Error:
+                    pass  # Exited in the meantime
+            return total
+        except psutil.Error:
+            return 0
+
+    # Without psutil, walk /proc (Linux only)
+    parents = {}
+    rss = {}
+    page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            parents[int(entry)] = int(fields[1])
+            rss[int(entry)] = int(fields[21]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    tree = {pid}
+    grew = True
+    while grew:
+        children = {child for child, parent in parents.items() if parent in tree} - tree
+        tree |= children
+        grew = bool(children)
+    return sum(rss.get(member, 0) for member in tree)
+
+class BrowserPool:
+    """Reuse warm Playwright pages across requests, in a few long-lived contexts, within a memory budget.
+
+    Firms are spread over `contexts` named contexts by domain, so cookies stay
+    apart without a context per firm. A page is handed back to the pool once
+    its response is in and the next request for that context gets it instead
+    of a fresh one; pages are retired after max_uses requests. Resource
+    blocking is set up once per page (install_blocking) and by the abort
+    predicate, instead of a Python route callback per request.
+
+    The memory budget covers this process and its browsers. Above max_rss_mb
+    idle pages are closed and fewer pages may be open at once; below 80% of it
+    capacity grows back one page at a time, up to contexts * pages_per_context.
+    Stats under browser_pool/ give RSS, pages/sec and reuse counts.
+    """
+
+    def __init__(self, stats, contexts=4, pages_per_context=4, max_uses=50, max_rss_mb=2048, interval=5):
+        self.stats = stats
+        self.contexts = contexts
+        self.max_capacity = contexts * pages_per_context
+        self.capacity = self.max_capacity
+        self.max_uses = max_uses
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.interval = interval
+        self.idle = {}  # context name -> pages ready for reuse
+        self.uses = weakref.WeakKeyDictionary()
+        self.in_use = 0
+        self.released = None
+        self.rss = 0
+        self.pages = 0
+        self.started = None
+        self.task = None
+        self.closing = set()  # Page closes started from the memory check; the loop holds tasks only weakly
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('BROWSER_POOL_ENABLED', True):
+            raise NotConfigured
+        pool = cls(crawler.stats, settings.getint('BROWSER_POOL_CONTEXTS', 4),
+                   settings.getint('PLAYWRIGHT_MAX_PAGES_PER_CONTEXT', 4), settings.getint('BROWSER_POOL_PAGE_MAX_USES', 50),
+                   settings.getint('BROWSER_POOL_MAX_RSS_MB', 2048), settings.getfloat('BROWSER_POOL_CHECK_INTERVAL', 5))
+        crawler.signals.connect(pool.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(pool.spider_closed, signal=signals.spider_closed)
+        return pool
+
+    def spider_opened(self, spider):
+        if self.interval:
+            self.task = task.LoopingCall(self.check_memory)
+            self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.check_memory()
+        self.idle.clear()  # The download handler closes the browser with every page in it
+        if self.pages:
+            spider.logger.info(f"Browser pool: {self.pages} pages, {self.stats.get_value('browser_pool/pages_per_sec', 0)} pages/s, "
+                               f"peak RSS {self.stats.get_value('browser_pool/rss_max_mb', 0)} MB")
+
+    def context_name(self, url):
+        domain = urlparse(url).netloc.lower()
+        return f"pool-{zlib.crc32(domain.encode('utf-8')) % self.contexts}"
+
+    async def process_request(self, request, spider):
+        meta = request.meta
+        if not meta.get('playwright') or meta.get('browser_pool'):
+            return None
+
+        if self.released is None:
+            self.released = asyncio.Event()
+        while self.in_use >= self.capacity:
+            self.released.clear()
+            await self.released.wait()
+
+        name = self.context_name(request.url)
+        page = None
+        idle = self.idle.get(name, [])
+        while idle and page is None:
+            candidate = idle.pop()
+            if not candidate.is_closed():
+                page = candidate
+        self.stats.inc_value('browser_pool/pages_reused' if page else 'browser_pool/pages_created')
+
+        self.in_use += 1
+        meta['browser_pool'] = True
+        meta['playwright_context'] = name
+        meta['playwright_context_kwargs'] = CONTEXT_KWARGS
+        meta['playwright_include_page'] = True  # The pool, not the handler, decides when a page closes
+        meta['playwright_page_init_callback'] = install_blocking
+        if page:
+            meta['playwright_page'] = page
+        if self.started is None:
+            self.started = time.monotonic()
+        return None
+
+    async def process_response(self, request, response, spider):
+        if request.meta.pop('browser_pool', False):
+            self.pages += 1
+            await self.release(request.meta.get('playwright_context'), request.meta.pop('playwright_page', None), reuse=True)
+        return response
+
+    async def process_exception(self, request, exception, spider):
+        if request.meta.pop('browser_pool', False):
+            # A page whose navigation failed may be in any state; don't hand it to the next firm
+            await self.release(request.meta.get('playwright_context'), request.meta.pop('playwright_page', None), reuse=False)
+        return None
+
+    async def release(self, name, page, reuse):
+        self.in_use -= 1
+        if self.released is not None:
+            self.released.set()
+        if page is None or page.is_closed():
+            return
+
+        self.uses[page] = self.uses.get(page, 0) + 1
+        if reuse and self.uses[page] < self.max_uses and self.rss < self.max_rss:
+            self.idle.setdefault(name, []).append(page)
+            return
+        await self.close_page(page)
+
+    async def close_page(self, page):
+        self.stats.inc_value('browser_pool/pages_closed')
+        try:
+            await page.close()
+        except Exception:
+            self.stats.inc_value('browser_pool/close_errors')  # Usually the browser already went away
+
+    def check_memory(self):
+        """Measure RSS, adapt capacity to the budget and update the pool's stats."""
+        self.rss = process_tree_rss()
+        rss_mb = round(self.rss / (1024 * 1024), 1)
+        self.stats.set_value('browser_pool/rss_mb', rss_mb)
+        self.stats.max_value('browser_pool/rss_max_mb', rss_mb)
+
+        if self.rss > self.max_rss:
+            self.capacity = max(1, self.capacity // 2)
+            for pages in self.idle.values():
+                for page in pages:
+                    closing = asyncio.ensure_future(self.close_page(page))
+                    self.closing.add(closing)
+                    closing.add_done_callback(self.closing.discard)
+                pages.clear()
+            self.stats.inc_value('browser_pool/memory_pressure')
+        elif self.rss < self.max_rss * 0.8 and self.capacity < self.max_capacity:
+            self.capacity += 1
+        self.stats.set_value('browser_pool/capacity', self.capacity)
+
+        if self.started is not None:
+            self.stats.set_value('browser_pool/pages_per_sec', round(self.pages / max(time.monotonic() - self.started, 1e-9), 2))
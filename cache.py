@@ -0,0 +1,88 @@
+# cache.py
+import hashlib
+import sqlite3
+import time
+
+class ExtractionCache:
+    """Persistent SQLite cache of model responses keyed on the cleaned page text.
+
+    The key also covers the prompt/model version, so editing the prompt in
+    extractor.py invalidates every earlier entry. Entries older than max_age_days
+    are dropped and the least recently used rows are evicted above max_entries.
+    """
+
+    def __init__(self, path, prompt_version, max_entries=50000, max_age_days=30):
+        self.path = path
+        self.prompt_version = prompt_version
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS extractions (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_last_used ON extractions (last_used)")
+        self.conn.commit()
+        self.evict()
+
+    def make_key(self, cleaned_text, prompt_version=None):
+        """Hash the cleaned text together with the prompt version (the cache's own unless given)."""
+        digest = hashlib.sha256()
+        digest.update((prompt_version or self.prompt_version).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(cleaned_text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, cleaned_text, prompt_version=None):
+        """Return the stored response for this page, or None on a miss."""
+        key = self.make_key(cleaned_text, prompt_version)
+        row = self.conn.execute(
+            "SELECT response, created_at FROM extractions WHERE key = ?", (key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or (self.max_age and now - row[1] > self.max_age):
+            self.misses += 1
+            return None
+
+        self.conn.execute("UPDATE extractions SET last_used = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, cleaned_text, response, prompt_version=None):
+        """Store a validated model response for this page."""
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extractions (key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+            (self.make_key(cleaned_text, prompt_version), response, now, now)
+        )
+        self.conn.commit()
+
+        # Trimming scans the table, so only do it every so often
+        self._puts += 1
+        if self._puts % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries and trim the table to max_entries, oldest use first."""
+        if self.max_age:
+            self.conn.execute("DELETE FROM extractions WHERE created_at < ?", (time.time() - self.max_age,))
+        if self.max_entries:
+            self.conn.execute("""
+                DELETE FROM extractions WHERE key IN (
+                    SELECT key FROM extractions ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
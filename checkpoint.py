@@ -0,0 +1,71 @@
+# checkpoint.py
+import sqlite3
+
+class PersistentSet:
+    """A set of strings mirrored to a SQLite table, so membership survives a restart."""
+
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (value TEXT PRIMARY KEY)")
+        self.values = {row[0] for row in self.conn.execute(f"SELECT value FROM {table}")}
+
+    def __contains__(self, value):
+        return value in self.values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(list(self.values))
+
+    def add(self, value):
+        if value in self.values:
+            return
+        self.values.add(value)
+        self.conn.execute(f"INSERT OR IGNORE INTO {self.table} (value) VALUES (?)", (value,))
+        self.conn.commit()
+
+    def update(self, values):
+        new_values = [value for value in values if value not in self.values]
+        if not new_values:
+            return
+        self.values.update(new_values)
+        self.conn.executemany(f"INSERT OR IGNORE INTO {self.table} (value) VALUES (?)", [(value,) for value in new_values])
+        self.conn.commit()
+
+    def discard(self, value):
+        if value not in self.values:
+            return
+        self.values.discard(value)
+        self.conn.execute(f"DELETE FROM {self.table} WHERE value = ?", (value,))
+        self.conn.commit()
+
+class CrawlCheckpoint:
+    """Everything needed to pick a crawl up after it dies: frontier, visited pages and extraction progress.
+
+    Scrapy's JOBDIR only saves its disk queue pointers on a clean shutdown, so
+    this is written on every change instead. frontier holds links queued but not
+    yet fetched; visited holds the spider's canonical URL strings (see
+    frontier.canonicalize_url). A page is recorded in pending when it is handed
+    to the extraction pipeline and moves to extracted once its result has been
+    rejected or its rows flushed to the output. On resume, pending and frontier
+    pages are fetched again and extracted pages are never sent to the model twice.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.frontier = PersistentSet(self.conn, 'frontier')
+        self.visited = PersistentSet(self.conn, 'visited')
+        self.pending = PersistentSet(self.conn, 'pending')
+        self.extracted = PersistentSet(self.conn, 'extracted')
+
+    def start_extraction(self, url):
+        self.pending.add(url)
+
+    def finish_extraction(self, url):
+        self.extracted.add(url)
+        self.pending.discard(url)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,168 @@
+# classifier.py
+import csv
+import glob
+import os
+import re
+import sys
+from urllib.parse import urlparse
+
+# Path segments that usually precede a single person's profile
+PEOPLE_SLUGS = [
+    'bio', 'our-people', 'attorneys', 'attorney', 'people', 'team', 'our-team',
+    'lawyer', 'lawyers', 'professionals', 'professional', 'profiles', 'profile',
+    'meet-our-team', 'our-firm', 'attorney-profiles', 'staff-counsel', 'staff',
+    'counsel', 'partners', 'associates'
+]
+
+# Path words that never describe one person, as whole words of a segment so surnames like Hauser or Stag don't match
+NON_PROFILE_WORDS = re.compile(
+    r'(?:^|[/_.-])(?:login|logout|register|privacy|policy|terms|disclaimer|cookie|accessibility|contact|careers|'
+    r'sitemap|search|tag|category|feed|wp-admin|wp-login|practice-areas?|news|blog|events?|'
+    r'testimonials|reviews|faq|locations?|offices?|user)(?:$|[/_.-])'
+)
+
+SKIPPED_EXTENSIONS = ('.pdf', '.vcf', '.jpg', '.jpeg', '.png', '.gif', '.doc', '.docx', '.zip')
+
+JSON_LD_PERSON = re.compile(r'"@type"\s*:\s*\[?\s*"(Person|Attorney|Lawyer)"', re.IGNORECASE)
+MAILTO_LINK = re.compile(r'href\s*=\s*["\']mailto:([^"\'?]+)', re.IGNORECASE)
+TEL_LINK = re.compile(r'href\s*=\s*["\']tel:([^"\']+)', re.IGNORECASE)
+H1_TAG = re.compile(r'<h1[^>]*>(.*?)</h1>', re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r'<[^>]+>')
+NAME_LIKE = re.compile(r"^[A-Z][\w.'’-]*(\s+[A-Z][\w.'’-]*){1,4}(,?\s+(Jr|Sr|II|III|IV|Esq)\.?)?$")
+
+# Pages scoring at or above this are treated as one person's profile
+DEFAULT_THRESHOLD = 0.5
+
+def url_score(url):
+    """Score how much a URL looks like a single person's profile page.
+
+    >>> url_score('https://firm.com/attorneys/jane-q-doe/')
+    0.6
+    >>> [url_score(f'https://firm.com/attorneys/{name}/') for name in ('john-hauser', 'lisa-mauser', 'amy-stag')]
+    [0.6, 0.6, 0.6]
+    >>> [url_score(f'https://firm.com/{path}') for path in ('privacy-policy/', 'attorneys/contact', 'firm-news.html')]
+    [-1.0, -1.0, -1.0]
+    >>> url_score('https://firm.com/attorneys/')
+    -0.4
+    """
+    parsed = urlparse(url)
+    path = parsed.path.lower()
+    segments = [segment for segment in path.split('/') if segment]
+
+    if path.endswith(SKIPPED_EXTENSIONS) or 'format=vcf' in parsed.query.lower():
+        return -1.0
+    if not segments:
+        return -0.5  # Homepage
+    if any(NON_PROFILE_WORDS.search(segment) for segment in segments[-1:]):
+        return -1.0
+
+    last = re.sub(r'\.(php|html?|aspx?|cfm)$', '', segments[-1])
+    if last in PEOPLE_SLUGS:
+        return -0.4  # People index page rather than a profile
+
+    # A name-looking segment under a people slug, e.g. /attorneys/jane-q-doe/ or /attorney-profiles/28-jane-doe
+    under_people_slug = any(segment in PEOPLE_SLUGS or segment.endswith('.attorneys') for segment in segments[:-1])
+    name_segment = re.sub(r'^\d+-|-\d+$', '', last)
+    looks_like_name = bool(re.fullmatch(r'[a-z][a-z\'-]*', name_segment)) and not name_segment.isdigit()
+
+    if under_people_slug and looks_like_name:
+        return 0.6
+    if under_people_slug:
+        return 0.3
+    return 0.0
+
+def content_score(cleaned_text):
+    """Score the cleaned HTML for signals of a single person's profile."""
+    score = 0.0
+
+    if JSON_LD_PERSON.search(cleaned_text):
+        score += 0.4
+
+    # A profile has one or two contact links; a listing page has one per person
+    emails = {email.lower() for email in MAILTO_LINK.findall(cleaned_text)}
+    phones = {re.sub(r'\D', '', phone) for phone in TEL_LINK.findall(cleaned_text)}
+    if 1 <= len(emails) <= 2:
+        score += 0.2
+    elif len(emails) > 4:
+        score -= 0.4
+    if 1 <= len(phones) <= 3:
+        score += 0.1
+    elif len(phones) > 5:
+        score -= 0.3
+
+    headings = [TAG.sub('', heading).strip() for heading in H1_TAG.findall(cleaned_text)]
+    if len(headings) == 1 and NAME_LIKE.match(headings[0]):
+        score += 0.2
+
+    return score
+
+def profile_score(url, cleaned_text=''):
+    """Combined score for a page; compare against DEFAULT_THRESHOLD."""
+    score = url_score(url)
+    if cleaned_text:
+        score += content_score(cleaned_text)
+    return score
+
+def is_profile_page(url, cleaned_text='', threshold=DEFAULT_THRESHOLD):
+    """Return True if the page is likely a single attorney's bio and worth sending to the model."""
+    return profile_score(url, cleaned_text) >= threshold
+
+def is_listing_page(cleaned_text, min_people=3):
+    """Return True if the page lists contact details for several people, like a directory with emails or phones."""
+    emails = {email.lower() for email in MAILTO_LINK.findall(cleaned_text)}
+    phones = {re.sub(r'\D', '', phone) for phone in TEL_LINK.findall(cleaned_text)}
+    return len(emails) >= min_people or len(phones) >= min_people
+
+def load_labels(csv_files):
+    """Label previously scraped URLs from output CSVs.
+
+    A row counts as a real profile when the person's first or last name appears in
+    the URL. Rows where the model pulled a name from a page that isn't about that
+    person (listings, privacy pages, the homepage) become negatives. The labels are
+    noisy but good enough to compare heuristics.
+    """
+    labels = {}
+    for csv_file in csv_files:
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if not row or row[0] == 'scraped_url' or not row[0].startswith('http'):
+                    continue
+                url = row[0]
+                first_name = row[1] if len(row) > 1 else ''
+                last_name = row[3] if len(row) > 3 else ''
+                slug = re.sub(r'[^a-z]', '', url.lower().split('?')[0].rstrip('/').rsplit('/', 1)[-1])
+                names = [re.sub(r'[^a-z]', '', name.lower()) for name in (first_name, last_name)]
+                is_profile = any(name and len(name) > 2 and name in slug for name in names)
+                labels[url] = labels.get(url, False) or is_profile
+    return labels
+
+def evaluate(csv_files, threshold=DEFAULT_THRESHOLD):
+    """Print how often the URL heuristics agree with load_labels() and how many model calls they avoid.
+
+    Both the labels and the heuristics are read off the URL, so agreement is a
+    consistency check that catches regressions, not a measured precision or
+    recall; that needs pages labelled by hand.
+    """
+    labels = load_labels(csv_files)
+    true_pos = false_pos = false_neg = skipped = 0
+
+    for url, is_profile in labels.items():
+        predicted = is_profile_page(url, threshold=threshold)
+        if not predicted:
+            skipped += 1
+        if predicted and is_profile:
+            true_pos += 1
+        elif predicted:
+            false_pos += 1
+        elif is_profile:
+            false_neg += 1
+
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 0.0
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg else 0.0
+    print(f"Pages: {len(labels)} ({sum(labels.values())} profiles)")
+    print(f"Agreement with URL-derived labels (not a measured accuracy): precision {precision:.3f}, recall {recall:.3f}")
+    print(f"LLM calls avoided: {skipped}")
+
+if __name__ == '__main__':
+    files = sys.argv[1:] or sorted(glob.glob(os.path.join('data', '*.csv'))) + ['human_output.csv']
+    evaluate(files)
@@ -0,0 +1,218 @@
+# dedup.py
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+from batch import firm_domain
+from classifier import url_score
+from sinks import FIELDNAMES, get_sink, close_all, locked
+
+NON_LETTERS = re.compile(r'[^a-z]')
+NON_DIGITS = re.compile(r'\D')
+
+def _letters(value):
+    return NON_LETTERS.sub('', (value or '').lower())
+
+def _digits(value):
+    digits = NON_DIGITS.sub('', value or '')
+    return digits[-10:]  # Drop a leading country code
+
+def record_keys(row):
+    """Index keys for a row: its email, personal phone numbers, and a fuzzy name key scoped to the firm."""
+    keys = []
+    email = (row.get('email') or '').strip().lower()
+    if email:
+        keys.append(f"email:{email}")
+
+    # A direct line is only personal with an extension; without one it is usually the firm's main number
+    if _digits(row.get('mobile_phone')):
+        keys.append(f"phone:{_digits(row.get('mobile_phone'))}")
+    if _digits(row.get('direct_phone')) and _digits(row.get('direct_phone_extension')):
+        keys.append(f"phone:{_digits(row.get('direct_phone'))}x{_digits(row.get('direct_phone_extension'))}")
+
+    last_name = _letters(row.get('last_name'))
+    first_name = _letters(row.get('first_name'))
+    if last_name and first_name:
+        keys.append(f"name:{firm_domain(row.get('scraped_url', ''))}:{last_name}:{first_name[0]}")
+    return keys
+
+def compatible(a, b):
+    """Rule out key matches that are clearly two different people."""
+    email_a, email_b = (a.get('email') or '').lower(), (b.get('email') or '').lower()
+    if email_a and email_b and email_a != email_b:
+        return False
+    for field in ('last_name', 'middle_name', 'first_name'):
+        value_a, value_b = _letters(a.get(field)), _letters(b.get(field))
+        # Compare initials for first/middle names so 'Angie' matches 'Angeline' and 'J.' matches 'James'
+        if field != 'last_name':
+            value_a, value_b = value_a[:1], value_b[:1]
+        if value_a and value_b and value_a != value_b:
+            return False
+    return True
+
+def merge_rows(current, new):
+    """Keep the most complete value for each field: filled beats empty, longer beats shorter."""
+    merged = dict(current)
+    for field in FIELDNAMES:
+        old_value, new_value = current.get(field) or '', new.get(field) or ''
+        if field == 'scraped_url':
+            # Prefer the person's own bio page over a listing page
+            if not old_value or (new_value and new_value != old_value and url_score(new_value) > url_score(old_value)):
+                merged[field] = new_value
+        elif len(str(new_value).strip()) > len(str(old_value).strip()):
+            merged[field] = new_value
+    return merged
+
+class DedupIndex:
+    """Persistent attorney index that merges repeat sightings of the same person across runs.
+
+    Every row is looked up by its keys (see record_keys); a hit that passes
+    compatible() is merged into the stored record, otherwise a new record is
+    created. Lookups go through SQLite primary keys, so a pass over n rows is linear.
+    """
+
+    def __init__(self, path, commit_every=1000):
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entities (id INTEGER PRIMARY KEY, row TEXT NOT NULL)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entity_keys (key TEXT NOT NULL, entity_id INTEGER NOT NULL, PRIMARY KEY (key, entity_id))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entity_keys_entity ON entity_keys (entity_id)")
+        self.commit_every = commit_every
+        self.pending_writes = 0
+
+    def _entity(self, entity_id):
+        found = self.conn.execute("SELECT row FROM entities WHERE id = ?", (entity_id,)).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def _candidates(self, keys):
+        seen = []
+        for key in keys:
+            for (entity_id,) in self.conn.execute("SELECT entity_id FROM entity_keys WHERE key = ?", (key,)):
+                if entity_id not in seen:
+                    seen.append(entity_id)
+        return seen
+
+    def _add_keys(self, entity_id, row):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO entity_keys (key, entity_id) VALUES (?, ?)",
+            [(key, entity_id) for key in record_keys(row)]
+        )
+
+    def upsert(self, row):
+        """Merge row into the index. Returns (entity_id, merged_row, is_new)."""
+        row = {field: row.get(field, '') or '' for field in FIELDNAMES}
+        matches = []
+        for entity_id in self._candidates(record_keys(row)):
+            stored = self._entity(entity_id)
+            if stored is not None and compatible(stored, row):
+                matches.append((entity_id, stored))
+
+        if not matches:
+            cursor = self.conn.execute("INSERT INTO entities (row) VALUES (?)", (json.dumps(row),))
+            entity_id = cursor.lastrowid
+            self._add_keys(entity_id, row)
+            self._maybe_commit()
+            return entity_id, row, True
+
+        # The row may tie together records that were stored separately; fold them into the first
+        entity_id, merged = matches[0]
+        for other_id, other_row in matches[1:]:
+            merged = merge_rows(merged, other_row)
+            self.conn.execute("UPDATE OR IGNORE entity_keys SET entity_id = ? WHERE entity_id = ?", (entity_id, other_id))
+            self.conn.execute("DELETE FROM entity_keys WHERE entity_id = ?", (other_id,))
+            self.conn.execute("DELETE FROM entities WHERE id = ?", (other_id,))
+
+        merged = merge_rows(merged, row)
+        self.conn.execute("UPDATE entities SET row = ? WHERE id = ?", (json.dumps(merged), entity_id))
+        self._add_keys(entity_id, merged)
+        self._maybe_commit()
+        return entity_id, merged, False
+
+    def _maybe_commit(self):
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+def dedupe_rows(rows, index):
+    """One pass over rows: returns one merged row per person, in order of first appearance."""
+    people = {}
+    for row in rows:
+        entity_id, merged, _ = index.upsert(row)
+        # A later row can fold two earlier people together; the merged record replaces both
+        people.pop(entity_id, None)
+        people[entity_id] = merged
+    return list(people.values())
+
+def compact_in_place(path, index):
+    """Rewrite a CSV or JSONL output with duplicates merged, under the same lock the sinks use for appends.
+
+    Appending processes hold that lock too, so rows they write afterwards land after the rewritten ones.
+    Returns (rows_before, rows_after), or None for formats that can't be rewritten this way.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ('.csv', '.jsonl') or not os.path.exists(path):
+        return None
+
+    with open(path, 'r+', newline='', encoding='utf-8') as f:
+        with locked(f):
+            if extension == '.jsonl':
+                rows = [json.loads(line) for line in f if line.strip()]
+            else:
+                rows = list(csv.DictReader(f))
+            people = dedupe_rows(rows, index)
+            f.seek(0)
+            if extension == '.jsonl':
+                f.write(''.join(json.dumps(person, ensure_ascii=False) + '\n' for person in people))
+            else:
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(people)
+            f.truncate()
+    index.commit()
+    return len(rows), len(people)
+
+def compact(input_files, output_file, index):
+    """Offline compaction: merge any number of result CSVs into one deduplicated output."""
+    rows = []
+    for input_file in input_files:
+        with open(input_file, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if 'scraped_url' not in (reader.fieldnames or []):
+                print(f"Skipping {input_file}: no header row")
+                continue
+            rows.extend(reader)
+
+    people = dedupe_rows(rows, index)
+    index.commit()
+
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    sink = get_sink(output_file, batch_size=1000)
+    for person in people:
+        sink.write({'scraped_url': person['scraped_url'], 'person': person})
+    close_all()
+    print(f"{len(rows)} rows in, {len(people)} people out")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge duplicate attorneys across result files")
+    parser.add_argument('inputs', nargs='+', help="Result CSV files")
+    parser.add_argument('-o', '--output', required=True, help="Deduplicated output (format follows the extension)")
+    parser.add_argument('--index', default='dedup.sqlite', help="Persistent index shared with crawls")
+    args = parser.parse_args()
+
+    dedup_index = DedupIndex(args.index)
+    compact(args.inputs, args.output, dedup_index)
+    dedup_index.close()
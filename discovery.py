@@ -0,0 +1,220 @@
+# discovery.py
+import gzip
+import io
+import json
+import re
+import zlib
+from urllib.parse import urlparse, urljoin
+import scrapy
+from lxml import etree
+from batch import firm_domain
+from frontier import canonicalize_url, is_pruned, is_people_index, url_priority, BIO_PRIORITY
+
+# Where sitemaps usually live when robots.txt doesn't say (Yoast, WordPress core, most builders)
+DEFAULT_SITEMAPS = ['/sitemap_index.xml', '/sitemap.xml', '/wp-sitemap.xml']
+
+# Child sitemaps of an index that never list people
+SKIPPED_SITEMAPS = re.compile(
+    r'(post|category|categories|tag|author|product|news|blog|event|press|insight|article|media|image|video|'
+    r'attachment|taxonom|format|location)s?[-_]?(sitemap|\d|\.xml)',
+    re.IGNORECASE
+)
+
+# Sitemaps and WordPress post types whose every entry is a person
+PEOPLE_WORDS = re.compile(r'attorney|lawyer|people|person|team|professional|staff|member|counsel|partner|bio', re.IGNORECASE)
+
+SITEMAP_LINE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+
+def robots_sitemaps(text):
+    """Sitemap URLs declared in a robots.txt."""
+    return SITEMAP_LINE.findall(text)
+
+def iter_sitemap(body):
+    """Yield ('sitemap', url) for each entry of a sitemap index and ('url', url) for each page of a URL set.
+
+    Parses incrementally and drops each entry once read, so a 50,000-URL
+    sitemap never sits in memory as a tree. Gzipped files are unpacked on
+    the fly whatever their Content-Type. Stops quietly at malformed XML or a
+    corrupt gzip stream.
+    """
+    stream = io.BytesIO(body)
+    if body[:2] == b'\x1f\x8b':
+        stream = gzip.GzipFile(fileobj=stream)
+
+    kind = None
+    try:
+        for event, element in etree.iterparse(stream, events=('start', 'end'), resolve_entities=False, no_network=True,
+                                              huge_tree=True, recover=True):
+            name = etree.QName(element).localname if isinstance(element.tag, str) else ''
+            if event == 'start':
+                if kind is None:
+                    kind = 'sitemap' if name == 'sitemapindex' else 'url'
+                continue
+            if name == 'loc' and element.text and element.text.strip():
+                yield kind, element.text.strip()
+            elif name in ('url', 'sitemap'):
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+    except (etree.XMLSyntaxError, OSError, EOFError, zlib.error):
+        return
+
+def is_bio_candidate(url, from_people_source=False):
+    """True for a URL worth seeding: a bio or people directory, or any page of a people-only sitemap or post type."""
+    if is_pruned(url):
+        return False
+    return from_people_source or is_people_index(url) or url_priority(url) == BIO_PRIORITY
+
+class FirmDiscovery:
+    """What discovery has found for one firm so far."""
+
+    def __init__(self, start_url):
+        self.start_url = start_url
+        self.pending = 0
+        self.sitemaps = set()
+        self.sitemap_found = False
+        self.urls = {}  # canonical URL -> URL
+
+class SitemapDiscovery:
+    """Find a firm's bios from its sitemaps and WordPress REST API before crawling links.
+
+    For each start URL, robots.txt is read for Sitemap: lines (falling back to
+    DEFAULT_SITEMAPS) and /wp-json/wp/v2/types for people post types, all with
+    plain HTTP. Sitemap indexes are followed to any depth, skipping child
+    sitemaps of posts, tags and the like, up to max_sitemaps files per firm.
+    Once every discovery request for a firm is back, its bios and directories
+    are seeded into the crawl and link following is limited to directory
+    pages; a firm with no sitemap or no bios in it is link-crawled as before.
+    """
+
+    def __init__(self, spider, max_sitemaps=50, min_bios=1):
+        self.spider = spider
+        self.max_sitemaps = max_sitemaps
+        self.min_bios = min_bios
+        self.firms = {}
+        self.seeded = set()  # Firms whose bios came from discovery
+
+    @property
+    def stats(self):
+        return self.spider.crawler.stats
+
+    def _request(self, url, callback, firm, errback=None, **meta):
+        self.firms[firm].pending += 1
+        self.stats.inc_value('discovery/requests')
+        return scrapy.Request(url, callback=callback, errback=errback or self.failed, dont_filter=True, priority=BIO_PRIORITY + 10,
+                              meta={'discovery_firm': firm, 'http_only': True, 'depth_reset': True, **meta})
+
+    def start(self, start_url):
+        """Requests that begin discovery for one firm."""
+        firm = firm_domain(start_url)
+        self.firms[firm] = FirmDiscovery(start_url)
+        # Redirects (http -> https, apex -> www) are followed as usual; an error status means no robots.txt
+        yield self._request(urljoin(start_url, '/robots.txt'), self.parse_robots, firm, errback=self.robots_failed)
+        yield self._request(urljoin(start_url, '/wp-json/wp/v2/types'), self.parse_wp_types, firm)
+
+    def parse_robots(self, response):
+        firm = response.meta['discovery_firm']
+        try:
+            state = self.firms[firm]
+            text = response.text if isinstance(response, scrapy.http.TextResponse) else ''
+            sitemaps = robots_sitemaps(text) or [urljoin(state.start_url, path) for path in DEFAULT_SITEMAPS]
+            yield from self._sitemap_requests(firm, sitemaps, people_source=False)
+        finally:
+            yield from self.done(firm)
+
+    def robots_failed(self, failure):
+        firm = failure.request.meta['discovery_firm']
+        try:
+            state = self.firms[firm]
+            yield from self._sitemap_requests(firm, [urljoin(state.start_url, path) for path in DEFAULT_SITEMAPS], people_source=False)
+        finally:
+            yield from self.done(firm)
+
+    def _sitemap_requests(self, firm, urls, people_source):
+        state = self.firms[firm]
+        for url in urls:
+            key = canonicalize_url(url)
+            if key in state.sitemaps or len(state.sitemaps) >= self.max_sitemaps:
+                continue
+            state.sitemaps.add(key)
+            yield self._request(url, self.parse_sitemap, firm, people_source=people_source or bool(PEOPLE_WORDS.search(urlparse(url).path)))
+
+    def parse_sitemap(self, response):
+        firm = response.meta['discovery_firm']
+        try:
+            state = self.firms[firm]
+            people_source = response.meta.get('people_source', False)
+            children = []
+            for kind, url in iter_sitemap(response.body):
+                state.sitemap_found = True
+                if kind == 'sitemap':
+                    if not SKIPPED_SITEMAPS.search(urlparse(url).path):
+                        children.append(url)
+                elif firm_domain(url) == firm and is_bio_candidate(url, people_source):
+                    state.urls.setdefault(canonicalize_url(url), url)
+            self.stats.inc_value('discovery/sitemaps')
+            yield from self._sitemap_requests(firm, children, people_source)
+        finally:
+            yield from self.done(firm)
+
+    def parse_wp_types(self, response):
+        firm = response.meta['discovery_firm']
+        try:
+            try:
+                types = json.loads(response.text)
+            except (ValueError, AttributeError):
+                types = {}
+            for slug, post_type in (types.items() if isinstance(types, dict) else []):
+                rest_base = isinstance(post_type, dict) and post_type.get('rest_base')
+                if rest_base and PEOPLE_WORDS.search(slug):
+                    url = urljoin(self.firms[firm].start_url, f'/wp-json/wp/v2/{rest_base}?per_page=100&_fields=link')
+                    yield self._request(url, self.parse_wp_items, firm, wp_url=url, wp_page=1)
+        finally:
+            yield from self.done(firm)
+
+    def parse_wp_items(self, response):
+        firm = response.meta['discovery_firm']
+        try:
+            state = self.firms[firm]
+            try:
+                items = json.loads(response.text)
+            except (ValueError, AttributeError):
+                items = []
+            for item in items if isinstance(items, list) else []:
+                url = isinstance(item, dict) and item.get('link')
+                if url and firm_domain(url) == firm and not is_pruned(url):
+                    state.sitemap_found = True
+                    state.urls.setdefault(canonicalize_url(url), url)
+            self.stats.inc_value('discovery/wp_json_pages')
+
+            page, url = response.meta['wp_page'], response.meta['wp_url']
+            try:
+                total_pages = int(response.headers.get('X-WP-TotalPages') or 1)
+            except ValueError:
+                total_pages = 1
+            if page < total_pages:
+                yield self._request(f"{url}&page={page + 1}", self.parse_wp_items, firm, wp_url=url, wp_page=page + 1)
+        finally:
+            yield from self.done(firm)
+
+    def failed(self, failure):
+        # Missing sitemaps and REST APIs are the normal case, not errors
+        yield from self.done(failure.request.meta['discovery_firm'])
+
+    def done(self, firm):
+        """Count one finished discovery request; after the firm's last one, start its crawl."""
+        state = self.firms[firm]
+        state.pending -= 1
+        if state.pending:
+            return
+
+        bios = [url for url in state.urls.values() if not is_people_index(url)]
+        if state.sitemap_found and len(bios) >= self.min_bios:
+            self.seeded.add(firm)
+            self.stats.set_value(f'firm/{firm}/discovered', len(state.urls))
+            self.spider.logger.info(f"Discovered {len(state.urls)} people pages for {firm} from its sitemaps")
+            yield from self.spider.seed_requests(state.start_url, state.urls.values())
+        else:
+            self.stats.inc_value('discovery/fallback')
+            self.spider.logger.info(f"No usable sitemap for {firm}, crawling links")
+            yield self.spider.start_request(state.start_url)
@@ -4,18 +4,49 @@ import os
 import time
 import json
 import random
-import traceback
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict
 
-# Load the OpenAI API key from environment variables
+from backends import create_backend
+from ratelimit import ModelRateLimiter, retry_after_seconds
+from reducer import count_tokens
+
+# Load the OpenAI API key from environment variables. A missing key is only an error once the
+# OpenAI backend is used, so a local backend or server needs none.
 openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("API Key not found. Please set OPENAI_API_KEY in environment variables.")
 
 # Set the OpenAI API key
 openai.api_key = openai_api_key
 
-def extract_data(cleaned_text):
-    prompt = f"""
+# Upper bound on model calls in flight at once across the whole process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "5"))
+
+# Backend used by the async extraction functions when none is configured with set_backend:
+# 'openai' for the OpenAI API or any compatible server at LLM_BASE_URL, 'local' for a model on CPU
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+# Provider budget; 0 until learned from the x-ratelimit-* headers of the first answer
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+# Completion tokens assumed for a call until its real usage is known
+ESTIMATED_COMPLETION_TOKENS = 300
+
+_backend = None
+_rate_limiter = None
+_pending_calls = 0
+_llm_semaphore = None
+_response_recorder = None
+
+logger = logging.getLogger(__name__)
+
+# Process-wide model usage: calls, prompt_tokens, completion_tokens, retries, failures
+usage = defaultdict(int)
+
+def build_prompt(cleaned_text):
+    return f"""
     You will be provided HTML from a web page. Your goal is to analyze this HTML and return a JSON object with the following structure:
     ```json
         {{
@@ -46,8 +77,107 @@ def extract_data(cleaned_text):
     {cleaned_text}
     """
 
+PEOPLE_SCHEMA = """
+        {{
+        "people": [
+            {{
+            {id_field}"first_name": "",
+            "middle_name": "",
+            "last_name": "",
+            "job_title": "",
+            "direct_phone": "",
+            "direct_phone_extension": "",
+            "mobile_phone": "",
+            "email": "",
+            "location_city": "",
+            "location_state": "",
+            "profile_image_url": "",
+            "practice_areas": ""
+            }}
+        ]
+        }}"""
+
+PEOPLE_NOTES = """
+        - Ensure all values are extracted from the text and assigned to the person they belong to; never copy one person's email or phone to another.
+        - A shared firm phone number or general inbox such as info@lawfirm.com is not a person's direct_phone or email.
+        - Ensure all text is properly cased. We don't want titles, for example, to be fully uppercased.
+        - Do not guess the email address. If the email address is not found in the text, it should be left blank."""
+
+def build_listing_prompt(cleaned_text):
+    """Prompt for a people listing page: one entry per person shown on the page."""
+    return f"""
+    You will be provided HTML from a page that lists several people, such as a firm's attorney directory. Return a JSON object with one entry in "people" for every person listed, with the following structure:
+    ```json{PEOPLE_SCHEMA.format(id_field='')}
+    ```
+    Notes:{PEOPLE_NOTES}
+        - Skip anyone mentioned only in passing, such as in news items or testimonials.
+    Text:
+    {cleaned_text}
+    """
+
+def build_bundle_prompt(bios):
+    """Prompt for several single-person pages at once; bios maps an id to each page's cleaned text."""
+    pages = "\n".join(f"### PAGE {bio_id}\n{cleaned_text}" for bio_id, cleaned_text in bios.items())
+    schema = PEOPLE_SCHEMA.format(id_field='"id": "",\n            ')
+    return f"""
+    You will be provided HTML from several web pages, each about one person. Each page starts with a line "### PAGE <id>". Return a JSON object with exactly one entry in "people" per page, with "id" set to that page's id, and with the following structure:
+    ```json{schema}
+    ```
+    Notes:{PEOPLE_NOTES}
+        - Use only the text of a page for that page's entry.
+    Pages:
+    {pages}
+    """
+
+def prompt_version(build=build_prompt):
+    """Hash of a prompt template and the current backend's model, so cached results from an older prompt or another model are never reused.
+
+    Bundled answers are stored per page under prompt_version(), as they have the same shape as single-page ones.
+    """
+    return hashlib.sha256((build("") + get_backend().model_id).encode('utf-8')).hexdigest()[:16]
+
+def parse_response(message_content):
+    """Check the model response against the expected person schema and return it unchanged."""
+    # The raw answer is only worth seeing when debugging a prompt
+    logger.debug(f"Received content from OpenAI: {message_content}")
+
+    data = json.loads(message_content)
+
+    # Additional validation to ensure the extracted data matches the expected schema
+    if "person" not in data or not isinstance(data.get("person"), dict):
+        raise ValueError("Invalid JSON schema: Missing 'person' key or incorrect type")
+
+    required_fields = [
+        "first_name", "last_name", "job_title", "direct_phone", "direct_phone_extension",
+        "mobile_phone", "email", "location_city", "location_state"
+    ]
+    for field in required_fields:
+        if field not in data["person"]:
+            raise ValueError(f"Invalid JSON schema: Missing required field '{field}' in 'person'")
+
+    return message_content
+
+def parse_people_response(message_content):
+    """Check a multi-person response and return its list of people, missing fields filled with ''."""
+    logger.debug(f"Received content from OpenAI: {message_content}")
+
+    data = json.loads(message_content)
+    people = data.get("people") if isinstance(data, dict) else None
+    if not isinstance(people, list) or not all(isinstance(person, dict) for person in people):
+        raise ValueError("Invalid JSON schema: Missing 'people' key or incorrect type")
+
+    fields = [
+        "first_name", "middle_name", "last_name", "job_title", "direct_phone", "direct_phone_extension",
+        "mobile_phone", "email", "location_city", "location_state", "profile_image_url", "practice_areas"
+    ]
+    return [{**{field: '' for field in fields}, **person} for person in people]
+
+def extract_data(cleaned_text):
+    prompt = build_prompt(cleaned_text)
+
     max_retries = 5
     for attempt in range(max_retries):
+        message_content = None
         try:
             ## DO NOT EDIT THIS SECTION
             response = openai.chat.completions.create(
@@ -67,40 +197,235 @@ def extract_data(cleaned_text):
             # Access the message content from the response
             message_content = response.choices[0].message.content
 
-            # Log the raw content received
-            print(f"Received content from OpenAI: {message_content}")
-
-            try:
-                data = json.loads(message_content)
-                print("Parsed JSON data:", data)
-            except json.JSONDecodeError:
-                print("Failed to parse JSON data.")
-
-
-            # Additional validation to ensure the extracted data matches the expected schema
-            if "person" not in data or not isinstance(data.get("person"), dict):
-                raise ValueError("Invalid JSON schema: Missing 'person' key or incorrect type")
-
-            required_fields = [
-                "first_name", "last_name", "job_title", "direct_phone", "direct_phone_extension",
-                "mobile_phone", "email", "location_city", "location_state"
-            ]
-            for field in required_fields:
-                if field not in data["person"]:
-                    raise ValueError(f"Invalid JSON schema: Missing required field '{field}' in 'person'")
-
-            return message_content
+            return parse_response(message_content)
         except (json.JSONDecodeError, ValueError) as e:
-            print(f"Validation error: {e}. Content was: {message_content}")
-            traceback.print_exc()
+            logger.warning(f"Validation error: {e}")
+            logger.debug(f"Content was: {message_content}", exc_info=True)
             time.sleep(2 ** attempt + random.uniform(0, 1))
-        except openai.error.OpenAIError as e:
-            print(f"OpenAI API error: {e}. Retrying in {2 ** attempt + random.uniform(0, 1)} seconds...")
-            traceback.print_exc()
+        except openai.OpenAIError as e:
+            logger.warning(f"OpenAI API error: {e}. Retrying...")
+            logger.debug("OpenAI API error", exc_info=True)
             time.sleep(2 ** attempt + random.uniform(0, 1))
         except Exception as e:
-            print(f"Unexpected error: {e}. Retrying in {2 ** attempt + random.uniform(0, 1)} seconds...")
-            traceback.print_exc()
+            logger.warning(f"Unexpected error: {e}. Retrying...")
+            logger.debug("Unexpected error", exc_info=True)
             time.sleep(2 ** attempt + random.uniform(0, 1))
 
     return '{}'
+
+def set_llm_concurrency(limit):
+    """Change how many model calls may run at once. Takes effect for calls started afterwards."""
+    global LLM_MAX_CONCURRENCY, _llm_semaphore
+    LLM_MAX_CONCURRENCY = max(1, int(limit))
+    _llm_semaphore = None
+
+def set_response_recorder(recorder):
+    """Call recorder(prompt, message_content) for every valid model response, e.g. to build a replay corpus."""
+    global _response_recorder
+    _response_recorder = recorder
+
+def record_response(prompt, message_content):
+    """Pass a response to the recorder, if one is set; also used for answers served from the cache."""
+    if _response_recorder:
+        _response_recorder(prompt, message_content)
+
+def set_rate_limits(requests_per_minute=0, tokens_per_minute=0):
+    """Start from a known requests/tokens per minute budget; 0 leaves it to the response headers."""
+    global _rate_limiter
+    _rate_limiter = ModelRateLimiter(requests_per_minute, tokens_per_minute)
+
+def get_rate_limiter():
+    """Return the process-wide ModelRateLimiter shared by every model call."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = ModelRateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE)
+    return _rate_limiter
+
+def pending_calls():
+    """Model calls waiting for the rate limit or a concurrency slot, backing off, or in flight."""
+    return _pending_calls
+
+def get_llm_semaphore():
+    """Return the process-wide semaphore that bounds concurrent model calls."""
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+def set_backend(backend):
+    """Send every later async model call to backend, e.g. one made with backends.create_backend."""
+    global _backend
+    _backend = backend
+
+def get_backend():
+    """Return the backend in use, creating it from the LLM_* environment variables on first use.
+
+    The backend is shared, so an HTTP backend's connections are pooled between calls.
+    """
+    global _backend
+    if _backend is None:
+        _backend = create_backend(
+            LLM_BACKEND,
+            model=os.getenv("LLM_MODEL"),
+            base_url=os.getenv("LLM_BASE_URL"),
+            model_path=os.getenv("LOCAL_MODEL_PATH"),
+            batch_size=int(os.getenv("LOCAL_BATCH_SIZE", "4")),
+            max_new_tokens=int(os.getenv("LOCAL_MAX_NEW_TOKENS", "512")),
+        )
+    return _backend
+
+async def complete_async(prompt, parse, default):
+    """Send prompt to the model and return parse(response), retrying with backoff; default if every attempt fails.
+
+    Calls first wait for room in the provider's rate limit budget, then for a
+    concurrency slot. The semaphore is only held while the request is in
+    flight, so a call that is backing off does not keep other pages waiting.
+    A 429 waits out its Retry-After, and so does every other call.
+    """
+    global _pending_calls
+    backend = get_backend()
+    limiter = get_rate_limiter()
+    estimate = count_tokens(prompt) + ESTIMATED_COMPLETION_TOKENS
+
+    _pending_calls += 1
+    try:
+        max_retries = 5
+        for attempt in range(max_retries):
+            message_content = None
+            delay = 2 ** attempt + random.uniform(0, 1)
+            if attempt:
+                usage['retries'] += 1
+            try:
+                await limiter.acquire(estimate)
+                async with get_llm_semaphore():
+                    message_content, prompt_tokens, completion_tokens, headers = await backend.complete(prompt)
+                limiter.update(headers)
+                limiter.settle(estimate, prompt_tokens + completion_tokens)
+                usage['calls'] += 1
+                usage['prompt_tokens'] += prompt_tokens
+                usage['completion_tokens'] += completion_tokens
+
+                result = parse(message_content)
+                record_response(prompt, message_content)
+                return result
+            except (json.JSONDecodeError, ValueError) as e:
+                logger.warning(f"Validation error: {e}. Retrying in {delay:.1f} seconds...")
+                logger.debug(f"Content was: {message_content}", exc_info=True)
+                await asyncio.sleep(delay)
+            except openai.RateLimitError as e:
+                headers = getattr(e, 'response', None) and e.response.headers
+                limiter.update(headers)
+                delay = retry_after_seconds(headers) or delay
+                limiter.block(delay)
+                logger.warning(f"Rate limited by the model provider. Retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+            except openai.OpenAIError as e:
+                logger.warning(f"OpenAI API error: {e}. Retrying in {delay:.1f} seconds...")
+                logger.debug("OpenAI API error", exc_info=True)
+                await asyncio.sleep(delay)
+            except Exception as e:
+                logger.warning(f"Unexpected error: {e}. Retrying in {delay:.1f} seconds...")
+                logger.debug("Unexpected error", exc_info=True)
+                await asyncio.sleep(delay)
+
+        usage['failures'] += 1
+        return default
+    finally:
+        _pending_calls -= 1
+
+async def extract_data_async(cleaned_text):
+    """Awaitable version of extract_data that never blocks the event loop."""
+    return await complete_async(build_prompt(cleaned_text), parse_response, '{}')
+
+async def extract_people_async(cleaned_text):
+    """Extract every person on a listing page. Returns a list of person dicts, empty if the model failed."""
+    return await complete_async(build_listing_prompt(cleaned_text), parse_people_response, [])
+
+async def extract_bundle_async(bios):
+    """Extract several single-person pages in one call.
+
+    bios maps an id to each page's cleaned text. Returns a dict of id to a
+    '{"person": {...}}' string, the same shape extract_data_async returns; ids
+    the model left out are missing from it.
+    """
+    people = await complete_async(build_bundle_prompt(bios), parse_people_response, [])
+    results = {}
+    for person in people:
+        bio_id = str(person.pop('id', ''))
+        if bio_id in bios and bio_id not in results:
+            results[bio_id] = json.dumps({'person': person})
+
+    # Bundles depend on timing; record each page's answer under its single-page prompt too so replays can find it
+    for bio_id, content in results.items():
+        record_response(build_prompt(bios[bio_id]), content)
+    return results
+
+class BioBundler:
+    """Collect small bios for a short while and send them to the model together.
+
+    extract() has the same contract as extract_data_async. Bios are sent once
+    bundle_size are waiting or max_wait seconds after the first one arrived;
+    a bundle of one, or a bio the model left out of the answer, goes through a
+    single-page call instead.
+    """
+
+    def __init__(self, bundle_size=4, max_wait=1.0, on_call=None):
+        self.bundle_size = bundle_size
+        self.max_wait = max_wait
+        self.on_call = on_call
+        self.waiting = {}
+        self.timer = None
+        self.next_id = 0
+        self.calls = 0
+        self.tasks = set()  # The loop holds only weak references to tasks
+
+    async def extract(self, cleaned_text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.next_id += 1
+        self.waiting[str(self.next_id)] = (cleaned_text, future)
+
+        if len(self.waiting) >= self.bundle_size:
+            self.send()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self.send)
+        return await future
+
+    def send(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        bundle, self.waiting = self.waiting, {}
+        if bundle:
+            task = asyncio.ensure_future(self._run(bundle))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def _count_call(self):
+        self.calls += 1
+        if self.on_call:
+            self.on_call()
+
+    async def _run(self, bundle):
+        try:
+            results = {}
+            if len(bundle) > 1:
+                self._count_call()
+                results = await extract_bundle_async({bio_id: text for bio_id, (text, _) in bundle.items()})
+            missing = [bio_id for bio_id in bundle if bio_id not in results]
+            for _ in missing:
+                self._count_call()
+            answers = await asyncio.gather(*(extract_data_async(bundle[bio_id][0]) for bio_id in missing),
+                                           return_exceptions=True)
+            results.update(zip(missing, answers))
+            for bio_id, (_, future) in bundle.items():
+                if future.done():  # The page's request was cancelled
+                    continue
+                if isinstance(results[bio_id], Exception):
+                    future.set_exception(results[bio_id])
+                else:
+                    future.set_result(results[bio_id])
+        except Exception as e:
+            for _, future in bundle.values():
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,205 @@
+# frontier.py
+import re
+from urllib.parse import urlparse, parse_qsl, urlencode
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from classifier import url_score, PEOPLE_SLUGS
+from batch import firm_domain
+from structured import is_complete
+
+# Query parameters that only identify where a click came from
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|_ga|_gl|hsa_\w+|ref|source|share)$', re.IGNORECASE)
+
+INDEX_FILES = re.compile(r'/(index|default)\.(html?|php|aspx?)$', re.IGNORECASE)
+
+# Files we can never extract a person from
+PRUNED_EXTENSIONS = (
+    '.pdf', '.vcf', '.ics', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.zip',
+    '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.mp3', '.mp4', '.mov', '.xml', '.rss'
+)
+
+# Archive, feed and calendar paths that multiply pages without adding people
+PRUNED_PATHS = re.compile(
+    r'/(blog|news|tag|tags|category|categories|author|feed|rss|wp-json|wp-admin|wp-login\.php|'
+    r'calendar|events?|print|share|search|comments?)(/|$)'
+    r'|/\d{4}/\d{2}(/|$)',  # Date archives
+    re.IGNORECASE
+)
+PAGINATION = re.compile(r'/page/\d+/?$', re.IGNORECASE)
+PRUNED_QUERY = re.compile(r'(^|&)(replytocom|ical|outlook-ical|format=vcf|vcard|share|print)\b', re.IGNORECASE)
+
+# Request priorities; Scrapy fetches higher values first
+BIO_PRIORITY = 100
+PEOPLE_INDEX_PRIORITY = 50
+DEFAULT_PRIORITY = 0
+LOW_PRIORITY = -10
+
+# A people index linking to at least this many bios counts as the firm's directory
+MIN_INDEX_BIOS = 3
+
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'esq'}
+
+def canonicalize_url(url):
+    """Reduce a URL to the form used for deduplication.
+
+    http and https, 'www.', default ports, trailing slashes, index files,
+    fragments, tracking parameters and query order don't make a different page.
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+
+    path = re.sub(r'/{2,}', '/', parsed.path or '/')
+    path = INDEX_FILES.sub('/', path).rstrip('/').lower()
+
+    query = sorted((key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+                   if not TRACKING_PARAMS.match(key))
+    canonical = host + path
+    if query:
+        canonical += '?' + urlencode(query)
+    return canonical
+
+def is_people_index(url):
+    """True for a firm's people directory, e.g. /attorneys/ or /our-people/page/2/."""
+    path = PAGINATION.sub('', urlparse(url).path.lower())
+    last = re.sub(r'\.(php|html?|aspx?|cfm)$', '', path.rstrip('/').rsplit('/', 1)[-1])
+    return last in PEOPLE_SLUGS
+
+def is_pruned(url):
+    """True for links that are never worth a fetch: files, archives, feeds, calendars and non-directory pagination."""
+    parsed = urlparse(url)
+    path = parsed.path.lower()
+    if path.endswith(PRUNED_EXTENSIONS) or PRUNED_PATHS.search(path) or PRUNED_QUERY.search(parsed.query):
+        return True
+    # Paging through the people directory is how we find everyone; paging anything else is an archive
+    paginated = PAGINATION.search(path) or re.search(r'(^|&)(page|paged|pg)=\d+', parsed.query, re.IGNORECASE)
+    return bool(paginated) and not is_people_index(url)
+
+def url_priority(url):
+    """Crawl bios first, then people directories, then everything else."""
+    if is_people_index(url):
+        return PEOPLE_INDEX_PRIORITY
+    score = url_score(url)
+    if score >= 0.5:
+        return BIO_PRIORITY
+    if score > 0:
+        return PEOPLE_INDEX_PRIORITY
+    return DEFAULT_PRIORITY if score == 0 else LOW_PRIORITY
+
+class Frontier:
+    """Decides which discovered links get requested, in what order, and when a firm is done.
+
+    Links are canonicalized and deduplicated before they are queued, pruned if
+    they can't lead to a person, and given a priority from url_priority(). Once
+    a firm's people directory has been parsed and every bio and directory page
+    queued for it has come back, its remaining low-priority requests are dropped.
+    """
+
+    def __init__(self, crawler, early_stop=True):
+        self.crawler = crawler
+        self.early_stop = early_stop
+        self.seen = set()
+        self.open_people_pages = {}  # firm -> canonical URLs of queued bio/directory pages
+        self.directory_found = set()
+        self.listed = set()  # (firm, last name, first initial) of people a listing page fully covered
+
+    @property
+    def stats(self):
+        # Crawler stats only exist once the crawl starts, after the spider is built
+        return self.crawler.stats
+
+    def add(self, url):
+        """Return the priority to request url with, or None if it's a duplicate or not worth fetching."""
+        key = canonicalize_url(url)
+        if key in self.seen:
+            self.stats.inc_value('frontier/duplicate')
+            return None
+        self.seen.add(key)
+        if is_pruned(url):
+            self.stats.inc_value('frontier/pruned')
+            return None
+
+        priority = url_priority(url)
+        if priority >= PEOPLE_INDEX_PRIORITY:
+            self.open_people_pages.setdefault(firm_domain(url), set()).add(key)
+        self.stats.inc_value('frontier/queued')
+        return priority
+
+    def mark_seen(self, url):
+        """Record a URL queued outside add(), such as a start URL or a replayed checkpoint entry."""
+        self.seen.add(canonicalize_url(url))
+
+    def page_parsed(self, url, links):
+        """Note the links found on a fetched page; a directory with several bios marks its firm as found."""
+        if is_people_index(url) and sum(url_priority(link) == BIO_PRIORITY for link in links) >= MIN_INDEX_BIOS:
+            self.directory_found.add(firm_domain(url))
+
+    def add_listed(self, url, person):
+        """Remember a person a listing page gave every core field for, so their bio needn't be fetched."""
+        first = re.sub(r'[^a-z]', '', person.get('first_name', '').lower())
+        last = re.sub(r'[^a-z]', '', person.get('last_name', '').lower())
+        if first and last and is_complete({'person': person}):
+            self.listed.add((firm_domain(url), last, first[0]))
+
+    def is_listed(self, url):
+        """True for a bio URL like /attorneys/jane-q-doe/ whose person a listing already covered."""
+        if not self.listed or url_priority(url) != BIO_PRIORITY:
+            return False
+        slug = urlparse(url).path.rstrip('/').rsplit('/', 1)[-1].lower()
+        slug = re.sub(r'\.(php|html?|aspx?|cfm)$', '', slug)
+        tokens = [token for token in re.split(r'[-_]+', slug) if token.isalpha() and token not in NAME_SUFFIXES]
+        return len(tokens) >= 2 and (firm_domain(url), tokens[-1], tokens[0][0]) in self.listed
+
+    def finished(self, url):
+        """Note that a queued page came back, or failed for good."""
+        self.open_people_pages.get(firm_domain(url), set()).discard(canonicalize_url(url))
+
+    def is_exhausted(self, url):
+        """True once the firm's directory and every bio queued from it have been fetched."""
+        firm = firm_domain(url)
+        return self.early_stop and firm in self.directory_found and not self.open_people_pages.get(firm)
+
+class FrontierMiddleware:
+    """Drop requests that can't add anyone new, and report pages per bio.
+
+    That is a firm's leftover low-priority requests once its people have all
+    been fetched, and bios of people a listing page already covered.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def process_request(self, request, spider):
+        frontier = getattr(spider, 'frontier', None)
+        if frontier and request.priority < PEOPLE_INDEX_PRIORITY and frontier.is_exhausted(request.url):
+            self.stats.inc_value('frontier/skipped_after_directory')
+            raise IgnoreRequest(f"People directory already exhausted for {firm_domain(request.url)}")
+        if frontier and frontier.is_listed(request.url):
+            self.stats.inc_value('frontier/skipped_listed')
+            frontier.finished(request.url)
+            raise IgnoreRequest(f"Already extracted from a listing page: {request.url}")
+        return None
+
+    def process_exception(self, request, exception, spider):
+        # A failed bio fetch must not hold the firm open forever
+        frontier = getattr(spider, 'frontier', None)
+        if frontier and not isinstance(exception, IgnoreRequest):
+            frontier.finished(request.url)
+        return None
+
+    def spider_closed(self, spider, reason):
+        pages = self.stats.get_value('downloader/response_count', 0)
+        bios = sum(value for key, value in self.stats.get_stats().items()
+                   if key.startswith('firm/') and key.endswith('/bios'))
+        if bios:
+            self.stats.set_value('frontier/pages_per_bio', round(pages / bios, 2))
+        spider.logger.info(f"Fetched {pages} pages for {bios} bios")
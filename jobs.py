@@ -0,0 +1,299 @@
+# jobs.py
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from twisted.internet import task
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+JOBS_DB = os.getenv("JOBS_DB", "jobs.sqlite")
+JOB_LOG_DIR = os.getenv("JOB_LOG_DIR", "logs")
+
+# Rough peak memory of one crawl (interpreter + Chromium); used to size the worker pool
+CRAWL_MEMORY_MB = int(os.getenv("CRAWL_MEMORY_MB", "1024"))
+
+JOB_FIELDS = [
+    'id', 'start_urls', 'output_file', 'status', 'created_at', 'started_at', 'finished_at', 'pid',
+    'pages_crawled', 'bios_extracted', 'llm_calls', 'errors', 'message'
+]
+
+def connect(db_path=None):
+    conn = sqlite3.connect(db_path or JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            start_urls TEXT NOT NULL,
+            output_file TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            pid INTEGER,
+            pages_crawled INTEGER NOT NULL DEFAULT 0,
+            bios_extracted INTEGER NOT NULL DEFAULT 0,
+            llm_calls INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            message TEXT NOT NULL DEFAULT ''
+        )
+    """)
+    return conn
+
+def _to_dict(row):
+    job = {field: row[field] for field in JOB_FIELDS}
+    job['start_urls'] = json.loads(job['start_urls'])
+    return job
+
+def enqueue(start_urls, output_file, db_path=None):
+    """Queue a crawl of one or more firms and return its job id."""
+    with connect(db_path) as conn:
+        cursor = conn.execute(
+            "INSERT INTO jobs (start_urls, output_file, created_at) VALUES (?, ?, ?)",
+            (json.dumps(start_urls), output_file, time.time())
+        )
+        return cursor.lastrowid
+
+def get_job(job_id, db_path=None):
+    with connect(db_path) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _to_dict(row) if row else None
+
+def list_jobs(limit=100, db_path=None):
+    with connect(db_path) as conn:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_to_dict(row) for row in rows]
+
+def count_jobs(db_path=None):
+    """Number of jobs in each status."""
+    with connect(db_path) as conn:
+        return {row[0]: row[1] for row in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+
+def cancel_job(job_id, db_path=None):
+    """Cancel a queued job, or ask the worker running it to stop. Returns False if it already finished."""
+    with connect(db_path) as conn:
+        queued = conn.execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        ).rowcount
+        running = conn.execute(
+            "UPDATE jobs SET status = 'cancelling' WHERE id = ? AND status = 'running'", (job_id,)
+        ).rowcount
+    return bool(queued or running)
+
+def update_progress(job_id, db_path=None, **counts):
+    """Store the latest counters reported by a running crawl."""
+    columns = ', '.join(f"{name} = ?" for name in counts)
+    with connect(db_path) as conn:
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*counts.values(), job_id))
+
+def claim_next(pid, db_path=None):
+    """Atomically move the oldest queued job to running and return it, or None if the queue is empty."""
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', started_at = ?, pid = ? WHERE id = ?",
+            (time.time(), pid, row['id'])
+        )
+        conn.commit()
+        return _to_dict(row)
+    finally:
+        conn.close()
+
+def finish_job(job_id, status, message='', db_path=None):
+    with connect(db_path) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, finished_at = ?, message = ? WHERE id = ?",
+            (status, time.time(), message, job_id)
+        )
+
+def signal_crawl(pid, signum):
+    """Signal a crawl and everything it started (Playwright's browsers); it runs in its own session."""
+    try:
+        os.killpg(pid, signum)
+    except ProcessLookupError:
+        pass
+
+def process_cmdline(pid):
+    """A process's argument list, or None if it can't be read."""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return [arg.decode('utf-8', 'replace') for arg in f.read().split(b'\0') if arg]
+    except OSError:
+        pass
+    if psutil is not None:  # No /proc on macOS
+        try:
+            return psutil.Process(pid).cmdline()
+        except Exception:
+            pass
+    return None
+
+def orphaned_crawl(pid, job_id):
+    """True if `pid` is still job_id's crawl, left behind by a server that went away without stopping it.
+
+    The PID was stored by an earlier server and may have been reused since
+    (after a reboot, say), so the process must be a session leader running
+    main.py for this very job before anything is signalled.
+    """
+    try:
+        if os.getsid(pid) != pid or pid == os.getsid(0):
+            return False
+    except (ProcessLookupError, PermissionError):
+        return False
+    cmdline = process_cmdline(pid)
+    if not cmdline:
+        return False
+    return (any(os.path.basename(arg) == 'main.py' for arg in cmdline)
+            and any(a == '--job-id' and b == str(job_id) for a, b in zip(cmdline, cmdline[1:])))
+
+def stop_orphaned_crawl(pid, job_id, timeout=60):
+    signal_crawl(pid, signal.SIGTERM)
+    deadline = time.time() + timeout
+    while orphaned_crawl(pid, job_id) and time.time() < deadline:
+        time.sleep(0.5)
+    if orphaned_crawl(pid, job_id):
+        signal_crawl(pid, signal.SIGKILL)
+
+def requeue_interrupted(db_path=None):
+    """Put jobs left running by a previous server back in the queue.
+
+    A crawl that outlived its worker (the server was killed outright) is
+    stopped first, so the resumed job doesn't run next to it.
+    """
+    with connect(db_path) as conn:
+        rows = conn.execute("SELECT id, pid FROM jobs WHERE status IN ('running', 'cancelling') AND pid IS NOT NULL").fetchall()
+    for row in rows:
+        if orphaned_crawl(row['pid'], row['id']):
+            stop_orphaned_crawl(row['pid'], row['id'])
+    with connect(db_path) as conn:
+        conn.execute("UPDATE jobs SET status = 'queued', pid = NULL WHERE status IN ('running', 'cancelling')")
+
+def default_worker_count():
+    """One worker per core, but never more crawls than physical memory can hold."""
+    workers = os.cpu_count() or 1
+    try:
+        memory_mb = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+        workers = min(workers, memory_mb // CRAWL_MEMORY_MB)
+    except (ValueError, OSError, AttributeError):  # sysconf isn't available on every platform
+        pass
+    return max(1, workers)
+
+def run_job(job, db_path=None, poll_interval=1.0):
+    """Run one crawl job in a fresh process (the Twisted reactor can't be restarted) and record the outcome."""
+    os.makedirs(JOB_LOG_DIR, exist_ok=True)
+    log_path = os.path.join(JOB_LOG_DIR, f"job-{job['id']}.log")
+    main_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    command = [sys.executable, main_script, *job['start_urls'], job['output_file'], '--job-id', str(job['id'])]
+    if job['started_at']:
+        command.append('--resume')  # Interrupted by a server restart; carry on from its checkpoint
+
+    env = dict(os.environ, JOBS_DB=db_path or JOBS_DB)
+    with open(log_path, 'w') as log_file:
+        # A session of its own, so the crawl and its browsers can be stopped as a group
+        process = subprocess.Popen(command, stdout=log_file, stderr=subprocess.STDOUT, env=env, start_new_session=True)
+        update_progress(job['id'], db_path, pid=process.pid)
+
+        try:
+            while process.poll() is None:
+                current = get_job(job['id'], db_path)
+                if current and current['status'] == 'cancelling':
+                    stop_crawl(process)
+                    finish_job(job['id'], 'cancelled', 'Stopped by user', db_path)
+                    return
+                time.sleep(poll_interval)
+        finally:
+            # The worker is going away (server shutdown or reloader restart); the job stays running
+            # and is resumed by the next server, so don't leave this crawl behind
+            if process.poll() is None:
+                stop_crawl(process)
+
+    if process.returncode == 0:
+        finish_job(job['id'], 'done', db_path=db_path)
+    else:
+        finish_job(job['id'], 'failed', f"Crawler exited with code {process.returncode}, see {log_path}", db_path)
+
+def stop_crawl(process, timeout=60):
+    signal_crawl(process.pid, signal.SIGTERM)  # Scrapy shuts down gracefully on SIGTERM
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        signal_crawl(process.pid, signal.SIGKILL)
+        process.wait()
+
+def worker_loop(db_path=None, idle_interval=2.0):
+    """Pull jobs from the queue forever, one crawl at a time."""
+    # The server terminates its daemon workers on exit; unwind so run_job stops the running crawl
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    while True:
+        job = claim_next(os.getpid(), db_path)
+        if job is None:
+            time.sleep(idle_interval)
+            continue
+        try:
+            run_job(job, db_path)
+        except Exception as e:
+            finish_job(job['id'], 'failed', str(e), db_path)
+
+def start_workers(count=None, db_path=None):
+    """Start the worker pool as daemon processes so it goes away with the server."""
+    requeue_interrupted(db_path)
+    workers = []
+    for _ in range(count or default_worker_count()):
+        worker = multiprocessing.Process(target=worker_loop, args=(db_path,), daemon=True)
+        worker.start()
+        workers.append(worker)
+    return workers
+
+class JobProgress:
+    """Report a crawl's counters to its row in the jobs table while it runs."""
+
+    def __init__(self, stats, job_id, db_path, interval):
+        self.stats = stats
+        self.job_id = job_id
+        self.db_path = db_path
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        job_id = crawler.settings.getint('JOB_ID')
+        if not job_id:
+            raise NotConfigured
+        extension = cls(crawler.stats, job_id, crawler.settings.get('JOBS_DB', JOBS_DB),
+                        crawler.settings.getfloat('JOB_PROGRESS_INTERVAL', 5))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.task = task.LoopingCall(self.report)
+        self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.report()
+
+    def report(self):
+        stats = self.stats.get_stats()
+        update_progress(
+            self.job_id, self.db_path,
+            pages_crawled=sum(v for k, v in stats.items() if k.startswith('firm/') and k.endswith('/pages')),
+            bios_extracted=sum(v for k, v in stats.items() if k.startswith('firm/') and k.endswith('/bios')),
+            llm_calls=stats.get('extraction/llm_calls', 0),
+            errors=stats.get('log_count/ERROR', 0),
+        )
@@ -1,22 +1,94 @@
 # main.py
 import sys
+import os
+import shutil
+import hashlib
+import argparse
 import asyncio
 from twisted.internet import asyncioreactor  # Import the correct reactor
 asyncioreactor.install()  # Install AsyncioSelectorReactor
 
 from scraper import EmployeeSpider
 from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+from batch import load_start_urls
 
-def run_spider(start_url, csv_file):
-    process = CrawlerProcess()
+def command_line_settings(settings):
+    """Settings given on the command line, at a priority that overrides the spider's custom_settings."""
+    result = Settings()
+    result.setdict(settings or {}, priority='cmdline')
+    return result
+
+def run_spider(start_url, csv_file, settings=None):
+    process = CrawlerProcess(command_line_settings(settings))
     process.crawl(EmployeeSpider, start_url=start_url, csv_file=csv_file)
     process.start()
 
+def run_batch(start_urls, csv_file, concurrency=16, llm_concurrency=5, settings=None):
+    """Crawl many firms in one process.
+
+    A single spider takes every start URL, so the firms share one Playwright
+    browser and one cap on concurrent model calls, while
+    CONCURRENT_REQUESTS_PER_DOMAIN still limits how hard each firm is hit.
+    """
+    process = CrawlerProcess(command_line_settings({
+        **(settings or {}),
+        'BATCH_CONCURRENT_REQUESTS': concurrency,
+        'BATCH_LLM_MAX_CONCURRENCY': llm_concurrency,
+    }))
+    process.crawl(EmployeeSpider, start_url=start_urls, csv_file=csv_file)
+    process.start()
+
+def default_checkpoint_dir(start_urls, csv_file):
+    """Checkpoint directory for a run, derived from its output file and start URLs."""
+    name = os.path.splitext(os.path.basename(csv_file))[0]
+    digest = hashlib.md5('\n'.join(sorted(start_urls)).encode()).hexdigest()[:8]
+    return os.path.join('crawls', f"{name}-{digest}")
+
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Usage: python main.py <start_url> <output_csv_file>")
+    parser = argparse.ArgumentParser(
+        usage="python main.py [--batch FILE] [start_url ...] <output_csv_file>"
+    )
+    parser.add_argument('targets', nargs='+', help="Start URL(s) followed by the output CSV file")
+    parser.add_argument('--batch', help="Text file of start URLs, or a results CSV like data/bulk_test.csv")
+    parser.add_argument('--concurrency', type=int, default=16, help="Requests in flight across all firms")
+    parser.add_argument('--llm-concurrency', type=int, default=5, help="Model calls in flight across all firms")
+    parser.add_argument('--job-id', type=int, help="Report progress to this row of the jobs queue")
+    parser.add_argument('--resume', action='store_true', help="Continue the previous run for these URLs and output file")
+    parser.add_argument('--checkpoint-dir', help="Where to keep checkpoints (default: crawls/<output>-<hash>)")
+    parser.add_argument('--verbose', action='store_true', help="Debug logging: every page, blocked resource and model answer")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only fetch and extract pages changed since the last --incremental run; write <output>.changes.csv")
+    parser.add_argument('--record', metavar='DIR', help="Save fetched pages and model responses here for `python replay.py run`")
+    args = parser.parse_args()
+
+    csv_file = args.targets[-1]
+    start_urls = args.targets[:-1]
+    if args.batch:
+        start_urls += load_start_urls(args.batch)
+
+    if not start_urls:
+        parser.print_usage()
         sys.exit(1)
 
-    start_url = sys.argv[1]
-    csv_file = sys.argv[2]
-    run_spider(start_url, csv_file)
+    # Every run checkpoints its frontier and extraction state; only --resume reuses an old one
+    checkpoint_dir = args.checkpoint_dir or default_checkpoint_dir(start_urls, csv_file)
+    if not args.resume and os.path.isdir(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir)
+    elif args.resume and not os.path.isdir(checkpoint_dir):
+        print(f"Nothing to resume in {checkpoint_dir}, starting a new run")
+
+    settings = {'CHECKPOINT_DIR': checkpoint_dir}
+    if args.job_id:
+        settings['JOB_ID'] = args.job_id
+    if args.record:
+        settings['RECORD_DIR'] = args.record
+    if args.verbose:
+        settings['VERBOSE'] = True
+    if args.incremental:
+        settings['INCREMENTAL_ENABLED'] = True
+
+    if len(start_urls) == 1:
+        run_spider(start_urls[0], csv_file, settings)
+    else:
+        run_batch(start_urls, csv_file, args.concurrency, args.llm_concurrency, settings)
@@ -0,0 +1,160 @@
+# metrics.py
+import glob
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from scrapy import signals
+from twisted.internet import task
+
+# Each crawl process writes a snapshot of its stats here; the web app serves them at /metrics
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+
+@contextmanager
+def timed(stats, stage):
+    """Time the enclosed block into the crawl stats under timing/<stage>/."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stats, stage, time.perf_counter() - start)
+
+def observe(stats, stage, seconds):
+    """Record one measurement for a stage: call count, total seconds and the slowest call."""
+    stats.inc_value(f'timing/{stage}/count')
+    stats.inc_value(f'timing/{stage}/seconds', seconds)
+    stats.max_value(f'timing/{stage}/max_seconds', seconds)
+
+def stage_table(stats):
+    """Rows of (stage, calls, total seconds, mean ms, max ms), slowest total first."""
+    rows = []
+    for key, count in stats.items():
+        match = re.fullmatch(r'timing/(.+)/count', key)
+        if match and count:
+            stage = match.group(1)
+            total = stats.get(f'timing/{stage}/seconds', 0)
+            rows.append((stage, count, total, total * 1000 / count, stats.get(f'timing/{stage}/max_seconds', 0) * 1000))
+    return sorted(rows, key=lambda row: -row[2])
+
+def format_summary(stats):
+    """Human-readable end-of-run report: where the time went and the main counters."""
+    def total(suffix):
+        return sum(v for k, v in stats.items() if k.startswith('firm/') and k.endswith(suffix))
+
+    lines = ["stage                 calls   total_s   mean_ms    max_ms"]
+    for stage, count, seconds, mean_ms, max_ms in stage_table(stats):
+        lines.append(f"{stage:20s} {count:6d} {seconds:9.2f} {mean_ms:9.1f} {max_ms:9.1f}")
+    lines.append(
+        f"pages {total('/pages')}, bios {total('/bios')}, "
+        f"llm calls {stats.get('llm/calls', 0)} ({stats.get('llm/retries', 0)} retries, {stats.get('llm/failures', 0)} failed, {stats.get('llm/rate_limited', 0)} rate limited), "
+        f"tokens {stats.get('llm/prompt_tokens', 0)} in / {stats.get('llm/completion_tokens', 0)} out, "
+        f"cache hits {stats.get('extraction_cache/hit', 0)}, validation failures {stats.get('validation/failed', 0)}"
+    )
+    return '\n'.join(lines)
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name).strip('_')
+
+def _label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_samples(stats):
+    """Map crawl stats keys to (metric name, labels) pairs; non-numeric stats are skipped."""
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        match = re.fullmatch(r'timing/(.+)/(count|seconds|max_seconds)', key)
+        if match:
+            name = {'count': 'crawl_stage_calls_total', 'seconds': 'crawl_stage_seconds_total',
+                    'max_seconds': 'crawl_stage_max_seconds'}[match.group(2)]
+            yield name, {'stage': match.group(1)}, value
+            continue
+        match = re.fullmatch(r'firm/([^/]+)/(.+)', key)
+        if match:
+            yield _metric_name(f'crawl_firm_{match.group(2)}'), {'firm': match.group(1)}, value
+            continue
+        yield _metric_name(f'crawl_{key}'), {}, value
+
+def render_prometheus(snapshots, extra=()):
+    """Render Prometheus text exposition format.
+
+    snapshots is a list of (labels, stats) pairs, one per crawl; extra is an
+    iterable of ready-made (name, labels, value) samples.
+    """
+    samples = {}
+    for labels, stats in snapshots:
+        for name, sample_labels, value in prometheus_samples(stats):
+            samples.setdefault(name, []).append(({**labels, **sample_labels}, value))
+    for name, labels, value in extra:
+        samples.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(samples):
+        lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+        for labels, value in samples[name]:
+            label_text = ','.join(f'{key}="{_label_value(val)}"' for key, val in sorted(labels.items()))
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+def load_snapshots(metrics_dir=METRICS_DIR):
+    """Read every crawl's latest snapshot as (labels, stats) pairs."""
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(metrics_dir, '*.json'))):
+        try:
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue  # Being replaced right now, or not ours
+        snapshots.append(({'run': snapshot.get('run', ''), 'finished': str(snapshot.get('finished', False)).lower()},
+                          snapshot.get('stats', {})))
+    return snapshots
+
+class CrawlMetrics:
+    """Keep a snapshot of the crawl's stats on disk for /metrics, and log a per-run summary when it ends."""
+
+    def __init__(self, stats, metrics_dir, run_name, interval):
+        self.stats = stats
+        self.metrics_dir = metrics_dir
+        self.run_name = run_name
+        self.interval = interval
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        job_id = settings.getint('JOB_ID')
+        run_name = f"job-{job_id}" if job_id else f"{crawler.spidercls.name}-{os.getpid()}"
+        extension = cls(crawler.stats, settings.get('METRICS_DIR', METRICS_DIR), run_name,
+                        settings.getfloat('METRICS_INTERVAL', 5))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        if self.interval:
+            self.task = task.LoopingCall(self.write_snapshot)
+            self.task.start(self.interval, now=False)
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        self.write_snapshot(finished=True)
+        spider.logger.info(f"Run summary ({reason}):\n{format_summary(self.stats.get_stats())}")
+
+    def collect_llm_usage(self):
+        from extractor import usage, get_rate_limiter
+        for key, value in usage.items():
+            self.stats.set_value(f'llm/{key}', value)
+        for key, value in get_rate_limiter().snapshot().items():
+            self.stats.set_value(f'llm/{key}', value)
+
+    def write_snapshot(self, finished=False):
+        self.collect_llm_usage()
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        stats = {key: value for key, value in self.stats.get_stats().items()
+                 if isinstance(value, (int, float)) and not isinstance(value, bool)}
+        path = os.path.join(self.metrics_dir, f"{self.run_name}.json")
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'run': self.run_name, 'finished': finished, 'updated_at': time.time(), 'stats': stats}, f)
+        os.replace(f"{path}.tmp", path)
@@ -1,8 +1,34 @@
 # parser.py
 from bs4 import BeautifulSoup, Comment
+import os
 import re
 
-def clean_html(html_content):
+try:
+    from lxml import etree
+except ImportError:  # Fall back to the BeautifulSoup cleaner
+    etree = None
+
+# Which cleaner clean_html uses when no backend is passed: 'lxml' or 'bs4'
+DEFAULT_BACKEND = os.getenv("CLEAN_HTML_BACKEND", "lxml" if etree is not None else "bs4")
+
+TAGS_TO_KEEP = {'a', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p'}
+ATTRIBUTES_TO_REMOVE = {'style', 'class', 'id', 'rel', 'target', 'title'}
+
+# libxml2 makes up an HTML 4.0 doctype for pages without one, so only a declaration in the source is kept
+SOURCE_DOCTYPE = re.compile(r'^\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*)*<!doctype', re.IGNORECASE | re.DOTALL)
+
+def clean_html(html_content, backend=None):
+    """Reduce a page to headings, paragraphs, links and JSON-LD for the extractor.
+
+    backend selects the implementation: 'lxml' walks the tree once and writes the
+    output as it goes; 'bs4' is the original multi-pass BeautifulSoup cleaner.
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'lxml' and etree is not None:
+        return clean_html_lxml(html_content)
+    return clean_html_bs4(html_content)
+
+def clean_html_bs4(html_content):
     # Parse the HTML with BeautifulSoup
     soup = BeautifulSoup(html_content, 'html.parser')
 
@@ -52,3 +78,72 @@ def clean_html(html_content):
     text = re.sub(r'\n\s*\n+', '\n', text)  # Consolidate multiple new lines
 
     return text
+
+def _escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _escape_attribute(value):
+    return _escape_text(value).replace('"', '&quot;')
+
+def _keep_attribute(name):
+    return name not in ATTRIBUTES_TO_REMOVE and not name.startswith('data-') and not name.startswith('on')
+
+def _emit_contents(element, out):
+    if element.text:
+        out.append(_escape_text(element.text))
+    for child in element:
+        _emit(child, out)
+        if child.tail:
+            out.append(_escape_text(child.tail))
+
+def _emit(element, out):
+    tag = element.tag
+    if not isinstance(tag, str):  # Comments and processing instructions
+        return
+    tag = tag.lower()
+
+    # Drop scripts (except JSON-LD), styles and navigation with everything inside them
+    if tag in ('style', 'nav') or (tag == 'script' and element.get('type') != 'application/ld+json'):
+        return
+
+    if tag not in TAGS_TO_KEEP:
+        # Unwrap: keep the contents, lose the tag
+        _emit_contents(element, out)
+        return
+
+    inner = []
+    _emit_contents(element, inner)
+    body = ''.join(inner)
+    if not body.strip():  # Drop tags left with nothing but whitespace
+        return
+
+    attributes = ''.join(
+        f' {name}="{_escape_attribute(value)}"' for name, value in element.items() if _keep_attribute(name)
+    )
+    out.append(f'<{tag}{attributes}>{body}</{tag}>')
+
+def clean_html_lxml(html_content):
+    """Single-pass cleaner: parse with lxml and write the cleaned markup during one tree walk.
+
+    Produces the same kept tags, attributes and text as clean_html_bs4. It differs
+    only where the parsers disagree on malformed markup, and it drops every
+    whitespace-only kept tag where the bs4 cleaner leaves a few behind.
+    """
+    if not html_content or not html_content.strip():
+        return html_content
+
+    parser = etree.HTMLParser(remove_comments=True, remove_pis=True, encoding='utf-8')
+    root = etree.fromstring(html_content.encode('utf-8'), parser)
+    if root is None:
+        return ''
+
+    out = []
+    doctype = root.getroottree().docinfo.doctype
+    if doctype and SOURCE_DOCTYPE.match(html_content):
+        out.append(doctype + '\n')
+    _emit(root, out)
+
+    text = ''.join(out)
+    text = re.sub(r'\n\s*\n+', '\n', text)  # Consolidate multiple new lines
+
+    return text
@@ -0,0 +1,247 @@
+# pipelines.py
+from extractor import (extract_data_async, extract_people_async, set_llm_concurrency, set_backend, set_rate_limits, BioBundler,
+                       record_response, build_prompt, build_listing_prompt, prompt_version)
+from backends import create_backend
+from save_data import save_to_csv
+from cache import ExtractionCache
+from structured import is_complete, merge_with_llm, ProvenanceLog, provenance_path
+from batch import firm_domain
+from reducer import count_tokens, split_into_chunks
+from sinks import get_sink, flush_all, close_all, person_to_row
+from dedup import DedupIndex, compact_in_place
+from metrics import timed
+from twisted.internet import task
+import asyncio
+import json
+
+class ExtractionPipeline:
+    """Run LLM extraction for bio pages without holding up the crawl.
+
+    The spider yields an item with the cleaned page text and moves on to the next
+    response; this pipeline awaits the model, validates the result and saves it.
+    Pages whose cleaned text was already extracted with the current prompt are
+    answered from the on-disk cache instead, and pages whose markup already gave
+    every core field skip the model entirely. With a dedup index, a person
+    already written in this run is merged into the index instead of appended
+    again, and the output is compacted against the index when the spider closes.
+
+    Listing pages (mode 'listing') are extracted as a list of people, in chunks
+    of at most listing_token_budget tokens. Bios of up to bundle_max_tokens are
+    packed several to a request by a BioBundler when bundle_size is above one.
+    """
+
+    def __init__(self, stats, cache=None, output_batch_size=100, output_flush_interval=5.0, dedup=None,
+                 bundle_size=4, bundle_max_tokens=800, bundle_wait=3.0, listing_token_budget=6000, provenance_file=None):
+        self.stats = stats
+        self.cache = cache
+        self.listing_prompt_version = prompt_version(build_listing_prompt) if cache else None
+        self.dedup = dedup
+        self.written_people = set()
+        self.bundler = None
+        if bundle_size > 1:
+            self.bundler = BioBundler(bundle_size, bundle_wait, on_call=lambda: self.stats.inc_value('extraction/llm_calls'))
+        self.bundle_max_tokens = bundle_max_tokens
+        self.listing_token_budget = listing_token_budget
+        self.output_batch_size = output_batch_size
+        self.output_flush_interval = output_flush_interval
+        self.flush_task = None
+        self.provenance_file = provenance_file
+        self.provenance = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        set_llm_concurrency(settings.getint('LLM_MAX_CONCURRENCY', 5))
+        set_rate_limits(settings.getint('LLM_REQUESTS_PER_MINUTE', 0), settings.getint('LLM_TOKENS_PER_MINUTE', 0))
+        set_backend(create_backend(
+            settings.get('LLM_BACKEND', 'openai'),
+            model=settings.get('LLM_MODEL'),
+            base_url=settings.get('LLM_BASE_URL'),
+            model_path=settings.get('LOCAL_MODEL_PATH'),
+            batch_size=settings.getint('LOCAL_BATCH_SIZE', 4),
+            max_new_tokens=settings.getint('LOCAL_MAX_NEW_TOKENS', 512),
+        ))
+
+        cache = None
+        if settings.getbool('EXTRACTION_CACHE_ENABLED', True):
+            cache = ExtractionCache(
+                settings.get('EXTRACTION_CACHE_PATH', '.extraction_cache.sqlite'),
+                prompt_version(),
+                max_entries=settings.getint('EXTRACTION_CACHE_MAX_ENTRIES', 50000),
+                max_age_days=settings.getint('EXTRACTION_CACHE_MAX_AGE_DAYS', 30),
+            )
+
+        dedup = None
+        if settings.getbool('DEDUP_ENABLED', True):
+            dedup = DedupIndex(settings.get('DEDUP_INDEX_PATH', 'dedup.sqlite'))
+        return cls(crawler.stats, cache,
+                   settings.getint('OUTPUT_BATCH_SIZE', 100), settings.getfloat('OUTPUT_FLUSH_INTERVAL', 5.0), dedup,
+                   settings.getint('BUNDLE_SIZE', 4), settings.getint('BUNDLE_MAX_TOKENS', 800),
+                   settings.getfloat('BUNDLE_WAIT', 3.0), settings.getint('LISTING_TOKEN_BUDGET', 6000),
+                   settings.get('PROVENANCE_FILE') if settings.getbool('PROVENANCE_ENABLED', True) else False)
+
+    def open_spider(self, spider):
+        # One long-lived writer for the output file, flushed on size or on this timer
+        get_sink(spider.csv_file, batch_size=self.output_batch_size, flush_interval=self.output_flush_interval)
+        self.flush_task = task.LoopingCall(flush_all)
+        self.flush_task.start(self.output_flush_interval, now=False)
+        if self.provenance_file is not False:
+            self.provenance = ProvenanceLog(self.provenance_file or provenance_path(spider.csv_file))
+
+    def close_spider(self, spider):
+        if self.flush_task and self.flush_task.running:
+            self.flush_task.stop()
+        close_all()
+        if self.provenance:
+            self.provenance.close()
+        if self.cache:
+            self.cache.close()
+        if self.dedup:
+            # Fold this run's repeats and earlier runs' rows into one up-to-date row per person
+            compacted = compact_in_place(spider.csv_file, self.dedup)
+            if compacted:
+                self.stats.set_value('dedup/output_rows', compacted[1])
+                self.stats.set_value('dedup/removed_rows', compacted[0] - compacted[1])
+            self.dedup.close()
+
+    def save(self, json_data, csv_file):
+        """Append a person to the output unless this run already wrote them; repeats only update the index."""
+        if self.dedup:
+            entity_id, _, is_new = self.dedup.upsert(person_to_row(json_data))
+            if entity_id in self.written_people:
+                self.stats.inc_value('dedup/merged')
+                return
+            self.written_people.add(entity_id)
+            self.stats.inc_value('dedup/new' if is_new else 'dedup/seen_before')
+        save_to_csv(json_data, csv_file)
+
+    async def extract(self, cleaned_text):
+        """Return the model response for a page, using the cache when possible."""
+        if self.cache:
+            cached = self.cache.get(cleaned_text)
+            if cached is not None:
+                self.stats.inc_value('extraction_cache/hit')
+                record_response(build_prompt(cleaned_text), cached)
+                return cached
+            self.stats.inc_value('extraction_cache/miss')
+
+        if self.bundler and count_tokens(cleaned_text) <= self.bundle_max_tokens:
+            # Small bio: share a request with others (the bundler counts the calls it makes)
+            self.stats.inc_value('extraction/bundled')
+            json_data = await self.bundler.extract(cleaned_text)
+        else:
+            self.stats.inc_value('extraction/llm_calls')
+            json_data = await extract_data_async(cleaned_text)
+
+        # Only remember real answers, not the '{}' returned after all retries failed
+        if self.cache and json_data and json_data != '{}':
+            self.cache.put(cleaned_text, json_data)
+        return json_data
+
+    async def extract_people(self, cleaned_text):
+        """Return everyone on a listing page, one model call per chunk of the page, using the cache when possible."""
+        async def extract_chunk(chunk):
+            if self.cache:
+                cached = self.cache.get(chunk, self.listing_prompt_version)
+                if cached is not None:
+                    self.stats.inc_value('extraction_cache/hit')
+                    record_response(build_listing_prompt(chunk), json.dumps({'people': json.loads(cached)}))
+                    return json.loads(cached)
+                self.stats.inc_value('extraction_cache/miss')
+
+            self.stats.inc_value('extraction/llm_calls')
+            people = await extract_people_async(chunk)
+            if self.cache and people:
+                self.cache.put(chunk, json.dumps(people), self.listing_prompt_version)
+            return people
+
+        chunks = split_into_chunks(cleaned_text, self.listing_token_budget)
+        results = await asyncio.gather(*(extract_chunk(chunk) for chunk in chunks))
+        return [person for people in results for person in people]
+
+    def save_person(self, json_data, cleaned_text, final_url, spider):
+        """Validate one extracted person against the page and save it. Returns True if it was saved."""
+        with timed(self.stats, 'validate'):
+            json_data = spider.add_scraped_url(json_data, final_url)
+            valid = bool(json_data) and spider.validate_data_in_content(json_data, cleaned_text)
+        if valid:
+            with timed(self.stats, 'save'):
+                self.save(json_data, spider.csv_file)
+                if self.provenance:
+                    self.provenance.write(json_data)
+            incremental = getattr(spider, 'incremental', None)
+            if incremental:
+                incremental.add_person(final_url, person_to_row(json_data))
+            self.stats.inc_value(f"firm/{firm_domain(final_url)}/bios")
+            return True
+        self.stats.inc_value('validation/failed')
+        spider.logger.warning(f"Validation failed for {final_url}: Email or phone not found")
+        return False
+
+    def finish_extraction(self, checkpoint, final_url, spider):
+        """Mark a page extracted in the checkpoint once its rows are on disk, so a killed run can't skip unsaved people."""
+        get_sink(spider.csv_file).after_flush(lambda: checkpoint.finish_extraction(final_url))
+
+    def finish_incremental(self, final_url, spider):
+        """Let the incremental state keep a page's new fingerprint once its people are on disk."""
+        incremental = getattr(spider, 'incremental', None)
+        if incremental:
+            get_sink(spider.csv_file).after_flush(lambda: incremental.extracted(final_url))
+
+    async def process_item(self, item, spider):
+        final_url = item['scraped_url']
+        cleaned_text = item.pop('cleaned_text')
+        structured = item.pop('structured', None)
+        mode = item.pop('mode', 'profile')
+
+        # Already handled before a restart; don't pay for it twice
+        checkpoint = getattr(spider, 'checkpoint', None)
+        if checkpoint and final_url in checkpoint.extracted:
+            self.stats.inc_value('checkpoint/skipped_extracted')
+            return item
+
+        if mode == 'listing':
+            with timed(self.stats, 'extraction'):
+                people = await self.extract_people(cleaned_text)
+            self.stats.inc_value('listing/people_extracted', len(people))
+            frontier = getattr(spider, 'frontier', None)
+            saved = False
+            for person in people:
+                if self.save_person({'person': person}, cleaned_text, final_url, spider):
+                    saved = True
+                    if frontier:
+                        frontier.add_listed(final_url, person)
+            if saved:
+                self.finish_incremental(final_url, spider)
+            if not people:
+                spider.logger.warning(f"No people extracted from listing {final_url}")
+            if checkpoint:
+                self.finish_extraction(checkpoint, final_url, spider)
+            return item
+
+        if structured and is_complete(structured):
+            # Markup answered everything we need, no API call
+            self.stats.inc_value('structured/complete')
+            json_data = structured
+        else:
+            # Extract data using OpenAI API
+            with timed(self.stats, 'extraction'):
+                json_data = await self.extract(cleaned_text)
+
+            # Keep the deterministic values and let the model fill the gaps
+            if structured and json_data:
+                try:
+                    json_data = merge_with_llm(structured, json.loads(json_data))
+                except json.JSONDecodeError:
+                    pass
+
+        if json_data:  # Ensure extracted data is not empty
+            if self.save_person(json_data, cleaned_text, final_url, spider):
+                self.finish_incremental(final_url, spider)
+        else:
+            spider.logger.warning(f"No data extracted from {final_url}")
+
+        if checkpoint:
+            self.finish_extraction(checkpoint, final_url, spider)
+
+        return item
@@ -0,0 +1,273 @@
+# ratelimit.py
+import asyncio
+import re
+import time
+from email.utils import parsedate_to_datetime
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from batch import firm_domain
+
+# Statuses that mean the site wants us to slow down
+BLOCK_STATUSES = {403, 429, 503}
+
+DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+def parse_duration(value):
+    """Seconds in an OpenAI-style reset header such as '1s', '6m0s' or '20ms'; None if unparseable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit] for number, unit in parts)
+
+def retry_after_seconds(headers):
+    """Seconds to wait according to Retry-After (seconds or an HTTP date) or retry-after-ms; None if absent."""
+    if not headers:
+        return None
+
+    def header(name):
+        value = headers.get(name)
+        if isinstance(value, (list, tuple)):
+            value = value[0] if value else None
+        return value.decode('latin-1') if isinstance(value, bytes) else value
+
+    milliseconds = header('retry-after-ms')
+    if milliseconds:
+        try:
+            return max(0.0, float(milliseconds) / 1000)
+        except ValueError:
+            pass
+    value = header('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class ModelRateLimiter:
+    """Keep model calls inside the provider's requests- and tokens-per-minute budget.
+
+    Both budgets are token buckets refilled continuously. Limits start from
+    the configured values (0 means unknown, i.e. unlimited) and are learned
+    from x-ratelimit-* response headers; the remaining counts in those headers
+    also correct the buckets, so other processes sharing the key are accounted
+    for. A 429 with Retry-After stops every call until that time.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.requests = float(requests_per_minute)
+        self.tokens = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+        self.waiting = 0
+        self.throttled_seconds = 0.0
+        self.rate_limited = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    def _wait_time(self, tokens):
+        self._refill()
+        wait = max(0.0, self.blocked_until - time.monotonic())
+        if self.rpm and self.requests < 1:
+            wait = max(wait, (1 - self.requests) * 60 / self.rpm)
+        if self.tpm and self.tokens < tokens:
+            # A prompt bigger than the whole budget only has to wait for a full bucket
+            wait = max(wait, (min(tokens, self.tpm) - self.tokens) * 60 / self.tpm)
+        return wait
+
+    async def acquire(self, tokens):
+        """Wait until a call of about `tokens` tokens fits the budget, then take it from the buckets."""
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            while True:
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, 5))
+        finally:
+            self.waiting -= 1
+        if self.rpm:
+            self.requests -= 1
+        if self.tpm:
+            self.tokens -= tokens
+        self.throttled_seconds += time.monotonic() - start
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known."""
+        if self.tpm and actual:
+            self.tokens -= actual - estimated
+
+    def update(self, headers):
+        """Learn limits and remaining budget from x-ratelimit-* response headers."""
+        if not headers:
+            return
+        self._refill()
+
+        def number(name):
+            try:
+                return int(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        limit_requests, limit_tokens = number('x-ratelimit-limit-requests'), number('x-ratelimit-limit-tokens')
+        self.remaining_requests = number('x-ratelimit-remaining-requests')
+        self.remaining_tokens = number('x-ratelimit-remaining-tokens')
+        # A newly learned limit starts with whatever the provider says is left
+        if limit_requests and limit_requests != self.rpm:
+            self.requests = limit_requests if self.remaining_requests is None else self.remaining_requests
+            self.rpm = limit_requests
+        if limit_tokens and limit_tokens != self.tpm:
+            self.tokens = limit_tokens if self.remaining_tokens is None else self.remaining_tokens
+            self.tpm = limit_tokens
+        if self.rpm and self.remaining_requests is not None:
+            self.requests = min(self.requests, self.remaining_requests)
+        if self.tpm and self.remaining_tokens is not None:
+            self.tokens = min(self.tokens, self.remaining_tokens)
+
+        # Out of budget: hold off until the provider says it resets
+        for remaining, reset in [(self.remaining_requests, 'x-ratelimit-reset-requests'),
+                                 (self.remaining_tokens, 'x-ratelimit-reset-tokens')]:
+            seconds = parse_duration(headers.get(reset))
+            if remaining == 0 and seconds:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def block(self, seconds):
+        """Stop all calls for `seconds`, after a 429."""
+        self.rate_limited += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def snapshot(self):
+        """Current limits and state, for the crawl stats."""
+        self._refill()
+        return {
+            'requests_per_minute': self.rpm,
+            'tokens_per_minute': self.tpm,
+            'requests_remaining': self.remaining_requests if self.remaining_requests is not None else -1,
+            'tokens_remaining': self.remaining_tokens if self.remaining_tokens is not None else -1,
+            'waiting': self.waiting,
+            'throttled_seconds': round(self.throttled_seconds, 2),
+            'rate_limited': self.rate_limited,
+        }
+
+class DomainRate:
+    """What the controller knows about one download slot."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.latency = None
+        self.blocked_at = 0.0
+        self.blocks = 0
+
+class AdaptiveRateMiddleware:
+    """Pace each domain by its observed latency and block signals, and all fetching by the extraction backlog.
+
+    For a normal response the slot delay moves halfway towards
+    latency / target_concurrency, like AutoThrottle. A 403, 429 or 503 doubles
+    it (at least to Retry-After) and keeps it from falling for block_cooldown
+    seconds, so the retry middleware's retries are spaced out instead of
+    hitting the site again at once. Delays stay within [min_delay, max_delay].
+
+    While more than max_backlog model calls are waiting or in flight, new
+    requests wait here, so pages are not fetched faster than the model can
+    extract them. Current delays and latencies are in the crawl stats as
+    firm/<domain>/delay_ms and firm/<domain>/latency_ms.
+    """
+
+    def __init__(self, crawler, min_delay, max_delay, target_concurrency, block_cooldown, max_backlog):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_concurrency = target_concurrency
+        self.block_cooldown = block_cooldown
+        self.max_backlog = max_backlog
+        self.domains = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('RATE_CONTROL_ENABLED', True):
+            raise NotConfigured
+        max_backlog = settings.getint('EXTRACTION_MAX_BACKLOG', 0) or 4 * settings.getint('LLM_MAX_CONCURRENCY', 5)
+        middleware = cls(crawler, settings.getfloat('RATE_MIN_DELAY', 0.25), settings.getfloat('RATE_MAX_DELAY', 30),
+                         settings.getfloat('RATE_TARGET_CONCURRENCY', 1.0), settings.getfloat('RATE_BLOCK_COOLDOWN', 60),
+                         max_backlog)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_closed(self, spider):
+        blocked = {domain: rate.blocks for domain, rate in self.domains.items() if rate.blocks}
+        if blocked:
+            spider.logger.info(f"Slowed down after block responses: {blocked}")
+
+    async def process_request(self, request, spider):
+        from extractor import pending_calls
+
+        waited = 0.0
+        while pending_calls() > self.max_backlog:
+            await asyncio.sleep(0.5)
+            waited += 0.5
+        if waited:
+            self.stats.inc_value('rate/backlog_wait_seconds', waited)
+        return None
+
+    def _slot(self, request):
+        downloader = self.crawler.engine.downloader
+        return downloader.slots.get(downloader.get_slot_key(request))
+
+    def process_response(self, request, response, spider):
+        slot = self._slot(request)
+        if slot is None or request.meta.get('dont_throttle'):
+            return response
+
+        domain = firm_domain(request.url)
+        rate = self.domains.get(domain)
+        if rate is None:
+            rate = self.domains[domain] = DomainRate(slot.delay)
+        now = time.monotonic()
+
+        if response.status in BLOCK_STATUSES:
+            rate.blocks += 1
+            rate.blocked_at = now
+            retry_after = retry_after_seconds(response.headers) or 0
+            rate.delay = min(self.max_delay, max(rate.delay * 2, self.min_delay * 4, retry_after))
+            self.stats.inc_value(f'firm/{domain}/blocked')
+        else:
+            latency = request.meta.get('download_latency')
+            if latency is not None and response.status < 400:
+                rate.latency = latency if rate.latency is None else 0.7 * rate.latency + 0.3 * latency
+                target = max(self.min_delay, min(self.max_delay, rate.latency / self.target_concurrency))
+                new_delay = (rate.delay + target) / 2
+                # Recently blocked: only allow slowing down
+                if now - rate.blocked_at < self.block_cooldown:
+                    new_delay = max(new_delay, rate.delay)
+                rate.delay = max(self.min_delay, min(self.max_delay, new_delay))
+
+        slot.delay = rate.delay
+        self.stats.set_value(f'firm/{domain}/delay_ms', round(rate.delay * 1000))
+        if rate.latency is not None:
+            self.stats.set_value(f'firm/{domain}/latency_ms', round(rate.latency * 1000))
+        return response
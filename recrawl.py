@@ -0,0 +1,240 @@
+# recrawl.py
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+from scrapy.exceptions import NotConfigured
+from batch import firm_domain
+from dedup import record_keys
+from frontier import canonicalize_url
+from sinks import FIELDNAMES
+
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+def fingerprint(cleaned_text):
+    """Hash of a page's cleaned text, ignoring whitespace."""
+    return hashlib.sha1(' '.join(cleaned_text.split()).encode('utf-8')).hexdigest()
+
+def person_key(row):
+    """Identity of a person across runs: the strongest of their dedup keys (email, then phone, then name)."""
+    keys = record_keys(row)
+    return keys[0] if keys else None
+
+def changes_path(output_file):
+    """Where a run's diff goes by default: next to the output, as <output>.changes.csv."""
+    return f"{os.path.splitext(output_file)[0]}.changes.csv"
+
+def write_changes(path, changes):
+    """Write (change, row, changed fields) tuples as a CSV of new, changed and removed people."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['change', 'changed_fields'] + FIELDNAMES)
+        writer.writeheader()
+        for change, row, fields in changes:
+            writer.writerow({'change': change, 'changed_fields': ';'.join(fields), **row})
+
+class IncrementalState:
+    """What the previous runs saw of each page, for re-crawling only what changed.
+
+    Per page: its ETag and Last-Modified for conditional GETs, a fingerprint of
+    its cleaned text, its links (so a 304 can still be followed) and the people
+    extracted from it. Pages confirmed by this run, whether fetched, answered
+    304 or found unchanged, get this run's number, and a page's people are
+    only replaced when its content changed. A changed page's new fingerprint
+    is stored by extracted() once its people are saved, and so are its ETag
+    and Last-Modified, so an extraction that fails or is interrupted is
+    retried by the next run instead of being answered with a 304.
+
+    The people table holds each firm's attorneys as of its last finished run.
+    finish() compares it with the people on this run's pages and records the
+    new state; a page this run didn't reach counts as gone, so an interrupted
+    run should be repeated rather than diffed.
+    """
+
+    def __init__(self, path, commit_every=100):
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                firm TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fingerprint TEXT,
+                links TEXT,
+                people TEXT,
+                run INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_firm_run ON pages (firm, run)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS people (firm TEXT NOT NULL, key TEXT NOT NULL, row TEXT NOT NULL, PRIMARY KEY (firm, key))"
+        )
+        self.run = (self.conn.execute("SELECT MAX(run) FROM pages").fetchone()[0] or 0) + 1
+        self.commit_every = commit_every
+        self.pending_writes = 0
+        self.changed = {}  # canonical URL -> fingerprint and validators of new content not yet extracted
+
+    def _page(self, url):
+        return self.conn.execute(
+            "SELECT etag, last_modified, fingerprint, links, people FROM pages WHERE key = ?", (canonicalize_url(url),)
+        ).fetchone()
+
+    def _upsert(self, url, **fields):
+        """Insert or update a page's row and mark it as confirmed by this run."""
+        fields['run'] = self.run
+        columns = ', '.join(fields)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in fields)
+        self.conn.execute(
+            f"INSERT INTO pages (key, url, firm, {columns}) VALUES (?, ?, ?{', ?' * len(fields)}) "
+            f"ON CONFLICT (key) DO UPDATE SET url = excluded.url, {updates}",
+            (canonicalize_url(url), url, firm_domain(url), *fields.values())
+        )
+        self.pending_writes += 1
+        if self.pending_writes >= self.commit_every:
+            self.commit()
+
+    def validators(self, url):
+        """(etag, last_modified) from the last time url was fetched, or None."""
+        page = self._page(url)
+        if page is None or not (page[0] or page[1]):
+            return None
+        return page[0], page[1]
+
+    def not_modified(self, url):
+        """Confirm an unchanged page (its people carry over) and return the links it had."""
+        page = self._page(url)
+        if page is None:
+            return []
+        self._upsert(url)
+        return json.loads(page[3] or '[]')
+
+    def content_unchanged(self, url, cleaned_text):
+        """True if url's cleaned text is what its people were extracted from; otherwise forget its old people."""
+        digest = fingerprint(cleaned_text)
+        page = self._page(url)
+        if page is not None and page[2] == digest and page[4] is not None:
+            self._upsert(url)
+            return True
+        self.changed[canonicalize_url(url)] = {'fingerprint': digest}
+        self._upsert(url, people=None, etag=None, last_modified=None)
+        return False
+
+    def extracted(self, url):
+        """Store the fingerprint and validators of a changed page once its extraction is done and its people are saved."""
+        fields = self.changed.pop(canonicalize_url(url), None)
+        if fields is None:
+            return
+        page = self._page(url)
+        self._upsert(url, **fields, people=page[4] if page and page[4] is not None else '[]')
+
+    def page_parsed(self, url, links, headers):
+        """Store a fetched page's validators and links; a page still being extracted gets its validators from extracted()."""
+        def header(name):
+            value = headers.get(name)
+            return value.decode('latin-1') if isinstance(value, bytes) else value
+
+        validators = {'etag': header('ETag'), 'last_modified': header('Last-Modified')}
+        pending = self.changed.get(canonicalize_url(url))
+        if pending is not None:
+            pending.update(validators)
+            self._upsert(url, links=json.dumps(links))
+        else:
+            self._upsert(url, **validators, links=json.dumps(links))
+
+    def add_person(self, url, row):
+        """Record a person extracted from url in this run."""
+        page = self._page(url)
+        people = json.loads(page[4] or '[]') if page else []
+        people.append(row)
+        self._upsert(url, people=json.dumps(people))
+
+    def finish(self, firms):
+        """Diff this run's people against the last run for these firms and keep them as the new baseline.
+
+        Returns (change, row, changed fields) tuples, change being 'new',
+        'changed' or 'removed'; removed rows are as last seen.
+        """
+        changes = []
+        for firm in sorted(set(firms)):
+            previous = {key: json.loads(row) for key, row in
+                        self.conn.execute("SELECT key, row FROM people WHERE firm = ?", (firm,))}
+            current = {}
+            for (people,) in self.conn.execute("SELECT people FROM pages WHERE firm = ? AND run = ?", (firm, self.run)):
+                for row in json.loads(people or '[]'):
+                    key = person_key(row)
+                    if key and key not in current:
+                        current[key] = row
+
+            for key, row in current.items():
+                if key not in previous:
+                    changes.append(('new', row, []))
+                    continue
+                fields = [field for field in FIELDNAMES[1:] if (row.get(field) or '') != (previous[key].get(field) or '')]
+                if fields:
+                    changes.append(('changed', row, fields))
+            changes.extend(('removed', row, []) for key, row in previous.items() if key not in current)
+
+            self.conn.execute("DELETE FROM people WHERE firm = ?", (firm,))
+            self.conn.executemany("INSERT INTO people (firm, key, row) VALUES (?, ?, ?)",
+                                  [(firm, key, json.dumps(row)) for key, row in current.items()])
+        self.commit()
+        return changes
+
+    def commit(self):
+        self.conn.commit()
+        self.pending_writes = 0
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+class ConditionalRequestMiddleware:
+    """Send conditional GETs for pages an earlier incremental run fetched.
+
+    Requests for a page with a stored ETag or Last-Modified carry If-None-Match
+    / If-Modified-Since and accept a 304, which the spider answers from the
+    stored state without parsing or extraction. They are marked 'conditional'
+    so FetchTierMiddleware tries plain HTTP first even on a Playwright domain;
+    if the page changed and has to be rendered, the browser request goes
+    without the headers, since the browser has no copy to go with a 304.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('INCREMENTAL_ENABLED'):
+            raise NotConfigured
+        return cls(crawler.stats)
+
+    def process_request(self, request, spider):
+        state = getattr(spider, 'incremental', None)
+        if state is None or request.meta.get('http_only'):
+            return None
+        if request.meta.get('playwright'):
+            for name in CONDITIONAL_HEADERS:
+                request.headers.pop(name, None)
+            return None
+        if request.meta.get('conditional'):
+            return None
+
+        validators = state.validators(request.url)
+        if validators is None:
+            return None
+        etag, last_modified = validators
+        if etag:
+            request.headers['If-None-Match'] = etag
+        if last_modified:
+            request.headers['If-Modified-Since'] = last_modified
+        request.meta['conditional'] = True
+        request.meta['handle_httpstatus_list'] = list(request.meta.get('handle_httpstatus_list', [])) + [304]
+        self.stats.inc_value('incremental/conditional')
+        return None
+
+    def process_response(self, request, response, spider):
+        if response.status == 304 and request.meta.get('conditional'):
+            self.stats.inc_value('incremental/not_modified')
+        return response
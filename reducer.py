@@ -0,0 +1,142 @@
+# reducer.py
+import re
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+_encoding = None
+_encoding_loaded = False
+
+# Split the cleaned page in front of every paragraph and heading
+BLOCK_BOUNDARY = re.compile(r'(?=<(?:p|h[1-6])[\s>])')
+TAG = re.compile(r'<[^>]+>')
+LINK = re.compile(r'<a\b[^>]*>(.*?)</a>', re.DOTALL)
+EMAIL = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+PHONE = re.compile(r'(tel:|\(?\b\d{3}\)?[\s.-]\d{3}[\s.-]\d{4}\b)')
+JSON_LD_PERSON = re.compile(r'"@type"\s*:\s*\[?\s*"(Person|Attorney|Lawyer)"', re.IGNORECASE)
+PROFILE_WORDS = re.compile(
+    r'\b(education|bar admissions?|admitted|practice areas?|partner|associate|of counsel|j\.d\.|'
+    r'law school|memberships?|honors|biography|experience)\b', re.IGNORECASE
+)
+BOILERPLATE_WORDS = re.compile(
+    r'(©|&copy;|copyright|all rights reserved|privacy policy|disclaimer|attorney advertising|'
+    r'cookie|terms of use|site map|sitemap)', re.IGNORECASE
+)
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding('o200k_base')
+            except Exception:  # Tokenizer files can't be downloaded
+                _encoding = None
+    return _encoding
+
+def count_tokens(text):
+    """Count tokens with the gpt-4o tokenizer, or estimate at ~4 characters per token without it."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text, token_budget):
+    """The start of text, cut to at most token_budget tokens."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= token_budget else encoding.decode(tokens[:token_budget])
+    return text[:token_budget * 4]
+
+def score_block(block):
+    """Score a block of cleaned HTML by how much it looks like part of one person's profile."""
+    score = 0.0
+    text = TAG.sub(' ', block)
+
+    score += 3 * min(len(EMAIL.findall(block)), 2)
+    score += 3 * min(len(PHONE.findall(block)), 2)
+    if block.startswith('<h1'):
+        score += 4
+    elif block.startswith(('<h2', '<h3')):
+        score += 1
+    if JSON_LD_PERSON.search(block):
+        score += 5
+    score += min(len(PROFILE_WORDS.findall(text)), 3)
+
+    # Menus and "other attorneys" grids are mostly links; bio prose mostly isn't
+    links = LINK.findall(block)
+    link_text = sum(len(TAG.sub('', link).strip()) for link in links)
+    text_length = len(' '.join(text.split()))
+    if links and link_text > 0.7 * text_length:
+        score -= 4 if len(links) > 3 else 2
+    elif text_length - link_text > 80:
+        score += 1
+    if BOILERPLATE_WORDS.search(text):
+        score -= 3
+
+    return score
+
+def reduce_to_profile(cleaned_text, token_budget):
+    """Trim cleaned HTML to the blocks most likely to describe the person, within token_budget.
+
+    Pages already under budget are returned unchanged. Otherwise blocks are
+    ranked by their own signals plus closeness to the first h1 (usually the
+    person's name), and the best ones are kept in their original order. Blocks
+    that score below zero are dropped outright. The best block that doesn't
+    fit, often a whole bio written as one paragraph, is cut to the budget left.
+    """
+    if not token_budget or count_tokens(cleaned_text) <= token_budget:
+        return cleaned_text
+
+    blocks = [block for block in BLOCK_BOUNDARY.split(cleaned_text) if block.strip()]
+    name_index = next((i for i, block in enumerate(blocks) if block.startswith('<h1')), 0)
+
+    ranked = []
+    for i, block in enumerate(blocks):
+        closeness = 3 / (1 + abs(i - name_index) / 4)
+        ranked.append((score_block(block) + closeness, i))
+    ranked.sort(reverse=True)
+
+    kept = {}
+    used = 0
+    for score, i in ranked:
+        if score < 0:
+            break  # Link grids and boilerplate never go in, even with budget to spare
+        tokens = count_tokens(blocks[i])
+        if used + tokens > token_budget:
+            if used < token_budget:
+                kept[i] = truncate_to_tokens(blocks[i], token_budget - used)
+                used = token_budget
+            continue
+        kept[i] = blocks[i]
+        used += tokens
+
+    if not kept:
+        # Nothing looked like a profile; an empty prompt would lose the page for sure
+        return truncate_to_tokens(cleaned_text, token_budget)
+    return ''.join(kept[i] for i in sorted(kept))
+
+def split_into_chunks(cleaned_text, token_budget):
+    """Split cleaned HTML at block boundaries into consecutive chunks of at most token_budget tokens each.
+
+    A single block larger than the budget becomes a chunk of its own.
+    """
+    if not token_budget or count_tokens(cleaned_text) <= token_budget:
+        return [cleaned_text]
+
+    chunks, current, current_tokens = [], [], 0
+    for block in BLOCK_BOUNDARY.split(cleaned_text):
+        if not block.strip():
+            continue
+        tokens = count_tokens(block)
+        if current and current_tokens + tokens > token_budget:
+            chunks.append(''.join(current))
+            current, current_tokens = [], 0
+        current.append(block)
+        current_tokens += tokens
+    if current:
+        chunks.append(''.join(current))
+    return chunks
@@ -0,0 +1,250 @@
+# replay.py
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+from scrapy.responsetypes import responsetypes
+from frontier import canonicalize_url
+from sinks import locked
+
+# What a model with nothing recorded for a prompt answers: the right shape, no data
+EMPTY_PERSON = {field: '' for field in (
+    'first_name', 'middle_name', 'last_name', 'job_title', 'direct_phone', 'direct_phone_extension',
+    'mobile_phone', 'email', 'location_city', 'location_state', 'profile_image_url', 'practice_areas'
+)}
+
+def prompt_key(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+class Corpus:
+    """Fetched pages and model responses saved on disk, for re-running the pipeline offline.
+
+    Layout of the corpus directory:
+        pages.jsonl      one line per page: url, status, headers, body file
+        pages/<sha1>     the page body as fetched (after rendering, for Playwright pages)
+        responses.jsonl  one line per model call: sha256 of the prompt and the raw response
+        start_urls.txt   start URLs of the recorded crawls
+    Pages are looked up by canonical URL and later recordings win.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.join(path, 'pages'), exist_ok=True)
+        self.pages = {}
+        self.responses = {}
+        for entry in self._read_jsonl('pages.jsonl'):
+            self.pages[canonicalize_url(entry['url'])] = entry
+        for entry in self._read_jsonl('responses.jsonl'):
+            self.responses[entry['key']] = entry['content']
+
+    def _read_jsonl(self, name):
+        path = os.path.join(self.path, name)
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _append(self, name, entry):
+        with open(os.path.join(self.path, name), 'a', encoding='utf-8') as f:
+            with locked(f):
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def save_page(self, url, status, headers, body):
+        body_file = os.path.join('pages', hashlib.sha1(url.encode('utf-8')).hexdigest())
+        with open(os.path.join(self.path, body_file), 'wb') as f:
+            f.write(body)
+        entry = {'url': url, 'status': status, 'headers': headers, 'body': body_file}
+        self._append('pages.jsonl', entry)
+        self.pages[canonicalize_url(url)] = entry
+
+    def page(self, url):
+        """Return (status, headers, body) recorded for url, or None."""
+        entry = self.pages.get(canonicalize_url(url))
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, entry['body']), 'rb') as f:
+            return entry['status'], entry['headers'], f.read()
+
+    def save_response(self, prompt, content):
+        key = prompt_key(prompt)
+        if self.responses.get(key) != content:
+            self.responses[key] = content
+            self._append('responses.jsonl', {'key': key, 'content': content})
+
+    def response(self, prompt):
+        return self.responses.get(prompt_key(prompt))
+
+    def add_start_urls(self, urls):
+        path = os.path.join(self.path, 'start_urls.txt')
+        known = set(self.start_urls())
+        with open(path, 'a', encoding='utf-8') as f:
+            f.writelines(f"{url}\n" for url in urls if url not in known)
+
+    def start_urls(self):
+        path = os.path.join(self.path, 'start_urls.txt')
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+class CorpusMiddleware:
+    """Record every response the spider sees into a corpus (RECORD_DIR), or serve them back from one (REPLAY_DIR).
+
+    Sits after FrontierMiddleware and before FetchTierMiddleware, so replayed
+    requests never reach the network or the browser, and recorded pages are
+    the final ones after any escalation to Playwright. When recording, model
+    responses are saved through extractor.set_response_recorder as well.
+    """
+
+    def __init__(self, stats, corpus, replay):
+        self.stats = stats
+        self.corpus = corpus
+        self.replay = replay
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        replay_dir = crawler.settings.get('REPLAY_DIR')
+        record_dir = crawler.settings.get('RECORD_DIR')
+        if not replay_dir and not record_dir:
+            raise NotConfigured
+        middleware = cls(crawler.stats, Corpus(replay_dir or record_dir), replay=bool(replay_dir))
+        if not middleware.replay:
+            from extractor import set_response_recorder
+            set_response_recorder(middleware.corpus.save_response)
+            crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        return middleware
+
+    def spider_opened(self, spider):
+        self.corpus.add_start_urls(spider.start_urls)
+
+    def process_request(self, request, spider):
+        if not self.replay:
+            return None
+        recorded = self.corpus.page(request.url)
+        if recorded is None:
+            self.stats.inc_value('replay/missing')
+            return TextResponse(url=request.url, status=404, body=b'', encoding='utf-8', request=request, flags=['replay'])
+        status, headers, body = recorded
+        self.stats.inc_value('replay/pages')
+        response_class = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return response_class(url=request.url, status=status, headers=headers, body=body, request=request, flags=['replay'])
+
+    def process_response(self, request, response, spider):
+        if not self.replay and 'replay' not in response.flags:
+            headers = {name: response.headers[name].decode('latin-1') for name in ('Content-Type', 'Location') if name in response.headers}
+            self.corpus.save_page(request.url, response.status, headers, response.body)
+            self.stats.inc_value('record/pages')
+        return response
+
+def start_replay_server(corpus, port=0):
+    """Serve recorded model responses over the OpenAI chat completions API on localhost.
+
+    A prompt with nothing recorded gets an empty answer of the right shape, so
+    a changed prompt shows up as missing fields rather than retries. Counts are
+    kept in server.hits and server.misses. Returns the server and its base URL.
+    """
+    class ReplayChatHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            prompt = ''.join(message.get('content', '') for message in request.get('messages', []))
+
+            content = corpus.response(prompt)
+            if content is None:
+                self.server.misses += 1
+                content = json.dumps({'people': []} if '"people"' in prompt else {'person': EMPTY_PERSON})
+            else:
+                self.server.hits += 1
+
+            body = json.dumps({
+                "id": "chatcmpl-replay",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get('model', ''),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), ReplayChatHandler)
+    server.hits = server.misses = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def use_replay_model(corpus):
+    """Point the extractor at a replay server for corpus. Must run before extractor is imported."""
+    server, base_url = start_replay_server(corpus)
+    os.environ['LLM_BACKEND'] = 'openai'
+    os.environ['LLM_BASE_URL'] = os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-replay')
+    return server
+
+def fetch_pages(csv_files, corpus):
+    """Add the scraped_url pages of results CSVs (e.g. human_output.csv) to a corpus with plain HTTP GETs."""
+    import csv
+    urls = []
+    for csv_file in csv_files:
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            urls.extend(row['scraped_url'] for row in csv.DictReader(f) if row.get('scraped_url'))
+
+    for url in dict.fromkeys(urls):
+        if corpus.page(url) is not None:
+            continue
+        try:
+            request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                corpus.save_page(url, response.status, {'Content-Type': response.headers.get('Content-Type', '')}, response.read())
+            print(f"Saved {url}")
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+
+def run_replay(corpus_dir, csv_file, start_urls=None):
+    """Crawl a recorded corpus with the real spider and pipeline, no network and no API key needed."""
+    corpus = Corpus(corpus_dir)
+    server = use_replay_model(corpus)
+
+    from twisted.internet import asyncioreactor
+    asyncioreactor.install()
+    from scrapy.crawler import CrawlerProcess
+    from scraper import EmployeeSpider
+
+    process = CrawlerProcess({'REPLAY_DIR': corpus_dir})
+    process.crawl(EmployeeSpider, start_url=start_urls or corpus.start_urls(), csv_file=csv_file)
+    process.start()
+    print(f"Model responses replayed: {server.hits}, not in corpus: {server.misses}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Record and replay crawls for offline runs")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subcommands.add_parser('run', help="Re-run the crawl recorded in a corpus")
+    run_parser.add_argument('corpus')
+    run_parser.add_argument('output', help="Output file for the replayed run")
+    run_parser.add_argument('--start-url', action='append', help="Start URL (default: those recorded)")
+
+    fetch_parser = subcommands.add_parser('fetch', help="Add the pages listed in results CSVs to a corpus")
+    fetch_parser.add_argument('corpus')
+    fetch_parser.add_argument('csv_files', nargs='+')
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        if not (args.start_url or Corpus(args.corpus).start_urls()):
+            sys.exit(f"No start URLs recorded in {args.corpus}; pass --start-url")
+        run_replay(args.corpus, args.output, args.start_url)
+    else:
+        fetch_pages(args.csv_files, Corpus(args.corpus))
@@ -1,104 +1,256 @@
 import scrapy
 import json
-import hashlib
 import re
-import random
+import os
+from urllib.parse import urlparse
+from scrapy.http import TextResponse
 from scrapy.linkextractors import LinkExtractor
+from scrapy.spidermiddlewares.httperror import HttpError
 from scrapy.spiders import CrawlSpider, Rule
 from scrapy_playwright.page import PageMethod
 from parser import clean_html
-from extractor import extract_data
-from save_data import save_to_csv
+from classifier import is_profile_page, is_listing_page
+from structured import extract_structured
+from reducer import reduce_to_profile, count_tokens
+from batch import firm_domain
+from checkpoint import CrawlCheckpoint
+from metrics import timed
+from frontier import Frontier, canonicalize_url, is_people_index
+from discovery import SitemapDiscovery
+from recrawl import IncrementalState, changes_path, write_changes
 
 class EmployeeSpider(CrawlSpider):
     name = "employee_spider"
     custom_settings = {
         'CONCURRENT_REQUESTS': 5,  # Reduce concurrent requests
         'CONCURRENT_REQUESTS_PER_DOMAIN': 3,  # Limit requests per domain
-        'AUTOTHROTTLE_ENABLED': True,
-        'AUTOTHROTTLE_START_DELAY': random.uniform(1, 3),
-        'AUTOTHROTTLE_MAX_DELAY': random.uniform(5, 15),
-        'DOWNLOAD_DELAY': random.uniform(0.5, 2.0),
+        'AUTOTHROTTLE_ENABLED': False,  # AdaptiveRateMiddleware paces each domain instead
+        'DOWNLOAD_DELAY': 1.0,  # Starting delay per domain; Scrapy still randomizes each wait between 0.5x and 1.5x
+        'RATE_CONTROL_ENABLED': True,
+        'RATE_MIN_DELAY': 0.25,
+        'RATE_MAX_DELAY': 30,
+        'RATE_TARGET_CONCURRENCY': 1.0,  # Requests each site should have in flight on average
+        'RATE_BLOCK_COOLDOWN': 60,  # Seconds after a 403/429/503 during which a domain's delay only grows
+        'EXTRACTION_MAX_BACKLOG': 0,  # Pause fetching while more model calls than this are pending; 0 means 4x LLM_MAX_CONCURRENCY
         'ROBOTSTXT_OBEY': False,
         'COOKIES_ENABLED': True,
-        'RETRY_HTTP_CODES': [403, 429, 500, 502, 503, 504],
+        'RETRY_HTTP_CODES': [403, 429, 500, 502, 503, 504],  # Block statuses are retried only after the domain slows down
         'RETRY_TIMES': 5,
         'DEPTH_LIMIT': 2,  # Limit depth to avoid unnecessary crawls
         'PLAYWRIGHT_LAUNCH_OPTIONS': {
             'headless': True,
             'timeout': 30000,
-            'args': ['--ignore-certificate-errors'],  # Ignore SSL issues
+            'args': [
+                '--ignore-certificate-errors',  # Ignore SSL issues
+                '--blink-settings=imagesEnabled=false',  # Images are never even requested
+            ],
         },
+        'PLAYWRIGHT_ABORT_REQUEST': 'browser_pool.should_abort_request',  # Fonts, CSS and media are dropped before they load
+        'PLAYWRIGHT_MAX_PAGES_PER_CONTEXT': 4,
+        'BROWSER_POOL_ENABLED': True,  # Reuse warm pages in a few long-lived contexts instead of a new page per request
+        'BROWSER_POOL_CONTEXTS': 4,  # Contexts shared by all firms; each firm always lands in the same one
+        'BROWSER_POOL_PAGE_MAX_USES': 50,  # Pages are replaced after this many requests
+        'BROWSER_POOL_MAX_RSS_MB': 2048,  # Memory budget for the crawl and its browsers; above it fewer pages stay open
         'DOWNLOAD_HANDLERS': {
             'http': 'scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler',
             'https': 'scrapy_playwright.handler.ScrapyPlaywrightDownloadHandler',
         },
         'HTTPCACHE_ENABLED': False,  # Disable HTTP cache
         'REDIRECT_ENABLED': True,    # Ensure redirects are enabled
-        'LOG_LEVEL': 'DEBUG',        # Increase log level for debugging
+        'LOG_LEVEL': 'INFO',         # VERBOSE switches this to DEBUG
+        'VERBOSE': False,            # Log every page, blocked resource and raw model answer
+        'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',  # Needed to await asyncio code in pipelines
+        'DOWNLOADER_MIDDLEWARES': {
+            'frontier.FrontierMiddleware': 540,  # Below retry, so only final failures close a bio
+            'replay.CorpusMiddleware': 560,  # Only active with RECORD_DIR or REPLAY_DIR set
+            'tiering.FetchTierMiddleware': 580,  # Between retry (550) and decompression (590)
+            'ratelimit.AdaptiveRateMiddleware': 582,  # Sees block responses before tiering or retry act on them
+            'recrawl.ConditionalRequestMiddleware': 570,  # Before tiering, so a 304 never needs the browser
+            'browser_pool.BrowserPool': 585,  # After tiering has decided on Playwright
+        },
+        'SITEMAP_DISCOVERY_ENABLED': True,  # Seed bios from sitemaps and the WordPress REST API; firms without one are link-crawled
+        'SITEMAP_MAX_FILES': 50,  # Sitemap files fetched per firm, nested indexes included
+        'INCREMENTAL_ENABLED': False,  # Re-crawl with conditional GETs, skip unchanged pages and write a diff of people
+        'INCREMENTAL_STATE_PATH': 'incremental.sqlite',  # Validators, fingerprints and people per page, kept between runs
+        'INCREMENTAL_CHANGES_FILE': None,  # New, changed and removed people; defaults to <output>.changes.csv
+        'FRONTIER_EARLY_STOP': True,  # Stop a firm once its people directory and bios are done
+        'FETCH_TIERING_ENABLED': True,  # Plain HTTP first, Playwright only for JS-rendered or blocked pages
+        'ITEM_PIPELINES': {
+            'pipelines.ExtractionPipeline': 300,  # LLM extraction runs off the crawl path
+        },
+        'LLM_MAX_CONCURRENCY': 5,    # Model calls allowed in flight at once
+        'LLM_REQUESTS_PER_MINUTE': int(os.getenv('LLM_REQUESTS_PER_MINUTE', '0')),  # Provider budget; 0 learns it from response headers
+        'LLM_TOKENS_PER_MINUTE': int(os.getenv('LLM_TOKENS_PER_MINUTE', '0')),
+        'LLM_BACKEND': os.getenv('LLM_BACKEND', 'openai'),  # 'openai' (any compatible server) or 'local' (small model on CPU)
+        'LLM_BASE_URL': os.getenv('LLM_BASE_URL'),  # e.g. http://localhost:8080/v1 for llama.cpp or vLLM; unset for OpenAI
+        'LLM_MODEL': os.getenv('LLM_MODEL', 'gpt-4o-mini'),  # Model name sent to the server
+        'LOCAL_MODEL_PATH': os.getenv('LOCAL_MODEL_PATH'),  # Hugging Face model directory or id for the local backend
+        'LOCAL_BATCH_SIZE': 4,  # Prompts generated together by the local backend
+        'LOCAL_MAX_NEW_TOKENS': 512,
+        'EXTRACTION_CACHE_ENABLED': True,  # Reuse model responses for pages whose content hasn't changed
+        'EXTRACTION_CACHE_PATH': '.extraction_cache.sqlite',
+        'EXTRACTION_CACHE_MAX_ENTRIES': 50000,
+        'EXTRACTION_CACHE_MAX_AGE_DAYS': 30,
+        'PROFILE_CLASSIFIER_ENABLED': True,  # Skip the model for pages that don't look like one person's bio
+        'PROFILE_CLASSIFIER_THRESHOLD': 0.5,
+        'CONTENT_TOKEN_BUDGET': 1500,  # Trim the page to its profile region before prompting; 0 sends everything
+        'LISTING_EXTRACTION_ENABLED': True,  # Extract everyone from directory pages that show contact details
+        'LISTING_TOKEN_BUDGET': 6000,  # Listing pages are sent in chunks of at most this many tokens
+        'BUNDLE_SIZE': 4,  # Small bios sent to the model together; 1 sends each page on its own
+        'BUNDLE_MAX_TOKENS': 800,  # Only bios up to this size are bundled
+        'BUNDLE_WAIT': 3.0,  # Seconds a bio waits for others before its bundle is sent anyway
+        'OUTPUT_BATCH_SIZE': 100,    # Rows buffered before the output file is written
+        'OUTPUT_FLUSH_INTERVAL': 5,  # Seconds before buffered rows are written anyway
+        'DEDUP_ENABLED': True,  # Merge repeat sightings of a person instead of appending duplicates
+        'DEDUP_INDEX_PATH': 'dedup.sqlite',  # Shared across runs, and with `python dedup.py`
+        'PROVENANCE_ENABLED': True,  # Record which fields came from markup and which from the model
+        'PROVENANCE_FILE': None,  # Defaults to <output>.provenance.jsonl
+        'EXTENSIONS': {
+            'batch.FirmProgress': 500,  # Per-firm progress and total elapsed time
+            'jobs.JobProgress': 510,    # Progress for the web UI when run as a queued job
+            'metrics.CrawlMetrics': 520,  # Stats snapshots for /metrics and the end-of-run summary
+        },
+        'PROGRESS_INTERVAL': 60,
+        'METRICS_INTERVAL': 5,  # Seconds between stats snapshots
     }
 
+    @classmethod
+    def update_settings(cls, settings):
+        super().update_settings(settings)
+        # Batch runs raise the global caps set by the process; per-domain limits stay as above
+        for batch_setting, setting in [('BATCH_CONCURRENT_REQUESTS', 'CONCURRENT_REQUESTS'),
+                                       ('BATCH_LLM_MAX_CONCURRENCY', 'LLM_MAX_CONCURRENCY')]:
+            if settings.getint(batch_setting):
+                settings.set(setting, settings.getint(batch_setting), priority='cmdline')
+
+        if settings.getbool('VERBOSE'):
+            settings.set('LOG_LEVEL', 'DEBUG', priority='cmdline')
+
+        # Replays are offline and must be repeatable: no throttling, no answers from earlier runs
+        if settings.get('REPLAY_DIR'):
+            for setting, value in [('EXTRACTION_CACHE_ENABLED', False), ('DEDUP_ENABLED', False), ('AUTOTHROTTLE_ENABLED', False),
+                                   ('DOWNLOAD_DELAY', 0), ('RATE_CONTROL_ENABLED', False), ('RETRY_ENABLED', False), ('BUNDLE_SIZE', 1),
+                                   ('INCREMENTAL_ENABLED', False)]:
+                settings.set(setting, value, priority='cmdline')
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.frontier = Frontier(crawler, crawler.settings.getbool('FRONTIER_EARLY_STOP', True))
+        if crawler.settings.getbool('SITEMAP_DISCOVERY_ENABLED', True):
+            spider.discovery = SitemapDiscovery(spider, crawler.settings.getint('SITEMAP_MAX_FILES', 50))
+        if crawler.settings.getbool('INCREMENTAL_ENABLED'):
+            spider.incremental = IncrementalState(crawler.settings.get('INCREMENTAL_STATE_PATH', 'incremental.sqlite'))
+
+        # Persist the frontier, visited pages and extraction progress so a run can be resumed
+        checkpoint_dir = crawler.settings.get('CHECKPOINT_DIR')
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            spider.checkpoint = CrawlCheckpoint(os.path.join(checkpoint_dir, 'crawl_state.sqlite'))
+            spider.visited_urls = spider.checkpoint.visited
+            spider.frontier.seen.update(spider.visited_urls)
+        return spider
+
     def __init__(self, start_url, csv_file, *args, **kwargs):
         super(EmployeeSpider, self).__init__(*args, **kwargs)
-        self.start_urls = [start_url]
+        # One firm, or a list of firms crawled together in batch mode
+        self.start_urls = [start_url] if isinstance(start_url, str) else list(start_url)
         self.csv_file = csv_file
-        self.allow_domain = start_url.split("//")[-1].split("/")[0]
-        self.allowed_domains = [self.allow_domain]  # Enforce domain restriction
+        self.allowed_domains = [urlparse(url).hostname for url in self.start_urls]  # Enforce domain restriction
         self.visited_urls = set()
+        self.checkpoint = None
+        self.frontier = None
+        self.discovery = None
+        self.incremental = None
+
+        # One extractor for every page; Frontier does the finer pruning
+        self.link_extractor = LinkExtractor(
+            allow_domains=[urlparse(url).netloc for url in self.start_urls],  # The extractor compares host and port
+            deny=[r'/blog/', r'/news/'],
+            unique=True
+        )
 
         # Define link extraction rules
         self.rules = (
             Rule(
-                LinkExtractor(
-                    allow_domains=[self.allow_domain],
-                    deny=[r'/blog/', r'/news/'],
-                    unique=True
-                ),
+                self.link_extractor,
                 callback='parse_page',
                 follow=True
             ),
         )
         self._compile_rules()
 
-    def block_unwanted_requests(self, route, request):
-        allowed_resource_types = ['document', 'xhr', 'fetch', 'script']  # Allow only necessary types
-        blocked_extensions = ['.svg', '.woff', '.woff2', '.ttf', '.eot', '.otf', '.css', '.png', '.jpg', '.jpeg', '.gif', '.bmp']
-        
-        self.logger.debug(f"Request Resource Type: {request.resource_type}, URL: {request.url}")
-        
-        # Block if resource type is not allowed
-        if request.resource_type not in allowed_resource_types:
-            self.logger.info(f"Blocking resource type: {request.resource_type} | URL: {request.url}")
-            return route.abort()
-        
-        # Block based on URL extensions
-        if any(request.url.lower().endswith(ext) for ext in blocked_extensions):
-            self.logger.info(f"Blocking resource extension: {request.url}")
-            return route.abort()
-        
-        return route.continue_()
+    def playwright_meta(self):
+        """Request meta that routes a request through Playwright."""
+        return {
+            "playwright": True,
+            "playwright_page_methods": [
+                PageMethod(self.wait_for_network_idle),  # Wait for all network activity to finish
+            ],
+        }
+
+    async def wait_for_network_idle(self, page):
+        with timed(self.crawler.stats, 'playwright_wait'):
+            await page.wait_for_load_state("networkidle")
+
+    async def start(self):
+        # Scrapy 2.13+ entry point; older versions call start_requests directly
+        for request in self.start_requests():
+            yield request
 
     def start_requests(self):
+        if self.checkpoint:
+            # Pages that were waiting on the model when the last run stopped get fetched again
+            for url in self.checkpoint.pending:
+                self.logger.info(f"Resuming extraction for {url}")
+                self.visited_urls.discard(self.normalize_url(url))
+                self.frontier.mark_seen(url)
+                yield scrapy.Request(url=url, callback=self.parse_page, dont_filter=True)
+
+            # Then everything that was queued but never fetched
+            for url in self.checkpoint.frontier:
+                priority = self.frontier.add(url)
+                if priority is not None:
+                    yield scrapy.Request(url=url, callback=self.parse_page, priority=priority)
+
         for url in self.start_urls:
-            yield scrapy.Request(
-                url=url,
-                callback=self.parse_page,
-                meta={
-                    "playwright": True,  # Enable Playwright to capture the final redirected URL
-                    "playwright_page_methods": [
-                        PageMethod("wait_for_load_state", "networkidle"),  # Wait for all network activity to finish
-                        PageMethod("route", "**/*", self.block_unwanted_requests)
-                    ],
-                    "record_page": True,  # Allow access to the page object in the callback
-                    "handle_httpstatus_list": [301, 302, 303, 307, 308],
-                    "dont_redirect": False,  # Allow redirects
-                },
-                errback=self.handle_error,
-                dont_filter=True  # Force processing even if URLs are similar
-            )
+            if self.discovery:
+                # Sitemaps first; the discovery seeds the firm's bios or falls back to start_request
+                yield from self.discovery.start(url)
+            else:
+                yield self.start_request(url)
+
+    def start_request(self, url):
+        """The request for a firm's start page, from which its links are crawled."""
+        self.frontier.mark_seen(url)
+        # FetchTierMiddleware decides between plain HTTP and Playwright
+        return scrapy.Request(
+            url=url,
+            callback=self.parse_page,
+            meta={
+                "handle_httpstatus_list": [301, 302, 303, 307, 308],
+                "dont_redirect": False,  # Allow redirects
+                "depth_reset": True,  # Counted from here even when queued after discovery
+            },
+            errback=self.handle_error,
+            dont_filter=True  # Force processing even if URLs are similar
+        )
 
+    def seed_requests(self, start_url, urls):
+        """Requests for a firm's bios and directories found by discovery, in place of crawling from its start page."""
+        self.frontier.mark_seen(start_url)
+        new_urls = [(url, priority) for url in urls if (priority := self.frontier.add(url)) is not None]
+        if self.checkpoint:
+            self.checkpoint.frontier.update(url for url, _ in new_urls)
+        for url, priority in new_urls:
+            yield scrapy.Request(url=url, callback=self.parse_page, errback=self.handle_error, priority=priority,
+                                 meta={'depth_reset': True})
 
     def parse_page(self, response):
+        if self.checkpoint:
+            self.checkpoint.frontier.discard(response.request.url)
+        self.frontier.finished(response.request.url)
+
         # Handle redirects manually
         if response.status in [301, 302, 303, 307, 308]:
             redirect_url = response.headers.get('Location')
@@ -113,13 +265,19 @@ class EmployeeSpider(CrawlSpider):
                 )
                 return
 
-        # Access the Playwright page object
-        page = response.meta.get('playwright_page')
-        if page:
-            final_url = page.url
-            page.close()  # Close the page to prevent memory leaks
-        else:
-            final_url = response.url
+        # Not modified since the last incremental run: its people carry over and its links are followed as they were
+        if response.status == 304 and self.incremental:
+            self.visited_urls.add(self.normalize_url(response.url))
+            self.crawler.stats.inc_value(f"firm/{firm_domain(response.url)}/not_modified")
+            yield from self.follow_links(response.url, self.incremental.not_modified(response.url))
+            return
+
+        # Nothing to parse in PDFs, images and other binary downloads
+        if not isinstance(response, TextResponse):
+            return
+
+        # Playwright responses carry the page's URL after any client-side redirects; BrowserPool keeps the page
+        final_url = response.url
         self.logger.info(f"Processing final URL after redirects: {final_url}")
 
         # Normalize the final URL to avoid duplicates
@@ -127,6 +285,7 @@ class EmployeeSpider(CrawlSpider):
         if normalized_url in self.visited_urls:
             return
         self.visited_urls.add(normalized_url)
+        self.crawler.stats.inc_value(f"firm/{firm_domain(final_url)}/pages")
 
         # Check if the final URL matches predefined slugs for employee pages
         if any(slug in final_url.lower() for slug in [
@@ -138,45 +297,109 @@ class EmployeeSpider(CrawlSpider):
             self.logger.info(f"Processing content from URL: {final_url}")
             
             html_content = response.text
-            cleaned_text = clean_html(html_content)
+            with timed(self.crawler.stats, 'clean_html'):
+                cleaned_text = clean_html(html_content)
+
+            if self.incremental and self.incremental.content_unchanged(final_url, cleaned_text):
+                # Same text as when its people were last extracted; they carry over from the last run
+                self.logger.info(f"Skipping extraction, unchanged since the last run: {final_url}")
+                self.crawler.stats.inc_value('incremental/unchanged')
+            else:
+                items = list(self.extract_page(final_url, html_content, cleaned_text))
+                if self.incremental and not items:
+                    # Nothing for the model on this page, so nothing to wait for before it counts as unchanged
+                    self.incremental.extracted(final_url)
+                yield from items
 
-            # Extract data using OpenAI API
-            json_data = extract_data(cleaned_text)
+        # Follow links from this page, deduplicated and most promising first
+        links = [link.url for link in self.link_extractor.extract_links(response)]
+        if self.incremental:
+            self.incremental.page_parsed(final_url, links, response.headers)
+        yield from self.follow_links(final_url, links)
 
-            if json_data:  # Ensure extracted data is not empty
-                # Add scraped URL to the data
-                json_data = self.add_scraped_url(json_data, final_url)
+    def extract_page(self, final_url, html_content, cleaned_text):
+        """Classify a people page and hand it to ExtractionPipeline as a profile or listing item."""
+        with timed(self.crawler.stats, 'classify'):
+            profile = not self.settings.getbool('PROFILE_CLASSIFIER_ENABLED') or is_profile_page(
+                final_url, cleaned_text, self.settings.getfloat('PROFILE_CLASSIFIER_THRESHOLD'))
+            listing = not profile and self.settings.getbool('LISTING_EXTRACTION_ENABLED') and is_listing_page(cleaned_text)
 
-                # Validate data before saving
-                if self.validate_data_in_content(json_data, cleaned_text):
-                    save_to_csv(json_data, self.csv_file)
-                else:
-                    self.logger.warning(f"Validation failed for {final_url}: Email or phone not found")
+        if not profile:
+            if listing:
+                # A directory with everyone's contact details: one extraction for the whole page
+                self.logger.info(f"Extracting people from listing page: {final_url}")
+                self.crawler.stats.inc_value('classifier/listing')
+                if self.checkpoint:
+                    self.checkpoint.start_extraction(final_url)
+                yield {
+                    'scraped_url': final_url,
+                    'cleaned_text': cleaned_text,
+                    'mode': 'listing',
+                }
             else:
-                self.logger.warning(f"No data extracted from {final_url}")
+                self.logger.info(f"Skipping extraction, not a single profile page: {final_url}")
+                self.crawler.stats.inc_value('classifier/skipped')
+        elif self.frontier.is_listed(final_url):
+            self.logger.info(f"Skipping extraction, already extracted from a listing page: {final_url}")
+            self.crawler.stats.inc_value('listing/bio_skipped')
+        else:
+            self.crawler.stats.inc_value('classifier/profile')
+            with timed(self.crawler.stats, 'structured'):
+                try:
+                    structured = extract_structured(html_content, cleaned_text)
+                except Exception as e:
+                    # Markup we can't read shouldn't cost the bio; the model still gets the page
+                    self.logger.warning(f"Could not read structured data on {final_url}: {e!r}")
+                    self.crawler.stats.inc_value('structured/errors')
+                    structured = None
 
-        # Follow links from this page
-        link_extractor = LinkExtractor(
-            allow_domains=[self.allow_domain],
-            deny=[r'/blog/', r'/news/'],
-            unique=True
-        )
-        links = link_extractor.extract_links(response)
-        for link in links:
-            normalized_link = self.normalize_url(link.url)
-            if normalized_link not in self.visited_urls:
-                yield scrapy.Request(
-                    url=link.url,
-                    callback=self.parse_page,
-                    meta={
-                        "playwright": True, 
-                        "playwright_page_methods": [
-                            PageMethod("wait_for_load_state", "networkidle"),
-                            PageMethod("route", "**/*", self.block_unwanted_requests)
-                        ],
-                        "record_page": True,
-                    }
-                )
+            # Only the profile region of the page goes into the prompt
+            with timed(self.crawler.stats, 'reduce'):
+                tokens_before = count_tokens(cleaned_text)
+                cleaned_text = reduce_to_profile(cleaned_text, self.settings.getint('CONTENT_TOKEN_BUDGET'))
+                tokens_after = count_tokens(cleaned_text)
+            self.crawler.stats.inc_value('extraction/page_tokens', tokens_before)
+            self.crawler.stats.inc_value('extraction/input_tokens', tokens_after)
+            self.logger.debug(f"Input tokens for {final_url}: {tokens_before} -> {tokens_after}")
+
+            # Hand the page to ExtractionPipeline so the crawl keeps going while the model works
+            if self.checkpoint:
+                self.checkpoint.start_extraction(final_url)
+            yield {
+                'scraped_url': final_url,
+                'cleaned_text': cleaned_text,
+                'structured': structured,
+            }
+
+    def follow_links(self, url, links):
+        """Queue the links found on a page, deduplicated and most promising first."""
+        self.frontier.page_parsed(url, links)
+        # Firms seeded from their sitemaps only need links from people directories, for paginated listings
+        if self.discovery and firm_domain(url) in self.discovery.seeded and not is_people_index(url):
+            return
+
+        new_links = [(link, priority) for link in links if (priority := self.frontier.add(link)) is not None]
+        if self.checkpoint:
+            self.checkpoint.frontier.update(link for link, _ in new_links)
+        for link, priority in new_links:
+            yield scrapy.Request(
+                url=link,
+                callback=self.parse_page,
+                priority=priority
+            )
+
+    def closed(self, reason):
+        if self.checkpoint:
+            self.checkpoint.close()
+        if self.incremental:
+            # Extraction is done by now: the pipelines close before the spider does
+            changes = self.incremental.finish(firm_domain(url) for url in self.start_urls)
+            path = self.settings.get('INCREMENTAL_CHANGES_FILE') or changes_path(self.csv_file)
+            write_changes(path, changes)
+            for change in ('new', 'changed', 'removed'):
+                self.crawler.stats.set_value(f'incremental/{change}', sum(1 for c, _, _ in changes if c == change))
+            self.logger.info(f"Wrote {len(changes)} changes since the last run to {path}")
+            self.incremental.close()
 
     def handle_error(self, failure):
         """Handle request errors by adjusting scraping level."""
@@ -187,17 +410,16 @@ class EmployeeSpider(CrawlSpider):
                 yield scrapy.Request(
                     url=response.url,
                     callback=self.parse_page,
-                    meta={
-                        "playwright": True,
-                        "playwright_page_methods": [
-                            PageMethod("wait_for_load_state", "networkidle"),
-                            PageMethod("route", "**/*", self.block_unwanted_requests)
-                        ],
-                        "record_page": True,
-                    },
+                    meta=self.playwright_meta(),
                     errback=self.handle_error,
                     dont_filter=True  # Ensure the request isn't filtered out
                 )
+                return
+            # The server answered (404, 410, ...): fetching it again after a restart won't help
+            if self.checkpoint:
+                self.checkpoint.frontier.discard(failure.request.url)
+        # HttpError comes from a spider middleware, so FrontierMiddleware never saw this page fail
+        self.frontier.finished(failure.request.url)
 
     def add_scraped_url(self, json_data, url):
         """Helper method to add scraped URL to the extracted JSON data."""
@@ -219,23 +441,30 @@ class EmployeeSpider(CrawlSpider):
         return json_data
 
     def validate_data_in_content(self, json_data, page_content):
-        """Validate that the email and phone numbers are present in the cleaned HTML content."""
+        """Validate that the email and phone numbers are present in the cleaned HTML content.
+
+        Fields whose provenance is 'structured' were read from the page's own
+        markup (often a script or an attribute the reduced text no longer has),
+        so they aren't looked up in page_content again.
+        """
         person = json_data.get('person', {})
         email = person.get('email', '')
         direct_phone = person.get('direct_phone', '')
         mobile_phone = person.get('mobile_phone', '')
+        from_markup = {field for field, source in (json_data.get('provenance') or {}).items() if source == 'structured'}
+        page_digits = re.sub(r'\D', '', page_content)
 
         # Validate email
-        email_found = email and email in page_content and self.is_valid_email(email)
+        email_found = email and self.is_valid_email(email) and ('email' in from_markup or email in page_content)
         if not email_found:
             person['email'] = ''  # Drop invalid email
 
         # Validate and format phone numbers (handle US phone formats)
-        direct_phone_found = direct_phone and re.sub(r'\D', '', direct_phone) in re.sub(r'\D', '', page_content)
+        direct_phone_found = direct_phone and ('direct_phone' in from_markup or re.sub(r'\D', '', direct_phone) in page_digits)
         if direct_phone_found:
             person['direct_phone'] = self.format_phone_number(direct_phone)
 
-        mobile_phone_found = mobile_phone and re.sub(r'\D', '', mobile_phone) in re.sub(r'\D', '', page_content)
+        mobile_phone_found = mobile_phone and ('mobile_phone' in from_markup or re.sub(r'\D', '', mobile_phone) in page_digits)
         if mobile_phone_found:
             person['mobile_phone'] = self.format_phone_number(mobile_phone)
 
@@ -258,6 +487,5 @@ class EmployeeSpider(CrawlSpider):
 
     def normalize_url(self, url):
         """Normalize URLs to avoid crawling duplicates."""
-        # Strip query parameters and fragments to avoid re-crawling the same page
-        parsed_url = url.split('?')[0].split('#')[0]
-        return hashlib.md5(parsed_url.lower().encode()).hexdigest()
+        # Scheme, www., trailing slashes, index files and tracking parameters don't make a new page
+        return canonicalize_url(url)
@@ -0,0 +1,203 @@
+# sinks.py
+import atexit
+import csv
+import io
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single writer only
+    fcntl = None
+
+FIELDNAMES = [
+    'scraped_url', 'first_name', 'middle_name', 'last_name', 'job_title', 'direct_phone', 'direct_phone_extension', 'mobile_phone', 'email',
+    'location_city', 'location_state', 'profile_image_url', 'practice_areas'
+]
+
+def person_to_row(data):
+    """Flatten {'scraped_url': ..., 'person': {...}} into one output row."""
+    person = data.get('person', {})
+    row = {field: person.get(field, '') for field in FIELDNAMES}
+    row['scraped_url'] = data.get('scraped_url', '')
+    return row
+
+@contextmanager
+def locked(file_obj):
+    """Hold an exclusive lock on an open file so other processes' flushes can't interleave with ours."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(file_obj.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(file_obj.fileno(), fcntl.LOCK_UN)
+
+class OutputSink:
+    """Long-lived writer for one output file that batches rows.
+
+    Rows are buffered and written when batch_size is reached, when
+    flush_interval seconds have passed since the last flush, or on close.
+    Work that must not happen before the rows are on disk, such as marking a
+    page extracted in the checkpoint, is deferred with after_flush.
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.flushed_callbacks = []
+        self.last_flush = time.monotonic()
+
+    def write(self, data):
+        self.buffer.append(person_to_row(data))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        if self.buffer and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def after_flush(self, callback):
+        """Call callback once every row written so far is on disk: now if nothing is buffered."""
+        if self.buffer:
+            self.flushed_callbacks.append(callback)
+        else:
+            callback()
+
+    def flush(self):
+        if self.buffer:
+            self.write_rows(self.buffer)
+            self.buffer = []
+        self.last_flush = time.monotonic()
+        callbacks, self.flushed_callbacks = self.flushed_callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+class CsvSink(OutputSink):
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+
+    def write_rows(self, rows):
+        # Render first so the lock is only held for a single write
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=FIELDNAMES)
+        writer.writerows(rows)
+
+        with locked(self.file):
+            # Write header only if the file is new; checked under the lock so only one writer adds it
+            if os.fstat(self.file.fileno()).st_size == 0:
+                header = io.StringIO()
+                csv.DictWriter(header, fieldnames=FIELDNAMES).writeheader()
+                self.file.write(header.getvalue())
+            self.file.write(text.getvalue())
+            self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+class JsonlSink(OutputSink):
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write_rows(self, rows):
+        text = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        with locked(self.file):
+            self.file.write(text)
+            self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+class SqliteSink(OutputSink):
+    """Rows go to a 'people' table with one TEXT column per field; SQLite does its own locking."""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        self.conn = sqlite3.connect(path, timeout=60)
+        columns = ', '.join(f"{field} TEXT" for field in FIELDNAMES)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS people ({columns})")
+        self.conn.commit()
+
+    def write_rows(self, rows):
+        placeholders = ', '.join('?' for _ in FIELDNAMES)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO people ({', '.join(FIELDNAMES)}) VALUES ({placeholders})",
+                [tuple(row[field] for field in FIELDNAMES) for row in rows]
+            )
+
+    def close(self):
+        super().close()
+        self.conn.close()
+
+class ParquetSink(OutputSink):
+    """Parquet files can't be appended to by several processes, so path is a directory and
+    each writer adds its own part file. Readers such as pyarrow or pandas load the directory as one dataset.
+    """
+
+    def __init__(self, path, **kwargs):
+        super().__init__(path, **kwargs)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(field, pa.string()) for field in FIELDNAMES])
+        os.makedirs(path, exist_ok=True)
+        part = os.path.join(path, f"part-{os.getpid()}-{int(time.time() * 1000)}.parquet")
+        self.writer = pq.ParquetWriter(part, self.schema)
+
+    def write_rows(self, rows):
+        columns = {field: [str(row[field]) for row in rows] for field in FIELDNAMES}
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+SINKS_BY_EXTENSION = {
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.sqlite': SqliteSink,
+    '.db': SqliteSink,
+    '.parquet': ParquetSink,
+}
+
+_open_sinks = {}
+
+def get_sink(path, **kwargs):
+    """Return the process-wide sink for path, opening it on first use. The format follows the extension (CSV by default)."""
+    key = os.path.abspath(path)
+    if key not in _open_sinks:
+        sink_class = SINKS_BY_EXTENSION.get(os.path.splitext(path)[1].lower(), CsvSink)
+        _open_sinks[key] = sink_class(path, **kwargs)
+    return _open_sinks[key]
+
+def flush_all():
+    for sink in _open_sinks.values():
+        sink.flush_if_due()
+
+def close_all():
+    while _open_sinks:
+        _, sink = _open_sinks.popitem()
+        sink.close()
+
+# Never lose buffered rows on a normal interpreter exit
+atexit.register(close_all)
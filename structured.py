@@ -0,0 +1,243 @@
+# structured.py
+import csv
+import json
+import os
+import re
+import sys
+import urllib.request
+from bs4 import BeautifulSoup
+from sinks import locked
+
+PERSON_FIELDS = [
+    'first_name', 'middle_name', 'last_name', 'job_title', 'direct_phone', 'direct_phone_extension',
+    'mobile_phone', 'email', 'location_city', 'location_state', 'profile_image_url', 'practice_areas'
+]
+
+# If markup gives us all of these, the page doesn't need to go to the model
+CORE_FIELDS = ['first_name', 'last_name', 'job_title', 'email', 'direct_phone']
+
+PERSON_TYPES = {'person', 'attorney', 'lawyer'}
+
+JSON_LD_SCRIPT = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL
+)
+MAILTO_LINK = re.compile(r'href\s*=\s*["\']mailto:([^"\'?]+)', re.IGNORECASE)
+TEL_LINK = re.compile(r'href\s*=\s*["\']tel:([^"\']+)', re.IGNORECASE)
+# Shared firm inboxes that shouldn't be taken as an attorney's own address
+GENERIC_INBOXES = {'info', 'intake', 'contact', 'office', 'admin', 'hello', 'mail', 'reception', 'marketing', 'inquiries'}
+NAME_SUFFIXES = {'jr', 'jr.', 'sr', 'sr.', 'ii', 'iii', 'iv', 'esq', 'esq.'}
+
+def split_name(full_name):
+    """Split 'Jane Q. Doe, Esq.' into first, middle and last names."""
+    parts = [part for part in re.split(r'[\s,]+', full_name.strip()) if part]
+    while len(parts) > 2 and parts[-1].lower() in NAME_SUFFIXES:
+        parts.pop()
+    if not parts:
+        return '', '', ''
+    if len(parts) == 1:
+        return parts[0], '', ''
+    return parts[0], ' '.join(parts[1:-1]), parts[-1]
+
+def _text(value):
+    """Flatten a JSON-LD value (string, list or object with a name) to text."""
+    if isinstance(value, list):
+        return ', '.join(filter(None, (_text(item) for item in value)))
+    if isinstance(value, dict):
+        return _text(value.get('name') or value.get('url') or '')
+    return str(value).strip() if value is not None else ''
+
+def _json_ld_nodes(html_content):
+    """Yield every object found in the page's JSON-LD blocks, including @graph members."""
+    for block in JSON_LD_SCRIPT.findall(html_content):
+        try:
+            data = json.loads(block.strip())
+        except json.JSONDecodeError:
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict):
+                yield node
+                if '@graph' in node:
+                    stack.append(node['@graph'])
+
+def _first(value):
+    """schema.org properties can hold one value or a list of them; take the first."""
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+def _is_person(node):
+    types = node.get('@type', [])
+    types = types if isinstance(types, list) else [types]
+    return any(str(t).lower() in PERSON_TYPES for t in types)
+
+def from_json_ld(html_content):
+    """Read a schema.org Person/Attorney node into person fields."""
+    person = {}
+    for node in _json_ld_nodes(html_content):
+        if not _is_person(node):
+            continue
+
+        first, middle, last = split_name(_text(node.get('name', '')))
+        person['first_name'] = _text(node.get('givenName')) or first
+        person['middle_name'] = _text(node.get('additionalName')) or middle
+        person['last_name'] = _text(node.get('familyName')) or last
+        person['job_title'] = _text(node.get('jobTitle'))
+        person['direct_phone'] = _text(node.get('telephone'))
+        person['email'] = _text(node.get('email')).replace('mailto:', '')
+        person['profile_image_url'] = _text(node.get('image'))
+        person['practice_areas'] = _text(node.get('knowsAbout'))
+
+        # workLocation is a Place, a list of them or just a place name
+        location = _first(node.get('workLocation'))
+        address = _first(node.get('address') or (location.get('address') if isinstance(location, dict) else None))
+        if isinstance(address, dict):
+            person['location_city'] = _text(address.get('addressLocality'))
+            person['location_state'] = _text(address.get('addressRegion'))
+        break
+    return {field: value for field, value in person.items() if value}
+
+def from_hcard(html_content):
+    """Read an hCard (class="vcard"/"h-card") into person fields."""
+    if 'vcard' not in html_content and 'h-card' not in html_content:
+        return {}
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    card = soup.find(class_=['vcard', 'h-card'])
+    if not card:
+        return {}
+
+    def prop(*classes):
+        tag = card.find(class_=list(classes))
+        if not tag:
+            return ''
+        if tag.name == 'a' and tag.get('href', '').startswith(('mailto:', 'tel:')):
+            return tag['href'].split(':', 1)[1].split('?')[0]
+        if tag.name == 'img':
+            return tag.get('src', '')
+        return tag.get_text(' ', strip=True)
+
+    first, middle, last = split_name(prop('fn', 'p-name'))
+    person = {
+        'first_name': prop('given-name', 'p-given-name') or first,
+        'middle_name': prop('additional-name', 'p-additional-name') or middle,
+        'last_name': prop('family-name', 'p-family-name') or last,
+        'job_title': prop('title', 'p-job-title', 'role', 'p-role'),
+        'direct_phone': prop('tel', 'p-tel'),
+        'email': prop('email', 'u-email'),
+        'location_city': prop('locality', 'p-locality'),
+        'location_state': prop('region', 'p-region'),
+        'profile_image_url': prop('photo', 'u-photo'),
+    }
+    return {field: value for field, value in person.items() if value}
+
+def from_links(cleaned_text):
+    """Take email/phone from mailto:/tel: anchors when the page has exactly one of each."""
+    person = {}
+    emails = {
+        email.strip() for email in MAILTO_LINK.findall(cleaned_text)
+        if email.split('@')[0].strip().lower() not in GENERIC_INBOXES
+    }
+    phones = {phone.strip() for phone in TEL_LINK.findall(cleaned_text)}
+    if len(emails) == 1:
+        person['email'] = emails.pop()
+    if len(phones) == 1:
+        person['direct_phone'] = phones.pop()
+    return person
+
+def extract_structured(html_content, cleaned_text):
+    """Fill the person schema from markup alone, without calling the model.
+
+    Sources are tried from most to least specific; a field keeps the first value
+    found. Returns {'person': {...}, 'provenance': {...}} with 'structured' marked
+    against every field that was filled.
+    """
+    person = {field: '' for field in PERSON_FIELDS}
+    for source in (from_json_ld(html_content), from_hcard(html_content), from_links(cleaned_text)):
+        for field, value in source.items():
+            if not person.get(field):
+                person[field] = value
+
+    provenance = {field: 'structured' for field in PERSON_FIELDS if person[field]}
+    return {'person': person, 'provenance': provenance}
+
+def is_complete(structured):
+    """True when markup alone covered every core field."""
+    person = structured.get('person', {})
+    return all(person.get(field) for field in CORE_FIELDS)
+
+def merge_with_llm(structured, llm_data):
+    """Fill the fields markup left empty with values from the model, recording where each came from."""
+    person = dict(structured['person'])
+    provenance = dict(structured['provenance'])
+    llm_person = llm_data.get('person', {}) if isinstance(llm_data, dict) else {}
+
+    for field in PERSON_FIELDS:
+        if not person.get(field) and llm_person.get(field):
+            person[field] = llm_person[field]
+            provenance[field] = 'llm'
+
+    return {'person': person, 'provenance': provenance}
+
+def provenance_path(output_file):
+    """Where field provenance goes by default: next to the output, as <output>.provenance.jsonl."""
+    return f"{os.path.splitext(output_file)[0]}.provenance.jsonl"
+
+class ProvenanceLog:
+    """JSON lines recording, for each saved person, which fields came from markup and which from the model.
+
+    The output formats have a fixed set of columns, so provenance lives beside
+    the output and joins back to it on scraped_url and email.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def write(self, data):
+        person = data.get('person', {})
+        provenance = data.get('provenance') or {field: 'llm' for field in PERSON_FIELDS if person.get(field)}
+        record = {'scraped_url': data.get('scraped_url', ''), 'email': person.get('email', ''),
+                  'first_name': person.get('first_name', ''), 'last_name': person.get('last_name', ''),
+                  'provenance': provenance}
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        with locked(self.file):
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+def measure(csv_file):
+    """Fetch every scraped_url in a results CSV and report how many pages markup alone completes."""
+    from parser import clean_html
+
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        urls = list(dict.fromkeys(row['scraped_url'] for row in csv.DictReader(f)))
+
+    fetched = complete = 0
+    for url in urls:
+        try:
+            request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+            with urllib.request.urlopen(request, timeout=20) as response:
+                html_content = response.read().decode('utf-8', errors='replace')
+        except Exception as e:
+            print(f"Failed to fetch {url}: {e}")
+            continue
+
+        fetched += 1
+        if is_complete(extract_structured(html_content, clean_html(html_content))):
+            complete += 1
+
+    if fetched:
+        print(f"Fetched {fetched} of {len(urls)} pages")
+        print(f"Completed without an API call: {complete} ({complete / fetched:.1%})")
+
+if __name__ == '__main__':
+    measure(sys.argv[1] if len(sys.argv) > 1 else 'data/bulk_test.csv')
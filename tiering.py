@@ -0,0 +1,117 @@
+# tiering.py
+import re
+from urllib.parse import urlparse
+from scrapy.http import TextResponse
+from metrics import observe
+
+# Markers of a client-rendered app shell or a bot challenge in a plain HTTP response
+SPA_SHELL = re.compile(
+    r'<div[^>]+id\s*=\s*["\'](root|app|__next|__nuxt|___gatsby)["\'][^>]*>\s*</div>|ng-app|data-reactroot',
+    re.IGNORECASE
+)
+# Asking for JavaScript only means a shell when there is little else on the page; form plugins
+# (WPForms, Gravity Forms) put the same words in a <noscript> on ordinary static pages
+JAVASCRIPT_NOTICE = re.compile(r'enable javascript|javascript is (required|disabled)', re.IGNORECASE)
+# Only markers of an interstitial challenge page. Generic words like "captcha" or "access denied" also
+# turn up on ordinary pages (a contact form loading recaptcha/api.js), and a real block page with them
+# comes with a 403 or 503, which counts as blocked on its own
+BOT_CHALLENGE = re.compile(
+    r'<title>\s*(just a moment\.\.\.|attention required|ddos-guard)|cf-browser-verification|cf-challenge|cf_chl_opt|'
+    r'checking your browser before accessing|sucuri website firewall',
+    re.IGNORECASE
+)
+# A CAPTCHA widget counts only when it is about all the page has
+CAPTCHA_WIDGET = re.compile(r'class\s*=\s*["\'][^"\']*\b(g-recaptcha|h-captcha|cf-turnstile)\b', re.IGNORECASE)
+SCRIPT_OR_STYLE = re.compile(r'<(script|style|noscript)\b.*?</\1>', re.IGNORECASE | re.DOTALL)
+TAG = re.compile(r'<[^>]+>')
+
+BLOCKED_STATUSES = {403, 429, 503}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+NOT_MODIFIED = 304
+
+# Visible text shorter than this on a page with scripts usually means the content is rendered by JavaScript
+MIN_VISIBLE_TEXT = 200
+
+def needs_browser(response):
+    """Return a reason string if a plain HTTP response has to be re-fetched with Playwright, else ''."""
+    if response.status in BLOCKED_STATUSES:
+        return 'blocked'
+    if response.status in REDIRECT_STATUSES or response.status == NOT_MODIFIED or not isinstance(response, TextResponse):
+        return ''
+
+    content_type = response.headers.get('Content-Type', b'').decode('latin-1').lower()
+    if content_type and 'html' not in content_type:
+        return ''
+
+    body = response.text
+    if BOT_CHALLENGE.search(body[:20000]) and len(body) < 50000:
+        return 'blocked'
+    visible_text = ' '.join(TAG.sub(' ', SCRIPT_OR_STYLE.sub(' ', body)).split())
+    if CAPTCHA_WIDGET.search(body) and len(visible_text) < MIN_VISIBLE_TEXT:
+        return 'blocked'
+    if SPA_SHELL.search(body):
+        return 'javascript'
+    if len(visible_text) < MIN_VISIBLE_TEXT and ('<script' in body.lower() or JAVASCRIPT_NOTICE.search(body)):
+        return 'javascript'
+    return ''
+
+class FetchTierMiddleware:
+    """Fetch with Scrapy's plain HTTP handler first and escalate to Playwright only when needed.
+
+    Once a domain has needed the browser, later requests to it go straight to
+    Playwright. Requests with meta http_only (sitemaps, robots.txt, APIs) are
+    never rendered, and conditional re-crawl requests try plain HTTP first
+    even there, since a 304 needs no rendering. Per-tier counts and average
+    download latency are kept in the crawl stats under fetch_tier/.
+    """
+
+    def __init__(self, stats, enabled=True):
+        self.stats = stats
+        self.enabled = enabled
+        self.browser_domains = set()
+        self.latency_totals = {'http': 0.0, 'browser': 0.0}
+        self.latency_counts = {'http': 0, 'browser': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats, crawler.settings.getbool('FETCH_TIERING_ENABLED', True))
+
+    def process_request(self, request, spider):
+        if request.meta.get('playwright') or request.meta.get('http_only') or request.meta.get('conditional'):
+            return None
+
+        domain = urlparse(request.url).netloc.lower()
+        if not self.enabled or domain in self.browser_domains:
+            request.meta.update(spider.playwright_meta())
+        return None
+
+    def process_response(self, request, response, spider):
+        tier = 'browser' if request.meta.get('playwright') else 'http'
+        self.record(tier, request.meta.get('download_latency'))
+
+        if tier == 'browser' or request.meta.get('http_only'):
+            return response
+
+        reason = needs_browser(response)
+        if not reason:
+            return response
+
+        domain = urlparse(request.url).netloc.lower()
+        if domain not in self.browser_domains:
+            spider.logger.info(f"Switching {domain} to Playwright ({reason}): {request.url}")
+            self.browser_domains.add(domain)
+        self.stats.inc_value(f'fetch_tier/escalated/{reason}')
+
+        meta = dict(request.meta)
+        meta.update(spider.playwright_meta())
+        return request.replace(meta=meta, dont_filter=True)
+
+    def record(self, tier, latency):
+        """Count a download for a tier and update its average latency."""
+        self.stats.inc_value(f'fetch_tier/{tier}/count')
+        if latency is not None:
+            observe(self.stats, f'fetch_{tier}', latency)
+            self.latency_totals[tier] += latency
+            self.latency_counts[tier] += 1
+            average = self.latency_totals[tier] * 1000 / self.latency_counts[tier]
+            self.stats.set_value(f'fetch_tier/{tier}/avg_latency_ms', round(average, 1))